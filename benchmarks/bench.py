@@ -0,0 +1,193 @@
+"""Benchmarks for the hot paths, emitted as JSON.
+
+    python -m benchmarks.bench [--quick] [--output results.json]
+
+Timings are wall-clock on this machine; command counts and simulated
+seconds are deterministic and comparable between releases.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable
+from hpa250b_ble import (
+    HPA250B,
+    Command,
+    Fleet,
+    SimulatedBTClient,
+    SimulatedDelegate,
+    SimulationProfile,
+    State,
+    VirtualClock,
+    plan,
+    reconcile,
+)
+from hpa250b_ble.table import STATE_COUNT, state_at
+
+# Typical BLE round trip figures; only used to derive simulated seconds
+DEVICE_PROFILE = SimulationProfile(
+    connect_latency=1.0, write_latency=0.03, notification_delay=0.1
+)
+# Scaled down so fleet runs finish quickly in real time
+FLEET_PROFILE = SimulationProfile(
+    connect_latency=0.01, write_latency=0.001, notification_delay=0.003, jitter=0.001
+)
+FLEET_SIZES = [1, 10, 100]
+
+
+def all_states() -> list[State]:
+    return [state_at(i) for i in range(STATE_COUNT)]
+
+
+def throughput(fn: Callable[[], object], rounds: int, batch: int) -> dict:
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    elapsed = time.perf_counter() - started_at
+    ops = rounds * batch
+    return {"ops": ops, "seconds": elapsed, "ops_per_second": ops / elapsed}
+
+
+def bench_state_codec(states: list[State], rounds: int) -> dict:
+    payloads = [s.bytes for s in states]
+
+    def decode():
+        for p in payloads:
+            State.from_bytes(p)
+
+    def encode():
+        for s in states:
+            s.bytes
+
+    return {
+        "from_bytes": throughput(decode, rounds, len(payloads)),
+        "bytes": throughput(encode, rounds, len(states)),
+    }
+
+
+def bench_command_bytes(rounds: int) -> dict:
+    commands = [Command.from_int(bits) for bits in range(1 << 14)]
+
+    def encode():
+        for c in commands:
+            c.bytes
+
+    return throughput(encode, rounds, len(commands))
+
+
+def bench_planner(states: list[State]) -> dict:
+    lengths = []
+    started_at = time.perf_counter()
+    for current in states:
+        for desired in states:
+            lengths.append(len(plan(current, desired)))
+    elapsed = time.perf_counter() - started_at
+    return {
+        "pairs": len(lengths),
+        "seconds": elapsed,
+        "pairs_per_second": len(lengths) / elapsed,
+        "mean_steps": statistics.fmean(lengths),
+        "max_steps": max(lengths),
+    }
+
+
+async def reconcile_simulated(current: State, desired: State) -> tuple[int, float]:
+    clock = VirtualClock()
+    client = SimulatedBTClient(
+        initial_state=current, clock=clock, profile=DEVICE_PROFILE
+    )
+    device = HPA250B(SimulatedDelegate(client))
+    await device.connect()
+    writes, started_at = client.writes, clock.time()
+    await reconcile(device, desired)
+    return client.writes - writes, clock.time() - started_at
+
+
+async def bench_reconcile(currents: list[State], desireds: list[State]) -> dict:
+    commands, simulated = [], []
+    started_at = time.perf_counter()
+    for current in currents:
+        for desired in desireds:
+            n, seconds = await reconcile_simulated(current, desired)
+            commands.append(n)
+            simulated.append(seconds)
+    elapsed = time.perf_counter() - started_at
+    return {
+        "pairs": len(commands),
+        "seconds": elapsed,
+        "mean_commands": statistics.fmean(commands),
+        "max_commands": max(commands),
+        "mean_simulated_seconds": statistics.fmean(simulated),
+        "max_simulated_seconds": max(simulated),
+    }
+
+
+async def bench_fleet(size: int, states: list[State], seed: int) -> dict:
+    rng = random.Random(seed)
+    clients = {
+        f"00:00:00:00:{i >> 8:02X}:{i & 0xFF:02X}": SimulatedBTClient(
+            f"00:00:00:00:{i >> 8:02X}:{i & 0xFF:02X}",
+            initial_state=rng.choice(states),
+            profile=FLEET_PROFILE,
+            seed=seed + i,
+        )
+        for i in range(size)
+    }
+    fleet = Fleet({a: SimulatedDelegate(c) for a, c in clients.items()})
+    desired = {a: rng.choice(states) for a in clients}
+
+    started_at = time.perf_counter()
+    results = await fleet.reconcile(desired)
+    elapsed = time.perf_counter() - started_at
+    await fleet.disconnect()
+    return {
+        "devices": size,
+        "seconds": elapsed,
+        "failures": sum(not r.ok for r in results.values()),
+        "writes": sum(c.writes for c in clients.values()),
+    }
+
+
+async def run(quick: bool, seed: int) -> dict:
+    states = all_states()
+    rounds = 20 if quick else 200
+    # every current state against every desired one takes about a minute
+    currents = states[:: 20 if quick else 1]
+    return {
+        "python": platform.python_version(),
+        "quick": quick,
+        "results": {
+            "state_codec": bench_state_codec(states, rounds),
+            "command_bytes": bench_command_bytes(max(rounds // 10, 1)),
+            "planner": bench_planner(states),
+            "reconcile": await bench_reconcile(currents, states),
+            "fleet": [await bench_fleet(n, states, seed) for n in FLEET_SIZES],
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--quick", action="store_true", help="sample state pairs and fewer rounds"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, help="write JSON here, not stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.quick, args.seed))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Reconcile every reachable state to every desired state and report the cost.
+
+    python -m benchmarks.reconcile_report [--stride N] [--worst N] [--json]
+
+Each pair runs the real HPA250B and reconcile against SimulatedBTClient, so
+the command counts are what a device would see. The simulated device applies
+commands with its own model of the firmware rather than the planner's tables,
+so a pair only converges if the planner's model agrees with it. Pairs that
+fail to converge within MAX_RECONCILES, or that pass through the same state
+twice on the way, are listed separately.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import sys
+from dataclasses import asdict, dataclass
+from hpa250b_ble import (
+    HPA250B,
+    OverflowPolicy,
+    ReconcileError,
+    SimulatedBTClient,
+    SimulatedDelegate,
+    State,
+    plan,
+    reconcile,
+)
+from hpa250b_ble.reconcile import MAX_RECONCILES
+from .bench import all_states
+
+
+@dataclass
+class PairCost:
+    current: str
+    desired: str
+    commands: int
+    planned: int
+    converged: bool
+    revisits: int
+
+
+async def reconcile_pair(current: State, desired: State) -> PairCost:
+    client = SimulatedBTClient(initial_state=current)
+    device = HPA250B(SimulatedDelegate(client))
+    await device.connect()
+    # every state the device reports along the way
+    subscription = device.subscribe(MAX_RECONCILES + 1, OverflowPolicy.DROP_OLDEST)
+    writes = client.writes
+    try:
+        await reconcile(device, desired)
+    except ReconcileError:
+        pass
+    # judged by the simulated device, not by what HPA250B believes
+    converged = client.state.matches_desired_state(desired)
+    subscription.close()
+    visited = [current, *[s async for s in subscription]]
+    return PairCost(
+        current=repr(current),
+        desired=repr(desired),
+        commands=client.writes - writes,
+        planned=len(plan(current, desired)),
+        converged=converged,
+        revisits=len(visited) - len(set(visited)),
+    )
+
+
+async def run(stride: int) -> list[PairCost]:
+    states = all_states()
+    return [
+        await reconcile_pair(current, desired)
+        for current in states[::stride]
+        for desired in states
+    ]
+
+
+def summarize(costs: list[PairCost], worst: int) -> dict:
+    distribution = collections.Counter(c.commands for c in costs)
+    return {
+        "pairs": len(costs),
+        "max_reconciles": MAX_RECONCILES,
+        "distribution": dict(sorted(distribution.items())),
+        "total_commands": sum(c.commands for c in costs),
+        "excess_commands": sum(c.commands - c.planned for c in costs),
+        "worst": [
+            asdict(c)
+            for c in sorted(costs, key=lambda c: c.commands, reverse=True)[:worst]
+        ],
+        "not_converged": [asdict(c) for c in costs if not c.converged],
+        "looped": [asdict(c) for c in costs if c.revisits],
+    }
+
+
+def print_summary(summary: dict):
+    print(f"{summary['pairs']} pairs, {summary['total_commands']} commands")
+    print(f"{summary['excess_commands']} commands over the plan")
+    print("commands  pairs")
+    for n, count in summary["distribution"].items():
+        print(f"{n:>8}  {count}")
+    print("worst pairs:")
+    for c in summary["worst"]:
+        print(f"  {c['commands']:>3}  {c['current']} -> {c['desired']}")
+    print(f"{len(summary['not_converged'])} pairs hit MAX_RECONCILES")
+    for c in summary["not_converged"]:
+        print(f"  {c['current']} -> {c['desired']}")
+    print(f"{len(summary['looped'])} pairs revisited a state")
+    for c in summary["looped"]:
+        print(f"  {c['current']} -> {c['desired']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--stride", type=int, default=1, help="only start from every Nth state"
+    )
+    parser.add_argument("--worst", type=int, default=10, help="worst pairs to list")
+    parser.add_argument("--json", action="store_true", help="print JSON")
+    args = parser.parse_args()
+
+    summary = summarize(asyncio.run(run(args.stride)), args.worst)
+    if args.json:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        print_summary(summary)
+    if summary["not_converged"] or summary["looped"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
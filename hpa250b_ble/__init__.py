@@ -2,8 +2,24 @@ import logging
 
 _LOGGER = logging.getLogger(__name__)
 
+from .capture import (
+    CaptureWriter,
+    RecordingBTClient,
+    RecordingDelegate,
+    ReplayBTClient,
+    ReplayDelegate,
+    read_capture,
+)
 from .command import Command
+from .config import Config, ConfigError, DeviceConfig, load_config
+from .controller import DeviceController
 from .enums import Preset, Backlight, VOCLight
+from .daemon import Daemon
+from .discovery import ScanCache
+from .drift import DriftCorrector
+from .fleet import Fleet, FleetResult
+from .handshake import HandshakeCache, MemoryHandshakeCache, JSONHandshakeCache
+from .history import StateHistory, StateHistoryError
 from .hpa250b import (
     HPA250B,
     Delegate,
@@ -13,5 +29,22 @@ from .hpa250b import (
     BTError,
     BTClientDisconnectedError,
 )
-from .reconcile import reconcile, ReconcileError
+from .instrumentation import (
+    Event,
+    Instrumentation,
+    NoopInstrumentation,
+    MetricsRecorder,
+)
+from .pool import ConnectionPool
+from .planner import plan, PlanError
+from .reconcile import reconcile, ReconcileError, ReconcileSupersededError
+from .reconnect import ReconnectPolicy, ConnectionStats
+from .serialize import state_from_dict, state_to_dict
+from .simulation import (
+    SimulatedBTClient,
+    SimulatedDelegate,
+    SimulationProfile,
+    VirtualClock,
+)
 from .state import State, StateError
+from .subscription import Subscription, OverflowPolicy
@@ -2,6 +2,10 @@ import argparse
 import asyncio
 import logging
 from hpa250b_ble import State, HPA250B, BleakDelegate, reconcile, Preset, Backlight
+from hpa250b_ble import Fleet, ScanCache
+from hpa250b_ble.config import load_config
+from hpa250b_ble.daemon import Daemon
+from hpa250b_ble.drift import DriftCorrector
 
 logging.basicConfig(level=logging.INFO)
 
@@ -12,12 +16,44 @@ async def main():
     )
 
     parser.add_argument(
-        "--address", type=str, help="Bluetooth device address (UUID on macOS)"
+        "--address",
+        type=str,
+        action="append",
+        help="Bluetooth device address (UUID on macOS); repeat for a daemon",
+    )
+
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="Send all reconcile commands back-to-back",
+    )
+
+    parser.add_argument(
+        "--socket",
+        type=str,
+        help="Stay connected and serve the JSON control API on this Unix socket",
+    )
+
+    parser.add_argument(
+        "--config",
+        type=str,
+        help="Keep the devices in a TOML config file in their configured state",
     )
 
     args = parser.parse_args()
 
-    d = HPA250B(BleakDelegate(args.address))
+    if args.config:
+        await correct_drift(args.config, args.pipelined)
+        return
+
+    if not args.address:
+        parser.error("--address is required")
+
+    if args.socket:
+        await serve(args.address, args.socket, args.pipelined)
+        return
+
+    d = HPA250B(BleakDelegate(args.address[0]))
 
     logging.info(f"Connecting")
     await d.connect()
@@ -30,10 +66,36 @@ async def main():
         voc_light=None,
         timer=None,
     )
-    await reconcile(d, desired)
+    await reconcile(d, desired, pipelined=args.pipelined)
 
     logging.info(f"State after reconciliation: {d.current_state}")
 
 
+async def serve(addresses: list[str], socket: str, pipelined: bool):
+    async with ScanCache() as scan_cache:
+        fleet = Fleet.from_addresses(addresses, scan_cache=scan_cache)
+        daemon = Daemon(fleet, pipelined=pipelined)
+        await daemon.start(socket)
+        try:
+            await daemon.serve_forever()
+        finally:
+            await daemon.close()
+
+
+async def correct_drift(path: str, pipelined: bool):
+    config = load_config(path)
+    async with ScanCache() as scan_cache:
+        fleet = Fleet.from_addresses(config.devices, scan_cache=scan_cache)
+        await fleet.connect()
+        correctors = [
+            DriftCorrector(device, config.devices[key], pipelined=pipelined)
+            for key, device in fleet.devices.items()
+        ]
+        try:
+            await asyncio.gather(*(c.run() for c in correctors))
+        finally:
+            await fleet.disconnect()
+
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,122 @@
+# Vectorised decoding of captured STATE notifications. Requires the optional
+# NumPy dependency: pip install hpa250b-ble[bulk]
+from dataclasses import dataclass
+from typing import Iterator
+import numpy as np
+from .const import PREAMBLE
+from .enums import Backlight, Preset, VOCLight
+from .state import (
+    AUTO_PRESETS,
+    BACKLIGHT_FROM_INT,
+    BACKLIGHT_MASK,
+    IS_ON,
+    PRESETS_BY_PRIORITY,
+    STATE_SIZE,
+    TIMER_MASK,
+    VOC_LIGHT_FROM_INT,
+    VOC_LIGHT_MASK,
+    State,
+)
+
+FRAME_SIZE = STATE_SIZE
+# the preamble and the 32-bit state word; the device sometimes omits the
+# trailing zero bytes
+MIN_FRAME_SIZE = 5
+
+# Lookup tables for the code columns; -1 stands for None
+PRESETS = list(Preset)
+BACKLIGHTS = list(Backlight)
+VOC_LIGHTS = list(VOCLight)
+
+
+@dataclass(frozen=True)
+class DecodedFrames:
+    words: np.ndarray
+    valid: np.ndarray
+    is_on: np.ndarray
+    preset: np.ndarray
+    backlight: np.ndarray
+    voc_light: np.ndarray
+    # 0 when no timer is set
+    timer: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    @property
+    def malformed(self) -> np.ndarray:
+        return np.flatnonzero(~self.valid)
+
+    def state(self, row: int) -> State | None:
+        if not self.valid[row]:
+            return None
+        return State.from_int(int(self.words[row]))
+
+    def states(self) -> Iterator[State | None]:
+        # decoded one row at a time, only as far as the caller iterates
+        return (self.state(row) for row in range(len(self)))
+
+
+def decode_frames(
+    frames: bytes | bytearray | memoryview | np.ndarray, frame_size: int = FRAME_SIZE
+) -> DecodedFrames:
+    # Accepts either a contiguous buffer of frame_size-byte frames or a 2-D
+    # uint8 array with one frame per row
+    if isinstance(frames, np.ndarray):
+        rows = frames
+    else:
+        buffer = np.frombuffer(frames, dtype=np.uint8)
+        if len(buffer) % frame_size:
+            raise ValueError(
+                f"buffer of {len(buffer)} bytes is not a whole number of "
+                + f"{frame_size}-byte frames"
+            )
+        rows = buffer.reshape(-1, frame_size)
+    if rows.ndim != 2 or rows.shape[1] < MIN_FRAME_SIZE:
+        raise ValueError(f"expected rows of at least {MIN_FRAME_SIZE} bytes")
+
+    rows = rows.astype(np.uint32, copy=False)
+    words = rows[:, 1] << 24 | rows[:, 2] << 16 | rows[:, 3] << 8 | rows[:, 4]
+    return decode_words(words, rows[:, 0] == PREAMBLE)
+
+
+def decode_words(words: np.ndarray, valid: np.ndarray | None = None) -> DecodedFrames:
+    # Same bit layout as State.from_int, one column at a time
+    words = np.asarray(words, dtype=np.uint32)
+    valid = np.ones(len(words), dtype=bool) if valid is None else valid.copy()
+    is_on = (words & IS_ON) != 0
+
+    preset = np.select(
+        [(words & bits) == bits for bits, _ in PRESETS_BY_PRIORITY],
+        [PRESETS.index(p) for _, p in PRESETS_BY_PRIORITY],
+        default=-1,
+    )
+    valid &= ~is_on | (preset >= 0)
+
+    backlight_bits = (words & BACKLIGHT_MASK) >> 16
+    backlight = _lookup(backlight_bits, BACKLIGHT_FROM_INT, BACKLIGHTS)
+    valid &= ~is_on | (backlight >= 0)
+
+    auto = np.isin(preset, [PRESETS.index(p) for p in AUTO_PRESETS])
+    voc_bits = (words & VOC_LIGHT_MASK) >> 16
+    voc_light = _lookup(voc_bits, VOC_LIGHT_FROM_INT, VOC_LIGHTS)
+    valid &= ~(is_on & auto) | (voc_light >= 0)
+
+    on = is_on & valid
+    return DecodedFrames(
+        words=words,
+        valid=valid,
+        is_on=on,
+        preset=np.where(on, preset, -1).astype(np.int8),
+        backlight=np.where(on, backlight, -1).astype(np.int8),
+        voc_light=np.where(on & auto, voc_light, -1).astype(np.int8),
+        timer=np.where(on, words & TIMER_MASK, 0).astype(np.uint8),
+    )
+
+
+def _lookup(bits: np.ndarray, table: dict, values: list) -> np.ndarray:
+    codes = np.full(int(bits.max(initial=0)) + 1, -1, dtype=np.int8)
+    for n, value in table.items():
+        if n < len(codes):
+            codes[n] = values.index(value)
+    return codes[bits]
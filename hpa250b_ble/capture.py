@@ -0,0 +1,298 @@
+import asyncio
+import os
+import struct
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Awaitable, BinaryIO, Callable
+from . import _LOGGER
+from .const import COMMAND_UUID, STATE_UUID, SYSTEM_ID_UUID
+from .hpa250b import BTClient, BTClientDisconnectedError, Delegate
+from .state import State
+
+# Capture file: an 8-byte header followed by records of
+# <float64 seconds since capture start> <uint8 kind> <uint8 characteristic>
+# <uint16 payload length> <payload>
+_MAGIC = b"HPACAP\x01\x00"
+_RECORD = struct.Struct("<dBBH")
+_UUIDS = [SYSTEM_ID_UUID, COMMAND_UUID, STATE_UUID]
+_NO_UUID = 0xFF
+
+
+class CaptureKind(IntEnum):
+    # payload is the device address
+    CONNECT = 1
+    DISCONNECT = 2
+    # the device or the adapter dropped the link
+    LINK_LOST = 3
+    READ = 4
+    WRITE = 5
+    NOTIFY = 6
+
+
+@dataclass(frozen=True)
+class CaptureEvent:
+    timestamp: float
+    kind: CaptureKind
+    uuid: str | None
+    data: bytes
+
+
+class CaptureWriter:
+    def __init__(self, path: str | os.PathLike):
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(_MAGIC)
+        self._started_at = time.monotonic()
+
+    def write(self, kind: CaptureKind, uuid: str | None = None, data: bytes = b""):
+        code = _NO_UUID if uuid is None else _UUIDS.index(uuid)
+        timestamp = time.monotonic() - self._started_at
+        self._file.write(_RECORD.pack(timestamp, kind, code, len(data)) + data)
+        # captures matter most when the process dies, so nothing is held back
+        self._file.flush()
+
+    def close(self):
+        self._file.flush()
+        self._file.close()
+
+    def __enter__(self) -> "CaptureWriter":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def read_capture(path: str | os.PathLike) -> list[CaptureEvent]:
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(_MAGIC):
+        raise ValueError(f"not a capture file: {path}")
+
+    events = []
+    offset = len(_MAGIC)
+    while offset + _RECORD.size <= len(data):
+        timestamp, kind, code, length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        payload = data[offset : offset + length]
+        if len(payload) < length:
+            _LOGGER.warning("ignoring truncated record at the end of %s", path)
+            break
+        offset += length
+        uuid = None if code == _NO_UUID else _UUIDS[code]
+        events.append(CaptureEvent(timestamp, CaptureKind(kind), uuid, payload))
+    return events
+
+
+class RecordingBTClient(BTClient):
+    def __init__(self, client: BTClient, writer: CaptureWriter):
+        self._client = client
+        self._writer = writer
+
+    @property
+    def address(self) -> str:
+        return self._client.address
+
+    @property
+    def name(self) -> str:
+        return self._client.name
+
+    @property
+    def is_connected(self) -> bool:
+        return self._client.is_connected
+
+    async def connect(self):
+        await self._client.connect()
+        self._writer.write(CaptureKind.CONNECT, data=self.address.encode())
+
+    async def disconnect(self):
+        self._writer.write(CaptureKind.DISCONNECT)
+        await self._client.disconnect()
+
+    async def read_gatt_char(self, uuid: str) -> bytes:
+        data = await self._client.read_gatt_char(uuid)
+        self._writer.write(CaptureKind.READ, uuid, bytes(data))
+        return data
+
+    async def write_gatt_char(self, uuid: str, data: bytes):
+        self._writer.write(CaptureKind.WRITE, uuid, bytes(data))
+        return await self._client.write_gatt_char(uuid, data)
+
+    async def start_notify(
+        self, uuid: str, callback: Callable[[bytes], Awaitable[None]]
+    ):
+        async def record(data: bytes):
+            self._writer.write(CaptureKind.NOTIFY, uuid, bytes(data))
+            await callback(data)
+
+        return await self._client.start_notify(uuid, record)
+
+
+class RecordingDelegate(Delegate):
+    def __init__(self, delegate: Delegate, writer: CaptureWriter):
+        self._delegate = delegate
+        self._writer = writer
+
+    async def make_bt_client(
+        self, handle_disconnect: Callable[[], Awaitable[None]]
+    ) -> BTClient | None:
+        async def record_link_lost():
+            self._writer.write(CaptureKind.LINK_LOST)
+            await handle_disconnect()
+
+        client = await self._delegate.make_bt_client(record_link_lost)
+        if client is None:
+            return None
+        return RecordingBTClient(client, self._writer)
+
+    async def handle_update(self, state: State):
+        await self._delegate.handle_update(state)
+
+
+class ReplayBTClient(BTClient):
+    # Plays a capture back to whoever drives it. Reads return the captured
+    # values, and each write releases the notifications (and link losses)
+    # captured after the matching write, either with their original spacing
+    # divided by speed, or as fast as possible.
+    def __init__(
+        self, events: list[CaptureEvent], realtime: bool = False, speed: float = 1.0
+    ):
+        self._realtime = realtime
+        self._speed = speed
+        self._address = next(
+            (e.data.decode() for e in events if e.kind == CaptureKind.CONNECT),
+            "<replay>",
+        )
+        self._reads: dict[str | None, deque[bytes]] = {}
+        self._writes: list[CaptureEvent] = []
+        # events following each write; the first group precedes any write
+        self._segments: list[list[CaptureEvent]] = [[]]
+        for e in events:
+            if e.kind == CaptureKind.READ:
+                self._reads.setdefault(e.uuid, deque()).append(e.data)
+            elif e.kind == CaptureKind.WRITE:
+                self._writes.append(e)
+                self._segments.append([])
+            elif e.kind != CaptureKind.CONNECT:
+                self._segments[-1].append(e)
+
+        self._next_write = 0
+        self._leading_delivered = False
+        self._is_connected = False
+        self._notify_callback: Callable[[bytes], Awaitable[None]] | None = None
+        self._delivery: asyncio.Task | None = None
+        self.disconnected_callback: Callable[[], Awaitable[None]] | None = None
+        self.replayed_notifications = 0
+        self.mismatched_writes = 0
+
+    @classmethod
+    def from_file(cls, path: str | os.PathLike, **kwargs) -> "ReplayBTClient":
+        return cls(read_capture(path), **kwargs)
+
+    @property
+    def address(self) -> str:
+        return self._address
+
+    @property
+    def name(self) -> str:
+        return f"replay {self._address}"
+
+    @property
+    def is_connected(self) -> bool:
+        return self._is_connected
+
+    @property
+    def exhausted(self) -> bool:
+        return self._next_write >= len(self._writes)
+
+    async def connect(self):
+        self._is_connected = True
+
+    async def disconnect(self):
+        self._is_connected = False
+        self._notify_callback = None
+
+    async def read_gatt_char(self, uuid: str) -> bytes:
+        self._check_connected()
+        if not (reads := self._reads.get(uuid)):
+            raise ValueError(f"no more captured reads of {uuid}")
+        return reads.popleft()
+
+    async def write_gatt_char(self, uuid: str, data: bytes):
+        self._check_connected()
+        if self.exhausted:
+            _LOGGER.debug("write beyond the end of the capture")
+            return
+        i, self._next_write = self._next_write, self._next_write + 1
+        captured = self._writes[i]
+        if (captured.uuid, captured.data) != (uuid, bytes(data)):
+            self.mismatched_writes += 1
+            _LOGGER.warning(
+                "replayed write %s differs from captured %s",
+                data.hex(),
+                captured.data.hex(),
+            )
+        self._schedule(captured.timestamp, self._segments[i + 1])
+
+    async def start_notify(
+        self, uuid: str, callback: Callable[[bytes], Awaitable[None]]
+    ):
+        self._check_connected()
+        self._notify_callback = callback
+        if not self._leading_delivered:
+            self._leading_delivered = True
+            self._schedule(None, self._segments[0])
+
+    async def wait_replayed(self):
+        if self._delivery is not None:
+            await asyncio.wait([self._delivery])
+
+    def _check_connected(self):
+        if not self._is_connected:
+            raise BTClientDisconnectedError("replay is not connected")
+
+    def _schedule(self, since: float | None, segment: list[CaptureEvent]):
+        previous = self._delivery
+        self._delivery = asyncio.ensure_future(self._deliver(previous, since, segment))
+
+    async def _deliver(
+        self,
+        previous: asyncio.Task | None,
+        since: float | None,
+        segment: list[CaptureEvent],
+    ):
+        if previous is not None and not previous.done():
+            await asyncio.wait([previous])
+        started_at = time.monotonic()
+        for e in segment:
+            if self._realtime and since is not None:
+                due = started_at + (e.timestamp - since) / self._speed
+                await asyncio.sleep(max(due - time.monotonic(), 0))
+            else:
+                await asyncio.sleep(0)
+            if e.kind == CaptureKind.DISCONNECT:
+                # nothing after the client hung up belongs to this write
+                return
+            if e.kind == CaptureKind.LINK_LOST:
+                self._is_connected = False
+                self._notify_callback = None
+                if self.disconnected_callback is not None:
+                    await self.disconnected_callback()
+                return
+            if self._notify_callback is not None:
+                self.replayed_notifications += 1
+                await self._notify_callback(e.data)
+
+
+class ReplayDelegate(Delegate):
+    def __init__(self, client: ReplayBTClient):
+        self.client = client
+
+    async def make_bt_client(
+        self, handle_disconnect: Callable[[], Awaitable[None]]
+    ) -> BTClient | None:
+        self.client.disconnected_callback = handle_disconnect
+        return self.client
+
+    async def handle_update(self, state: State):
+        pass
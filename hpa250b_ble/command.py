@@ -7,7 +7,10 @@ from .const import PREAMBLE
 # byte 1: 0 0 <toggle voc set> <turbo set> <allergen set> <general set> <germ set> <toggle power set>
 # byte 2: 0 0 0 0 <toggle pollen set> <cycle light set> <timer down set> <timer up set>
 # rest:   pad with 0x00
-_COMMAND_STRUCT_FORMAT = ">BH17x"
+COMMAND_STRUCT = struct.Struct(">BH17x")
+
+# Encoded frames by bitmask; there are only 2^10 distinct commands
+_FRAMES: dict[int, bytes] = {}
 
 TIMER_UP = 1 << 0
 TIMER_DOWN = 1 << 1
@@ -22,11 +25,19 @@ TOGGLE_VOC = 1 << 13
 
 
 class Command:
+    __slots__ = ("command",)
+
     command: int
 
     def __init__(self):
         self.command = 0
 
+    @classmethod
+    def from_int(cls, command: int) -> "Command":
+        cmd = cls()
+        cmd.command = command
+        return cmd
+
     def toggle_power(self) -> "Command":
         self.command |= TOGGLE_POWER
         return self
@@ -109,7 +120,9 @@ class Command:
 
     @property
     def bytes(self) -> bytes:
-        return struct.pack(_COMMAND_STRUCT_FORMAT, PREAMBLE, self.command)
+        if (frame := _FRAMES.get(self.command)) is None:
+            frame = _FRAMES[self.command] = COMMAND_STRUCT.pack(PREAMBLE, self.command)
+        return frame
 
     def __eq__(self, __value: object) -> bool:
         if not isinstance(__value, Command):
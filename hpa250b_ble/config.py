@@ -0,0 +1,126 @@
+import os
+import tomllib
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+from typing import Any
+from .planner import PlanError, plan
+from .serialize import state_from_dict
+from .state import State, StateError
+
+DEBOUNCE_SECONDS = 5.0
+MIN_RECONCILE_INTERVAL_SECONDS = 60.0
+
+# Example:
+#
+#   debounce = 5                  # seconds a drift has to last
+#   min_interval = 60             # seconds between drift corrections
+#
+#   [devices."00:35:FF:09:1A:C0"]
+#   state = { is_on = true, preset = "auto-voc" }
+#
+#   [[devices."00:35:FF:09:1A:C0".schedule]]
+#   from = "22:00"
+#   to = "07:00"
+#   state = { backlight = "dim" }
+#
+# Schedule states override fields of the device's state while active; when
+# several entries are active, later ones win.
+
+
+class ConfigError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class ScheduleEntry:
+    start: time
+    end: time
+    overrides: dict[str, Any]
+
+    def is_active(self, t: time) -> bool:
+        if self.start <= self.end:
+            return self.start <= t < self.end
+        # wraps around midnight
+        return t >= self.start or t < self.end
+
+
+@dataclass(frozen=True)
+class DeviceConfig:
+    address: str
+    state: dict[str, Any]
+    schedule: tuple[ScheduleEntry, ...] = ()
+    debounce: float = DEBOUNCE_SECONDS
+    min_interval: float = MIN_RECONCILE_INTERVAL_SECONDS
+
+    def desired_at(self, now: datetime) -> State:
+        fields = dict(self.state)
+        for entry in self.schedule:
+            if entry.is_active(now.time()):
+                fields.update(entry.overrides)
+        return state_from_dict(fields)
+
+    def seconds_until_change(self, now: datetime) -> float | None:
+        boundaries = [t for e in self.schedule for t in (e.start, e.end)]
+        if not boundaries:
+            return None
+        candidates = []
+        for t in boundaries:
+            at = datetime.combine(now.date(), t, tzinfo=now.tzinfo)
+            if at <= now:
+                at += timedelta(days=1)
+            candidates.append((at - now).total_seconds())
+        return min(candidates)
+
+
+@dataclass(frozen=True)
+class Config:
+    devices: dict[str, DeviceConfig] = field(default_factory=dict)
+
+
+def load_config(path: str | os.PathLike) -> Config:
+    with open(path, "rb") as f:
+        try:
+            data = tomllib.load(f)
+        except tomllib.TOMLDecodeError as e:
+            raise ConfigError(f"{path}: {e}") from e
+    return parse_config(data)
+
+
+def parse_config(data: dict[str, Any]) -> Config:
+    debounce = float(data.get("debounce", DEBOUNCE_SECONDS))
+    min_interval = float(data.get("min_interval", MIN_RECONCILE_INTERVAL_SECONDS))
+
+    devices = {}
+    for address, device in data.get("devices", {}).items():
+        try:
+            config = DeviceConfig(
+                address=address,
+                state=dict(device.get("state", {})),
+                schedule=tuple(_schedule_entry(e) for e in device.get("schedule", [])),
+                debounce=float(device.get("debounce", debounce)),
+                min_interval=float(device.get("min_interval", min_interval)),
+            )
+            # every entry has to produce a valid state on its own, and one the
+            # buttons can reach, e.g. no timer above 18 hours
+            config.desired_at(datetime.min)
+            for fields in [{}, *(e.overrides for e in config.schedule)]:
+                plan(State.empty(), state_from_dict(config.state | fields))
+        except (
+            ConfigError,
+            PlanError,
+            StateError,
+            TypeError,
+            ValueError,
+            AttributeError,
+        ) as e:
+            raise ConfigError(f"device {address}: {e}") from e
+        devices[address] = config
+    return Config(devices)
+
+
+def _schedule_entry(data: dict[str, Any]) -> ScheduleEntry:
+    try:
+        start, end = (time.fromisoformat(data[k]) for k in ("from", "to"))
+    except KeyError as e:
+        raise ConfigError(f"schedule entry without {e}") from None
+    return ScheduleEntry(start, end, dict(data.get("state", {})))
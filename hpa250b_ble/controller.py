@@ -0,0 +1,90 @@
+import asyncio
+from . import _LOGGER
+from .instrumentation import NOOP, Instrumentation
+from .models import HPA250BModel
+from .reconcile import ReconcileSupersededError, reconcile
+from .state import State
+
+
+class DeviceController:
+    def __init__(
+        self,
+        device: HPA250BModel,
+        pipelined: bool = False,
+        instrumentation: Instrumentation = NOOP,
+    ):
+        self._device = device
+        self._pipelined = pipelined
+        self._instrumentation = instrumentation
+        self._pending: tuple[State, list[asyncio.Future[State]]] | None = None
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def device(self) -> HPA250BModel:
+        return self._device
+
+    def submit(self, desired: State) -> asyncio.Future[State]:
+        future: asyncio.Future[State] = asyncio.get_running_loop().create_future()
+
+        if self._pending is not None:
+            pending, futures = self._pending
+            if pending.matches_desired_state(desired):
+                futures.append(future)
+                return future
+            # Only the latest intent is worth the radio time
+            _LOGGER.debug("%s superseded by %s before it started", pending, desired)
+            for f in futures:
+                _supersede(f, self._device, pending)
+
+        self._pending = (desired, [future])
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        return future
+
+    async def set_desired(self, desired: State) -> State:
+        return await self.submit(desired)
+
+    async def close(self):
+        if self._pending is not None:
+            pending, futures = self._pending
+            self._pending = None
+            for f in futures:
+                _supersede(f, self._device, pending)
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.wait([self._worker])
+
+    async def _run(self):
+        while self._pending is not None:
+            desired, futures = self._pending
+            self._pending = None
+            try:
+                await reconcile(
+                    self._device,
+                    desired,
+                    pipelined=self._pipelined,
+                    instrumentation=self._instrumentation,
+                )
+            except asyncio.CancelledError:
+                for f in futures:
+                    f.cancel()
+                raise
+            except Exception as e:
+                for f in futures:
+                    if not f.done():
+                        f.set_exception(e)
+            else:
+                for f in futures:
+                    if not f.done():
+                        f.set_result(self._device.current_state)
+
+
+def _supersede(future: asyncio.Future[State], device: HPA250BModel, desired: State):
+    if future.done():
+        return
+    future.set_exception(
+        ReconcileSupersededError("superseded by a newer desired state", device, desired)
+    )
+    # Callers that fire and forget never await superseded futures; mark the
+    # exception as retrieved so asyncio does not log it
+    future.exception()
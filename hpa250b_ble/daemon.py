@@ -0,0 +1,185 @@
+import asyncio
+import contextlib
+import json
+import os
+from typing import Any
+from . import _LOGGER
+from .controller import DeviceController
+from .fleet import Fleet
+from .hpa250b import HPA250B
+from .serialize import state_from_dict, state_to_dict
+from .subscription import OverflowPolicy
+
+
+class DaemonError(Exception):
+    pass
+
+
+class Daemon:
+    # Keeps a fleet connected and serves newline-delimited JSON requests on a
+    # Unix socket:
+    #   {"op": "devices"}
+    #   {"op": "get-state", "device": "..."}
+    #   {"op": "set-desired-state", "device": "...", "state": {...}}
+    #   {"op": "subscribe", "device": "..."}
+    # Every response carries the request's "id", if any. Requests for the
+    # same device are batched by its DeviceController: only the latest
+    # desired state waiting to be applied is reconciled.
+    def __init__(self, fleet: Fleet, pipelined: bool = False):
+        self._fleet = fleet
+        self._controllers = {
+            key: DeviceController(device, pipelined=pipelined)
+            for key, device in fleet.devices.items()
+        }
+        self._connect_locks = {key: asyncio.Lock() for key in fleet.devices}
+        self._server: asyncio.AbstractServer | None = None
+        self._clients: dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self._closing = False
+
+    @property
+    def controllers(self) -> dict[str, DeviceController]:
+        return self._controllers
+
+    async def start(self, path: str | os.PathLike):
+        for key, result in (await self._fleet.connect()).items():
+            if not result.ok:
+                # the next request for the device tries again
+                _LOGGER.warning("could not connect to %s: %r", key, result.error)
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+        self._server = await asyncio.start_unix_server(self._serve, path)
+        _LOGGER.info("listening on %s", path)
+
+    async def serve_forever(self):
+        if self._server is None:
+            raise DaemonError("daemon has not been started")
+        await self._server.serve_forever()
+
+    async def close(self):
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+        # wait_closed() waits for every open connection on newer Pythons, so
+        # the clients have to be hung up on first
+        for task, writer in self._clients.items():
+            writer.close()
+            task.cancel()
+        await asyncio.gather(*self._clients, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        for controller in self._controllers.values():
+            await controller.close()
+        await self._fleet.disconnect()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        requests: set[asyncio.Task] = set()
+        client = asyncio.current_task()
+        if client is not None:
+            self._clients[client] = writer
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise DaemonError("request must be a JSON object")
+                except (ValueError, DaemonError) as e:
+                    _respond(writer, None, error=str(e))
+                    continue
+
+                if request.get("op") == "subscribe":
+                    await self._subscribe(request, reader, writer)
+                    break
+                # requests run concurrently so a slow reconcile does not hold
+                # up the rest of this client's requests
+                task = asyncio.create_task(self._handle(request, writer))
+                requests.add(task)
+                task.add_done_callback(requests.discard)
+            if requests:
+                await asyncio.wait(requests)
+        except ConnectionError:
+            pass
+        except asyncio.CancelledError:
+            # the daemon is closing; ending normally keeps the server from
+            # logging the cancellation
+            if not self._closing:
+                raise
+        finally:
+            for task in requests:
+                task.cancel()
+            if client is not None:
+                self._clients.pop(client, None)
+            writer.close()
+
+    async def _handle(self, request: dict[str, Any], writer: asyncio.StreamWriter):
+        request_id = request.get("id")
+        try:
+            match request.get("op"):
+                case "devices":
+                    result: Any = {
+                        key: {"connected": d.is_connected}
+                        for key, d in self._fleet.devices.items()
+                    }
+                case "get-state":
+                    device = await self._connected(request)
+                    result = state_to_dict(device.current_state)
+                case "set-desired-state":
+                    desired = state_from_dict(request.get("state") or {})
+                    await self._connected(request)
+                    controller = self._controllers[request["device"]]
+                    result = state_to_dict(await controller.set_desired(desired))
+                case op:
+                    raise DaemonError(f"unknown op: {op!r}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _respond(writer, request_id, error=str(e))
+        else:
+            _respond(writer, request_id, result=result)
+
+    async def _subscribe(
+        self,
+        request: dict[str, Any],
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ):
+        request_id = request.get("id")
+        try:
+            device = await self._connected(request)
+        except Exception as e:
+            _respond(writer, request_id, error=str(e))
+            return
+
+        async with device.subscribe(policy=OverflowPolicy.DROP_OLDEST) as subscription:
+            # the stream ends when the client hangs up
+            hangup = asyncio.create_task(reader.read())
+            hangup.add_done_callback(lambda _: subscription.close())
+            try:
+                _respond(writer, request_id, result=state_to_dict(device.current_state))
+                async for state in subscription:
+                    _respond(writer, request_id, result=state_to_dict(state))
+                    await writer.drain()
+            finally:
+                hangup.cancel()
+
+    async def _connected(self, request: dict[str, Any]) -> HPA250B:
+        key = request.get("device")
+        if key not in self._fleet.devices:
+            raise DaemonError(f"unknown device: {key!r}")
+        device = self._fleet.devices[key]
+        async with self._connect_locks[key]:
+            if not device.is_connected:
+                await device.connect()
+        return device
+
+
+def _respond(
+    writer: asyncio.StreamWriter,
+    request_id: Any,
+    result: Any = None,
+    error: str | None = None,
+):
+    if error is not None:
+        response = {"id": request_id, "ok": False, "error": error}
+    else:
+        response = {"id": request_id, "ok": True, "result": result}
+    writer.write(json.dumps(response).encode() + b"\n")
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from typing import Any, Callable
+from bleak import BleakScanner
+from bleak.backends.device import BLEDevice
+from . import _LOGGER
+
+SCAN_CACHE_TTL_SECONDS = 60
+SCAN_TIMEOUT_SECONDS = 10
+
+
+class ScanCache:
+    def __init__(
+        self,
+        ttl: float = SCAN_CACHE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        scanner_factory: Callable[..., Any] = BleakScanner,
+        adapter: str | None = None,
+    ):
+        self._ttl = ttl
+        self._clock = clock
+        self._scanner_factory = scanner_factory
+        self._adapter = adapter
+        # BleakClient connects through the adapter of the BLEDevice it is
+        # given, so this is also the adapter every resolved device uses
+        self._scanner_kwargs = {} if adapter is None else {"adapter": adapter}
+        self._scanner: Any = None
+        self._devices: dict[str, tuple[float, BLEDevice]] = {}
+        self._waiters: dict[str, list[asyncio.Future[BLEDevice]]] = {}
+        self._evicted_at = clock()
+
+    @property
+    def adapter(self) -> str | None:
+        return self._adapter
+
+    @property
+    def is_scanning(self) -> bool:
+        return self._scanner is not None
+
+    async def start(self):
+        if self.is_scanning:
+            return
+        _LOGGER.debug("starting shared scanner")
+        scanner = self._scanner_factory(
+            detection_callback=self._handle_advertisement, **self._scanner_kwargs
+        )
+        await scanner.start()
+        self._scanner = scanner
+
+    async def stop(self):
+        if not self.is_scanning:
+            return
+        _LOGGER.debug("stopping shared scanner")
+        scanner, self._scanner = self._scanner, None
+        await scanner.stop()
+
+    async def __aenter__(self) -> "ScanCache":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_):
+        await self.stop()
+
+    def get(self, address: str) -> BLEDevice | None:
+        key = address.upper()
+        if (entry := self._devices.get(key)) is None:
+            return None
+        seen_at, device = entry
+        if self._clock() - seen_at > self._ttl:
+            del self._devices[key]
+            return None
+        return device
+
+    async def find(
+        self, address: str, timeout: float = SCAN_TIMEOUT_SECONDS
+    ) -> BLEDevice | None:
+        if (device := self.get(address)) is not None:
+            return device
+
+        if not self.is_scanning:
+            _LOGGER.debug("scan cache miss for %s; scanning", address)
+            device = await self._scanner_factory.find_device_by_address(
+                address, timeout=timeout, **self._scanner_kwargs
+            )
+            if device is not None:
+                self._remember(device)
+            return device
+
+        # The shared scanner is already listening; wait for an advertisement
+        # rather than starting a competing scan
+        _LOGGER.debug("scan cache miss for %s; waiting for advertisement", address)
+        key = address.upper()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, []).append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout=timeout)
+        except TimeoutError:
+            return None
+        finally:
+            self._waiters[key].remove(waiter)
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    def _handle_advertisement(self, device: BLEDevice, _: Any):
+        self._remember(device)
+        for waiter in self._waiters.get(device.address.upper(), []):
+            if not waiter.done():
+                waiter.set_result(device)
+
+    def _remember(self, device: BLEDevice):
+        now = self._clock()
+        self._devices[device.address.upper()] = (now, device)
+
+        if now - self._evicted_at > self._ttl:
+            self._evicted_at = now
+            self._devices = {
+                k: v for k, v in self._devices.items() if now - v[0] <= self._ttl
+            }
@@ -0,0 +1,103 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+from . import _LOGGER
+from .config import DeviceConfig
+from .hpa250b import HPA250B
+from .reconcile import reconcile
+from .simulation import Clock, RealClock
+from .state import State
+from .subscription import Subscription
+
+
+@dataclass
+class DriftStats:
+    drifts: int = 0
+    corrections: int = 0
+    failures: int = 0
+
+
+class DriftCorrector:
+    # Watches a device's notifications and reconciles it only when it drifts
+    # from its configured state. A drift (e.g. someone pressing a button)
+    # has to last for the debounce period, and drift corrections of one
+    # device are at least min_interval apart. Startup and schedule changes
+    # are not drifts: the new desired state is applied right away, without
+    # waiting for the debounce or min_interval.
+    def __init__(
+        self,
+        device: HPA250B,
+        config: DeviceConfig,
+        pipelined: bool = False,
+        clock: Clock | None = None,
+        now: Callable[[], datetime] = datetime.now,
+    ):
+        self._device = device
+        self._config = config
+        self._pipelined = pipelined
+        self._clock = clock or RealClock()
+        self._now = now
+        self._last_reconcile_at: float | None = None
+        self.stats = DriftStats()
+
+    async def run(self):
+        async with self._device.subscribe() as subscription:
+            desired: State | None = None
+            drifted_since: float | None = None
+            while True:
+                previous, desired = desired, self._config.desired_at(self._now())
+                now = self._clock.time()
+                wake = self._config.seconds_until_change(self._now())
+
+                if self._device.current_state.matches_desired_state(desired):
+                    drifted_since = None
+                elif desired is not previous:
+                    drifted_since = None
+                    await self._correct(desired)
+                    continue
+                else:
+                    if drifted_since is None:
+                        self.stats.drifts += 1
+                        drifted_since = now
+                    ready_at = drifted_since + self._config.debounce
+                    if self._last_reconcile_at is not None:
+                        ready_at = max(
+                            ready_at,
+                            self._last_reconcile_at + self._config.min_interval,
+                        )
+                    if now >= ready_at:
+                        await self._correct(desired)
+                        drifted_since = None
+                        continue
+                    wake = ready_at - now if wake is None else min(wake, ready_at - now)
+
+                await _next_state(subscription, self._clock, wake)
+
+    async def _correct(self, desired: State):
+        self._last_reconcile_at = self._clock.time()
+        _LOGGER.info("%s drifted; reconciling to %s", self._config.address, desired)
+        try:
+            if not self._device.is_connected:
+                await self._device.connect()
+            await reconcile(self._device, desired, pipelined=self._pipelined)
+        except Exception as e:
+            self.stats.failures += 1
+            _LOGGER.warning("reconciling %s failed: %r", self._config.address, e)
+        else:
+            self.stats.corrections += 1
+
+
+async def _next_state(subscription: Subscription, clock: Clock, timeout: float | None):
+    next_state = asyncio.ensure_future(anext(subscription))
+    waiters = {next_state}
+    if timeout is not None:
+        waiters.add(asyncio.ensure_future(clock.sleep(timeout)))
+    try:
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+    if next_state.done() and not next_state.cancelled():
+        # a closed subscription ends with StopAsyncIteration
+        next_state.exception()
@@ -0,0 +1,108 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable, Mapping
+from . import _LOGGER
+from .discovery import ScanCache
+from .hpa250b import HPA250B, BleakDelegate, Delegate
+from .instrumentation import NOOP, EventHook, Instrumentation
+from .reconcile import reconcile
+from .state import State
+
+# BLE adapters tend to fail connections when too many are attempted at once
+MAX_CONCURRENT_CONNECTS = 3
+
+
+@dataclass(frozen=True)
+class FleetResult:
+    state: State
+    error: BaseException | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class Fleet:
+    def __init__(
+        self,
+        delegates: Mapping[str, Delegate],
+        max_concurrent_connects: int = MAX_CONCURRENT_CONNECTS,
+        pipelined: bool = False,
+        instrumentation: Instrumentation = NOOP,
+        event_hook: EventHook | None = None,
+    ):
+        self._devices = {
+            key: HPA250B(d, instrumentation=instrumentation, event_hook=event_hook)
+            for key, d in delegates.items()
+        }
+        self._connect_slots = asyncio.Semaphore(max_concurrent_connects)
+        self._pipelined = pipelined
+        self._instrumentation = instrumentation
+
+    @classmethod
+    def from_addresses(
+        cls, addresses: Iterable[str], scan_cache: ScanCache | None = None, **kwargs
+    ) -> "Fleet":
+        instrumentation = kwargs.get("instrumentation", NOOP)
+        return cls(
+            {
+                address: BleakDelegate(address, scan_cache, instrumentation)
+                for address in addresses
+            },
+            **kwargs,
+        )
+
+    @property
+    def devices(self) -> dict[str, HPA250B]:
+        return self._devices
+
+    async def connect(self) -> dict[str, FleetResult]:
+        return await self._run(self._devices, self._connect)
+
+    async def disconnect(self) -> dict[str, FleetResult]:
+        async def disconnect(_: str, device: HPA250B):
+            await device.disconnect()
+
+        return await self._run(self._devices, disconnect)
+
+    async def reconcile(
+        self, desired: State | Mapping[str, State]
+    ) -> dict[str, FleetResult]:
+        if isinstance(desired, State):
+            desired = {key: desired for key in self._devices}
+
+        async def connect_and_reconcile(key: str, device: HPA250B):
+            await self._connect(key, device)
+            await reconcile(
+                device,
+                desired[key],
+                pipelined=self._pipelined,
+                instrumentation=self._instrumentation,
+            )
+
+        devices = {k: d for k, d in self._devices.items() if k in desired}
+        return await self._run(devices, connect_and_reconcile)
+
+    async def _connect(self, key: str, device: HPA250B):
+        if device.is_connected:
+            return
+        async with self._connect_slots:
+            _LOGGER.debug("connecting to %s", key)
+            await device.connect()
+
+    async def _run(
+        self,
+        devices: dict[str, HPA250B],
+        fn: Callable[[str, HPA250B], Awaitable[None]],
+    ) -> dict[str, FleetResult]:
+        results = await asyncio.gather(
+            *(fn(key, device) for key, device in devices.items()),
+            return_exceptions=True,
+        )
+        return {
+            key: FleetResult(
+                device.current_state,
+                result if isinstance(result, BaseException) else None,
+            )
+            for (key, device), result in zip(devices.items(), results)
+        }
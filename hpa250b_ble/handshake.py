@@ -0,0 +1,66 @@
+import binascii
+import json
+import os
+from pathlib import Path
+from typing import Protocol
+from . import _LOGGER
+
+
+class HandshakeCache(Protocol):
+    def get(self, address: str) -> bytes | None:
+        ...
+
+    def put(self, address: str, mac: bytes):
+        ...
+
+    def invalidate(self, address: str):
+        ...
+
+
+class MemoryHandshakeCache(HandshakeCache):
+    def __init__(self):
+        self._macs: dict[str, bytes] = {}
+
+    def get(self, address: str) -> bytes | None:
+        return self._macs.get(address.upper())
+
+    def put(self, address: str, mac: bytes):
+        self._macs[address.upper()] = bytes(mac)
+
+    def invalidate(self, address: str):
+        self._macs.pop(address.upper(), None)
+
+
+class JSONHandshakeCache(MemoryHandshakeCache):
+    def __init__(self, path: str | os.PathLike):
+        super().__init__()
+        self._path = Path(path)
+        try:
+            with self._path.open() as f:
+                # older or hand-edited files may have lowercase addresses
+                self._macs = {
+                    k.upper(): binascii.unhexlify(v) for k, v in json.load(f).items()
+                }
+        except FileNotFoundError:
+            pass
+        except (ValueError, AttributeError, binascii.Error) as e:
+            _LOGGER.warning("ignoring unreadable handshake cache %s: %s", self._path, e)
+
+    def put(self, address: str, mac: bytes):
+        if self.get(address) == mac:
+            return
+        super().put(address, mac)
+        self._save()
+
+    def invalidate(self, address: str):
+        if self.get(address) is None:
+            return
+        super().invalidate(address)
+        self._save()
+
+    def _save(self):
+        # write-then-rename so a crash never leaves a truncated cache behind
+        tmp = self._path.with_suffix(self._path.suffix + ".tmp")
+        with tmp.open("w") as f:
+            json.dump({k: v.hex() for k, v in self._macs.items()}, f)
+        tmp.replace(self._path)
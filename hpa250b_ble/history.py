@@ -0,0 +1,180 @@
+import mmap
+import os
+import re
+import struct
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Hashable, Iterator
+from . import _LOGGER
+from .hpa250b import HPA250B
+from .state import State
+from .subscription import OverflowPolicy
+
+# One append-only file per device: an 8-byte header followed by fixed-width
+# records of <float64 unix timestamp> <uint32 state word>. A record is only
+# written when the state changes, so each one starts a run that lasts until
+# the next record.
+_MAGIC = b"HPA250B\x01"
+_RECORD = struct.Struct("<dI")
+_SUFFIX = ".states"
+# MAC addresses, or the UUIDs macOS uses in their place; anything else could
+# name a file outside the history directory
+_DEVICE_RE = re.compile(r"[0-9A-F]+(?:[:-][0-9A-F]+)*")
+
+
+class StateHistoryError(Exception):
+    pass
+
+
+class StateHistory:
+    def __init__(self, directory: str | os.PathLike):
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._files: dict[str, BinaryIO] = {}
+        self._last: dict[str, tuple[float, int]] = {}
+
+    def devices(self) -> list[str]:
+        return sorted(
+            p.name[: -len(_SUFFIX)].replace("_", ":")
+            for p in self._directory.glob(f"*{_SUFFIX}")
+        )
+
+    def record(self, device: str, state: State, timestamp: float | None = None) -> bool:
+        key = device.upper()
+        f = self._open(key)
+        word = state.to_int()
+        if (last := self._last.get(key)) is not None and last[1] == word:
+            return False
+        if timestamp is None:
+            timestamp = time.time()
+        f.write(_RECORD.pack(timestamp, word))
+        f.flush()
+        self._last[key] = (timestamp, word)
+        return True
+
+    def last(self, device: str) -> tuple[float, State] | None:
+        key = device.upper()
+        self._open(key)
+        if (last := self._last.get(key)) is None:
+            return None
+        return last[0], State.from_int(last[1])
+
+    def query(
+        self, device: str, start: float | None = None, end: float | None = None
+    ) -> Iterator[tuple[float, State]]:
+        # Yields the runs that start in [start, end), decoding each State
+        # only when it is reached
+        return self._scan(device, start, end, False)
+
+    def durations(
+        self,
+        device: str,
+        start: float,
+        end: float,
+        key: Callable[[State], Hashable] = lambda state: state.preset,
+    ) -> dict[Hashable, float]:
+        # Seconds spent in each key(state) between start and end, e.g. time
+        # per preset; includes the run already in progress at start
+        totals: dict[Hashable, float] = {}
+        current: State | None = None
+        since = start
+        for timestamp, state in self._scan(device, start, end, True):
+            if current is not None and timestamp > since:
+                k = key(current)
+                totals[k] = totals.get(k, 0.0) + timestamp - since
+            current, since = state, max(timestamp, start)
+        if current is not None:
+            k = key(current)
+            totals[k] = totals.get(k, 0.0) + end - since
+        return totals
+
+    async def follow(self, device: str, hpa250b: HPA250B):
+        # Records every state the device dispatches until cancelled
+        async with hpa250b.subscribe(policy=OverflowPolicy.DROP_OLDEST) as subscription:
+            self.record(device, hpa250b.current_state)
+            async for state in subscription:
+                self.record(device, state)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def __enter__(self) -> "StateHistory":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _scan(
+        self,
+        device: str,
+        start: float | None,
+        end: float | None,
+        in_progress: bool,
+    ) -> Iterator[tuple[float, State]]:
+        path = self._path(device)
+        if not path.exists():
+            return
+        with path.open("rb") as f:
+            if os.fstat(f.fileno()).st_size <= len(_MAGIC):
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                count = (len(data) - len(_MAGIC)) // _RECORD.size
+                first = 0 if start is None else _bisect(data, count, start)
+                if in_progress and first > 0:
+                    # the run that started before start and is still going
+                    first -= 1
+                for i in range(first, count):
+                    timestamp, word = _RECORD.unpack_from(data, _offset(i))
+                    if end is not None and timestamp >= end:
+                        break
+                    yield timestamp, State.from_int(word)
+
+    def _path(self, device: str) -> Path:
+        if not _DEVICE_RE.fullmatch(device.upper()):
+            raise StateHistoryError(f"not a device address: {device!r}")
+        return self._directory / (device.upper().replace(":", "_") + _SUFFIX)
+
+    def _open(self, device: str) -> BinaryIO:
+        if (f := self._files.get(device)) is not None:
+            return f
+
+        path = self._path(device)
+        f = path.open("a+b")
+        f.seek(0)
+        header = f.read(len(_MAGIC))
+        if not header:
+            f.write(_MAGIC)
+            f.flush()
+        elif header != _MAGIC:
+            f.close()
+            raise StateHistoryError(f"not a state history file: {path}")
+        else:
+            size = f.seek(0, os.SEEK_END)
+            # a torn final write leaves a partial record; ignore it
+            records = (size - len(_MAGIC)) // _RECORD.size
+            if size != _offset(records):
+                _LOGGER.warning("truncating partial record in %s", path)
+                f.truncate(_offset(records))
+            if records:
+                f.seek(_offset(records - 1))
+                self._last[device] = _RECORD.unpack(f.read(_RECORD.size))
+        self._files[device] = f
+        return f
+
+
+def _offset(i: int) -> int:
+    return len(_MAGIC) + i * _RECORD.size
+
+
+def _bisect(data: mmap.mmap, count: int, timestamp: float) -> int:
+    # first record with a timestamp >= the given one
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _RECORD.unpack_from(data, _offset(mid))[0] < timestamp:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
@@ -1,16 +1,48 @@
 import asyncio
 import binascii
+import contextlib
+from collections import deque
+import logging
+from dataclasses import dataclass
 from bleak.backends.device import BLEDevice
 from bleak import BleakClient, BleakScanner
 import struct
-from typing import Any, Awaitable, Callable, Protocol
+import time
+from typing import Any, Awaitable, Callable, Iterator, Protocol
 from . import _LOGGER
 from .command import Command
 from .const import SYSTEM_ID_UUID, COMMAND_UUID, STATE_UUID
-from .models import HPA250BModel
+from .discovery import ScanCache
+from .handshake import HandshakeCache
+from .instrumentation import (
+    COMMAND_ROUND_TRIP,
+    COMMANDS,
+    CONNECT,
+    GATT_CONNECT,
+    GATT_READ,
+    GATT_WRITE,
+    HANDSHAKE,
+    HANDSHAKE_RETRIES,
+    NOOP,
+    NOTIFICATION,
+    PIPELINE_ROUND_TRIP,
+    RECONNECT_ATTEMPTS,
+    RECONNECT_FAILURES,
+    TIMEOUTS,
+    Event,
+    EventHook,
+    Instrumentation,
+    timed,
+)
+from .models import LockingHPA250BModel, PipelinedHPA250BModel
+from .planner import Step
+from .reconnect import ConnectionStats, ReconnectPolicy
 from .state import State
+from .subscription import SUBSCRIPTION_QUEUE_SIZE, OverflowPolicy, Subscription
+from .transition import transition
 
 UPDATE_TIMEOUT_SECONDS = 2
+PIPELINE_WRITE_GAP_SECONDS = 0.05
 
 
 class BTError(Exception):
@@ -55,14 +87,23 @@ class BTClient(Protocol):
 
 class BleakBTClient(BTClient):
     def __init__(
-        self, device: BLEDevice, disconnected_callback=Callable[[], Awaitable[None]]
+        self,
+        device: BLEDevice,
+        disconnected_callback: Callable[[], Awaitable[None]],
+        instrumentation: Instrumentation = NOOP,
+        adapter: str | None = None,
     ):
         self._device = device
+        self._instrumentation = instrumentation
+        self._disconnected_task: asyncio.Task | None = None
 
         def callback_fn(_: BleakClient):
-            asyncio.get_running_loop().run_until_complete(disconnected_callback())
+            # Bleak calls this synchronously from within the running loop
+            self._disconnected_task = asyncio.ensure_future(disconnected_callback())
 
-        self._client = BleakClient(device, disconnected_callback=callback_fn)
+        # BlueZ picks the adapter named here, e.g. "hci1"
+        kwargs = {} if adapter is None else {"adapter": adapter}
+        self._client = BleakClient(device, disconnected_callback=callback_fn, **kwargs)
 
     @property
     def address(self) -> str:
@@ -77,16 +118,19 @@ class BleakBTClient(BTClient):
         return self._client.is_connected
 
     async def connect(self):
-        await self._client.connect()
+        with timed(self._instrumentation, GATT_CONNECT):
+            await self._client.connect()
 
     async def disconnect(self):
         await self._client.disconnect()
 
     async def read_gatt_char(self, uuid: str) -> bytes:
-        return await self._client.read_gatt_char(uuid)
+        with timed(self._instrumentation, GATT_READ):
+            return await self._client.read_gatt_char(uuid)
 
     async def write_gatt_char(self, uuid: str, data: bytes):
-        return await self._client.write_gatt_char(uuid, data, response=True)
+        with timed(self._instrumentation, GATT_WRITE):
+            return await self._client.write_gatt_char(uuid, data, response=True)
 
     async def start_notify(
         self, uuid: str, callback: Callable[[bytes], Awaitable[None]]
@@ -141,32 +185,94 @@ class Delegate(Protocol):
 
 
 class BleakDelegate(Delegate):
-    def __init__(self, address: str):
+    def __init__(
+        self,
+        address: str,
+        scan_cache: ScanCache | None = None,
+        instrumentation: Instrumentation = NOOP,
+        adapter: str | None = None,
+    ):
         self._address = address
+        self._scan_cache = scan_cache
+        self._instrumentation = instrumentation
+        self._adapter = adapter
 
     async def make_bt_client(
         self, handle_disconnect: Callable[[], Awaitable[None]]
     ) -> BTClient | None:
-        ble_device = await BleakScanner.find_device_by_address(self._address)
+        if self._scan_cache is not None:
+            ble_device = await self._scan_cache.find(self._address)
+        else:
+            kwargs = {} if self._adapter is None else {"adapter": self._adapter}
+            ble_device = await BleakScanner.find_device_by_address(
+                self._address, **kwargs
+            )
         if ble_device is None:
             return None
-        return BleakBTClient(ble_device, disconnected_callback=handle_disconnect)
+        return BleakBTClient(
+            ble_device,
+            disconnected_callback=handle_disconnect,
+            instrumentation=self._instrumentation,
+            adapter=self._adapter,
+        )
 
     async def handle_update(self, state: State):
         pass
 
 
-class HPA250B(HPA250BModel):
+@dataclass
+class NotificationStats:
+    received: int = 0
+    dispatched: int = 0
+
+
+@dataclass
+class PredictionStats:
+    confirmed: int = 0
+    mispredicted: int = 0
+
+
+class HPA250B(PipelinedHPA250BModel, LockingHPA250BModel):
     def __init__(
         self,
         delegate: Delegate,
+        pipeline_write_gap: float = PIPELINE_WRITE_GAP_SECONDS,
+        reconnect_policy: ReconnectPolicy = ReconnectPolicy(),
+        handshake_cache: HandshakeCache | None = None,
+        heartbeat_interval: float | None = None,
+        optimistic: bool = False,
+        instrumentation: Instrumentation = NOOP,
+        event_hook: EventHook | None = None,
     ):
         self._state = State.empty()
         self._expect_connected = False
         self._client: BTClient = DisconnectedBTClient()
         self._delegate = delegate
+        self._pipeline_write_gap = pipeline_write_gap
+        self._observed_states: list[State] | None = None
+        self._reconnect_policy = reconnect_policy
+        self._reconnect_task: asyncio.Task | None = None
+        self._handshake_cache = handshake_cache
 
         self.update_received = asyncio.Event()
+        self.connection_stats = ConnectionStats()
+        self._subscriptions: list[Subscription] = []
+        self._heartbeat_interval = heartbeat_interval
+        self._last_payload: bytes | None = None
+        self._dispatched_at = 0.0
+        self.notification_stats = NotificationStats()
+        # writes wait for their notification; interleaving them would let one
+        # caller's notification satisfy another caller's wait
+        self._command_lock = asyncio.Lock()
+        # plans of concurrent reconciles would undo each other's steps
+        self._reconcile_lock = asyncio.Lock()
+        self._optimistic = optimistic
+        # (deadline, state before, predicted state) for each command sent
+        # optimistically and not confirmed by a notification yet
+        self._predictions: deque[tuple[float, State, State]] = deque()
+        self.prediction_stats = PredictionStats()
+        self.instrumentation = instrumentation
+        self._event_hook = event_hook
 
     @property
     def is_connected(self):
@@ -180,6 +286,10 @@ class HPA250B(HPA250BModel):
     def name(self):
         return self._client.name
 
+    @property
+    def reconcile_lock(self) -> asyncio.Lock:
+        return self._reconcile_lock
+
     async def connect(self):
         if self.is_connected:
             _LOGGER.debug("connect: bluetooth client is already connected")
@@ -187,68 +297,300 @@ class HPA250B(HPA250BModel):
 
         self._expect_connected = True
 
+        with self._phase(CONNECT):
+            await self._connect()
+
+    async def _connect(self):
         _LOGGER.debug("connecting")
         client = await self._delegate.make_bt_client(self._handle_disconnect)
         if client is None:
             raise RuntimeError("nothing to connect to")
         self._client = client
         await self._client.connect()
+        self._last_payload = None
+        self._predictions.clear()
+
+        await self._client.start_notify(STATE_UUID, callback=self._handle_update)
+
+        cache = self._handshake_cache
+        if cache is None or (cached_mac := cache.get(self._client.address)) is None:
+            await self._handshake(await self._read_mac())
+            return
 
+        try:
+            await self._handshake(cached_mac)
+        except TimeoutError:
+            _LOGGER.debug("handshake with cached MAC timed out; reading System ID")
+            self.instrumentation.increment(HANDSHAKE_RETRIES)
+            cache.invalidate(self._client.address)
+            await self._handshake(await self._read_mac())
+
+    async def _read_mac(self) -> bytes:
         system_id = await self._client.read_gatt_char(SYSTEM_ID_UUID)
-        _LOGGER.debug(f"system id: {binascii.hexlify(system_id)}")
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("system id: %s", binascii.hexlify(system_id))
 
-        mac_bytes = bytearray(
+        mac_bytes = bytes(
             reversed(struct.unpack("BBBxxBBB", system_id))
         )  # System ID "C01A090000FF3500" encodes MAC 00:35:FF:09:1A:C0
-        _LOGGER.debug(f"MAC: {binascii.hexlify(mac_bytes)}")
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("MAC: %s", binascii.hexlify(mac_bytes))
+        return mac_bytes
+
+    async def _handshake(self, mac_bytes: bytes):
         _LOGGER.debug("sending handshake")
 
         self.update_received.clear()
 
-        await self._client.start_notify(STATE_UUID, callback=self._handle_update)
+        handshake = b"MAC+" + mac_bytes
+        with self._phase(HANDSHAKE, handshake):
+            await self._client.write_gatt_char(COMMAND_UUID, handshake)
+            await self._wait_for_update()
 
-        await self._client.write_gatt_char(
-            COMMAND_UUID,
-            b"MAC+" + mac_bytes,
-        )
-        await asyncio.wait_for(
-            self.update_received.wait(), timeout=UPDATE_TIMEOUT_SECONDS
-        )
+        if self._handshake_cache is not None:
+            self._handshake_cache.put(self._client.address, mac_bytes)
 
     async def disconnect(self):
+        self._expect_connected = False
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            await asyncio.wait([self._reconnect_task])
+
         if not self.is_connected:
             _LOGGER.debug("disconnect: bluetooth client is already disconnected")
             return
 
-        self._expect_connected = False
-
         _LOGGER.debug("disconnecting")
 
         await self._client.disconnect()
         self._client = DisconnectedBTClient()
         self._state = State.empty()
+        self._predictions.clear()
 
     @property
     def current_state(self) -> State:
+        if self._predictions:
+            return self._predictions[-1][2]
         return self._state
 
     async def apply_command(self, cmd: Command):
-        _LOGGER.debug(f"sending command {cmd}")
-        self.update_received.clear()
-        await self._client.write_gatt_char(COMMAND_UUID, cmd.bytes)
-        await asyncio.wait_for(
-            self.update_received.wait(), timeout=UPDATE_TIMEOUT_SECONDS
-        )
+        async with self._command_lock:
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("sending command %s", cmd)
+            self.instrumentation.increment(COMMANDS)
+            if self._optimistic and (predicted := self._predict(cmd)) is not None:
+                deadline = time.monotonic() + UPDATE_TIMEOUT_SECONDS
+                prediction = (deadline, self.current_state, predicted)
+                self._predictions.append(prediction)
+                asyncio.get_running_loop().call_later(
+                    UPDATE_TIMEOUT_SECONDS, self._prediction_timed_out, prediction
+                )
+                try:
+                    await self._client.write_gatt_char(COMMAND_UUID, cmd.bytes)
+                except Exception:
+                    self._predictions.clear()
+                    raise
+                return
+
+            self.update_received.clear()
+            with self._phase(COMMAND_ROUND_TRIP, cmd.bytes):
+                await self._client.write_gatt_char(COMMAND_UUID, cmd.bytes)
+                await self._wait_for_update()
+
+    async def _wait_for_update(self):
+        try:
+            await asyncio.wait_for(
+                self.update_received.wait(), timeout=UPDATE_TIMEOUT_SECONDS
+            )
+        except TimeoutError:
+            self.instrumentation.increment(TIMEOUTS)
+            raise
+
+    async def apply_commands(self, steps: list[Step]) -> bool:
+        if not steps:
+            return True
+
+        async with self._command_lock:
+            _LOGGER.debug("sending %d pipelined commands", len(steps))
+            self.instrumentation.increment(COMMANDS, len(steps))
+            self._observed_states = []
+            try:
+                with self._phase(PIPELINE_ROUND_TRIP):
+                    for i, step in enumerate(steps):
+                        if i > 0:
+                            await asyncio.sleep(self._pipeline_write_gap)
+                        await self._client.write_gatt_char(
+                            COMMAND_UUID, step.command.bytes
+                        )
+                    await asyncio.wait_for(
+                        self._wait_for_state(steps[-1].expected_state),
+                        timeout=UPDATE_TIMEOUT_SECONDS,
+                    )
+            except TimeoutError:
+                _LOGGER.debug("timed out waiting for pipelined commands to apply")
+                self.instrumentation.increment(TIMEOUTS)
+            finally:
+                observed, self._observed_states = self._observed_states, None
+
+        return _follows_plan(observed, steps)
+
+    def _predict(self, cmd: Command) -> State | None:
+        try:
+            return transition(self.current_state, cmd)
+        except ValueError:
+            # e.g. a timer value outside of what the model knows about
+            return None
+
+    def _check_prediction(self, state: State):
+        for i, (_, _, predicted) in enumerate(self._predictions):
+            # notifications may be coalesced, so skipping ahead is fine
+            if state.matches_desired_state(predicted):
+                for _ in range(i + 1):
+                    self._predictions.popleft()
+                self.prediction_stats.confirmed += i + 1
+                return
+        if not self._predictions:
+            return
+        # A notification still carrying the state from before the command
+        # (a duplicate, or one sent before the device saw the write) says
+        # nothing about the command; it is mispredicted only once the device
+        # reports something else or the deadline passes
+        if not state.matches_desired_state(self._predictions[0][1]):
+            _LOGGER.debug("mispredicted state; device reports %s", state)
+            self._mispredicted()
+        else:
+            self._expire_predictions()
+
+    def _expire_predictions(self):
+        if self._predictions and time.monotonic() > self._predictions[0][0]:
+            self._prediction_timed_out(self._predictions[0])
+
+    def _prediction_timed_out(self, prediction: tuple[float, State, State]):
+        if any(p is prediction for p in self._predictions):
+            _LOGGER.debug("predicted state was never confirmed")
+            self._mispredicted()
+
+    def _mispredicted(self):
+        self.prediction_stats.mispredicted += 1
+        self._predictions.clear()
+
+    async def _wait_for_state(self, expected: State):
+        while not self._state.matches_desired_state(expected):
+            self.update_received.clear()
+            await self.update_received.wait()
+
+    def subscribe(
+        self,
+        maxsize: int = SUBSCRIPTION_QUEUE_SIZE,
+        policy: OverflowPolicy = OverflowPolicy.COALESCE_LATEST,
+    ) -> Subscription:
+        subscription = Subscription(maxsize, policy, self._subscriptions.remove)
+        self._subscriptions.append(subscription)
+        return subscription
 
     async def _handle_update(self, data: bytes):
-        old_state, self._state = self._state, State.from_bytes(data)
-        _LOGGER.debug(f"updated state {old_state} -> {self._state}")
+        self.notification_stats.received += 1
+        if self._event_hook is not None:
+            self._event_hook(Event(self._client.address, NOTIFICATION, bytes(data)))
+        now = time.monotonic()
+        heartbeat_due = (
+            self._heartbeat_interval is not None
+            and now - self._dispatched_at >= self._heartbeat_interval
+        )
+
+        # Devices repeat identical notifications; those still confirm that a
+        # command got through, but are not decoded or dispatched again
+        if data == self._last_payload and not heartbeat_due:
+            self._check_prediction(self._state)
+            self.update_received.set()
+            return
+        # the first notification on a connection is always dispatched
+        first = self._last_payload is None
+        state = State.from_bytes(data)
+        # only payloads that decoded are skipped as duplicates later
+        self._last_payload = bytes(data)
+
+        old_state, self._state = self._state, state
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("updated state %s -> %s", old_state, self._state)
+        self._check_prediction(self._state)
+        if old_state is self._state and not (first or heartbeat_due):
+            self.update_received.set()
+            return
+
+        if self._observed_states is not None:
+            self._observed_states.append(self._state)
         self.update_received.set()
+
+        self.notification_stats.dispatched += 1
+        self._dispatched_at = now
+        for subscription in self._subscriptions:
+            subscription.publish(self._state)
         await self._delegate.handle_update(self._state)
 
+    @contextlib.contextmanager
+    def _phase(self, phase: str, data: bytes | None = None) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started_at
+            self.instrumentation.observe(phase, duration)
+            if self._event_hook is not None:
+                event = Event(self._client.address, phase, data, duration)
+                self._event_hook(event)
+
+    async def wait_for_reconnect(self):
+        if self._reconnect_task is not None:
+            await asyncio.wait([self._reconnect_task])
+
     async def _handle_disconnect(self):
         if not self._expect_connected:
             return
+        if self._reconnect_task is not None and not self._reconnect_task.done():
+            return
 
         _LOGGER.info("Connection lost. Reconnecting.")
-        await self.connect()
+        self.connection_stats.disconnects += 1
+        self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        stats = self.connection_stats
+        started_at = time.monotonic()
+        attempt = 0
+        while self._reconnect_policy.allows(attempt):
+            await asyncio.sleep(self._reconnect_policy.delay(attempt))
+            attempt += 1
+            self.instrumentation.increment(RECONNECT_ATTEMPTS)
+            try:
+                await self.connect()
+            except Exception as e:
+                self.instrumentation.increment(RECONNECT_FAILURES)
+                stats.failed_attempts += 1
+                stats.consecutive_failures += 1
+                _LOGGER.warning("Reconnect attempt %d failed: %r", attempt, e)
+                if self.is_connected:
+                    with contextlib.suppress(Exception):
+                        await self._client.disconnect()
+                continue
+
+            elapsed = time.monotonic() - started_at
+            stats.reconnects += 1
+            stats.consecutive_failures = 0
+            stats.last_reconnect_seconds = elapsed
+            stats.total_reconnect_seconds += elapsed
+            _LOGGER.info("Reconnected after %d attempt(s) in %.1fs", attempt, elapsed)
+            return
+
+        _LOGGER.error("Giving up reconnecting after %d attempts", attempt)
+
+
+def _follows_plan(observed: list[State], steps: list[Step]) -> bool:
+    # Notifications may be coalesced, so every observed state has to match
+    # the predicted ones in order, but not every prediction has to be observed
+    expected = iter(step.expected_state for step in steps)
+    return (
+        bool(observed)
+        and all(any(s.matches_desired_state(e) for e in expected) for s in observed)
+        and observed[-1].matches_desired_state(steps[-1].expected_state)
+    )
@@ -0,0 +1,140 @@
+import bisect
+import contextlib
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Protocol
+
+# Phases timed along the BLE path
+CONNECT = "connect"
+HANDSHAKE = "handshake"
+GATT_CONNECT = "gatt_connect"
+GATT_READ = "gatt_read"
+GATT_WRITE = "gatt_write"
+COMMAND_ROUND_TRIP = "command_round_trip"
+PIPELINE_ROUND_TRIP = "pipeline_round_trip"
+RECONCILE = "reconcile"
+# only reported as an Event
+NOTIFICATION = "notification"
+
+# Counters
+COMMANDS = "commands"
+TIMEOUTS = "timeouts"
+HANDSHAKE_RETRIES = "handshake_retries"
+RECONNECT_ATTEMPTS = "reconnect_attempts"
+RECONNECT_FAILURES = "reconnect_failures"
+RECONCILE_FAILURES = "reconcile_failures"
+RECONCILE_REPLANS = "reconcile_replans"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Instrumentation(Protocol):
+    def observe(self, metric: str, seconds: float):
+        ...
+
+    def increment(self, counter: str, value: int = 1):
+        ...
+
+
+class NoopInstrumentation(Instrumentation):
+    def observe(self, metric: str, seconds: float):
+        pass
+
+    def increment(self, counter: str, value: int = 1):
+        pass
+
+
+NOOP = NoopInstrumentation()
+
+
+@dataclass(frozen=True)
+class Event:
+    device: str
+    phase: str
+    data: bytes | None = None
+    duration: float | None = None
+
+
+EventHook = Callable[[Event], None]
+
+
+@contextlib.contextmanager
+def timed(instrumentation: Instrumentation, metric: str) -> Iterator[None]:
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        instrumentation.observe(metric, time.perf_counter() - started_at)
+
+
+@dataclass
+class Histogram:
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    counts: list[int] = field(default_factory=list)
+    count: int = 0
+    sum: float = 0.0
+
+    def __post_init__(self):
+        # the last count is the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_counts(self) -> list[int]:
+        total, cumulative = 0, []
+        for c in self.counts:
+            total += c
+            cumulative.append(total)
+        return cumulative
+
+
+class MetricsRecorder(Instrumentation):
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self._buckets = buckets
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: dict[str, int] = {}
+
+    def observe(self, metric: str, seconds: float):
+        if (histogram := self.histograms.get(metric)) is None:
+            histogram = self.histograms[metric] = Histogram(self._buckets)
+        histogram.observe(seconds)
+
+    def increment(self, counter: str, value: int = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def to_dict(self) -> dict:
+        return {
+            "histograms": {
+                name: {
+                    "buckets": list(h.buckets),
+                    "counts": h.counts,
+                    "count": h.count,
+                    "sum": h.sum,
+                }
+                for name, h in self.histograms.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    def to_prometheus(self, prefix: str = "hpa250b_") -> str:
+        lines = []
+        for name, h in sorted(self.histograms.items()):
+            metric = f"{prefix}{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            bounds = [*(repr(float(b)) for b in h.buckets), "+Inf"]
+            for le, count in zip(bounds, h.cumulative_counts()):
+                lines.append(f'{metric}_bucket{{le="{le}"}} {count}')
+            lines.append(f"{metric}_sum {h.sum}")
+            lines.append(f"{metric}_count {h.count}")
+        for name, value in sorted(self.counters.items()):
+            metric = f"{prefix}{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
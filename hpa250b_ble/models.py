@@ -1,5 +1,7 @@
-from typing import Protocol
+import asyncio
+from typing import Protocol, runtime_checkable
 from .command import Command
+from .planner import Step
 from .state import State
 
 
@@ -14,3 +16,18 @@ class HPA250BModel(Protocol):
     @property
     def name(self) -> str:
         ...
+
+
+@runtime_checkable
+class PipelinedHPA250BModel(HPA250BModel, Protocol):
+    async def apply_commands(self, steps: list[Step]) -> bool:
+        ...
+
+
+@runtime_checkable
+class LockingHPA250BModel(HPA250BModel, Protocol):
+    # reconcile() holds this lock, so concurrent reconciles of one device run
+    # one after another instead of interleaving their plans
+    @property
+    def reconcile_lock(self) -> asyncio.Lock:
+        ...
@@ -0,0 +1,36 @@
+from dataclasses import dataclass
+from .command import Command
+from .state import State
+from .table import MAX_DISTANCE, next_command, next_index, state_at, state_index
+
+MAX_PLAN_LENGTH = MAX_DISTANCE
+
+
+class PlanError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Step:
+    command: Command
+    expected_state: State
+
+
+def plan(current: State, desired: State, power_cycle: bool = False) -> list[Step]:
+    # With power_cycle, a running device may be switched off and on again
+    # when that resets it closer to the desired state than walking there
+    if current.matches_desired_state(desired):
+        return []
+
+    try:
+        index, desired_index = state_index(current), state_index(desired)
+    except KeyError as e:
+        raise PlanError(f"{desired} is unreachable from {current}") from e
+
+    # Follow precomputed next hops along a shortest path in the state graph
+    steps: list[Step] = []
+    while index != desired_index:
+        cmd = Command.from_int(next_command(index, desired_index, power_cycle))
+        index = next_index(index, cmd.command)
+        steps.append(Step(cmd, state_at(index)))
+    return steps
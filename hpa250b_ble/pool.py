@@ -0,0 +1,199 @@
+import asyncio
+import contextlib
+import functools
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Mapping
+from . import _LOGGER
+from .discovery import ScanCache
+from .fleet import MAX_CONCURRENT_CONNECTS
+from .hpa250b import HPA250B, BleakDelegate, BTClient, Delegate
+from .instrumentation import NOOP, Instrumentation
+from .reconcile import reconcile
+from .state import State
+
+# BlueZ adapters typically manage 5-7 simultaneous LE connections reliably
+CONNECTIONS_PER_ADAPTER = 5
+
+
+class ConnectionPool:
+    # Multiplexes many logical devices over a limited number of live
+    # connections. Devices connect on demand and stay connected while there
+    # is room; when every slot is taken, the least recently used idle device
+    # is disconnected to make space.
+    def __init__(
+        self,
+        delegate_factory: Callable[[str, str | None], Delegate] | None = None,
+        adapters: Mapping[str | None, int] | None = None,
+        max_concurrent_connects: int = MAX_CONCURRENT_CONNECTS,
+        scan_cache: ScanCache | None = None,
+        **device_kwargs: Any,
+    ):
+        if adapters is None:
+            adapters = {None: CONNECTIONS_PER_ADAPTER}
+        if scan_cache is not None and set(adapters) != {scan_cache.adapter}:
+            # devices connect through the adapter that resolved them, which
+            # would bypass the per-adapter capacities
+            raise ValueError(
+                f"a scan cache on adapter {scan_cache.adapter!r} can't serve "
+                f"adapters {sorted(map(str, adapters))}"
+            )
+        if delegate_factory is None:
+            delegate_factory = functools.partial(
+                _bleak_delegate,
+                scan_cache=scan_cache,
+                instrumentation=device_kwargs.get("instrumentation", NOOP),
+            )
+        self._delegate_factory = delegate_factory
+        # one delegate per device and adapter it has been connected through
+        self._delegates: dict[tuple[str, str | None], Delegate] = {}
+        self._capacity = dict(adapters)
+        self._device_kwargs = device_kwargs
+        self._devices: dict[str, HPA250B] = {}
+        # address -> adapter for every device holding a slot, least recently
+        # used first
+        self._slots: OrderedDict[str, str | None] = OrderedDict()
+        self._in_use: dict[str, int] = {}
+        self._connect_locks: dict[str, asyncio.Lock] = {}
+        self._connect_slots = {
+            adapter: asyncio.Semaphore(max_concurrent_connects) for adapter in adapters
+        }
+        self._changed = asyncio.Condition()
+        self.evictions = 0
+
+    @property
+    def devices(self) -> dict[str, HPA250B]:
+        return self._devices
+
+    @property
+    def connected(self) -> dict[str, str | None]:
+        return dict(self._slots)
+
+    def delegate_for(self, address: str) -> Delegate:
+        # The delegate for the adapter address currently holds a slot on
+        key = address.upper()
+        adapter = self._slots.get(key)
+        if (delegate := self._delegates.get((key, adapter))) is None:
+            delegate = self._delegate_factory(address, adapter)
+            self._delegates[key, adapter] = delegate
+        return delegate
+
+    def device(self, address: str) -> HPA250B:
+        key = address.upper()
+        if (device := self._devices.get(key)) is None:
+            delegate = _PooledDelegate(self, address)
+            device = self._devices[key] = HPA250B(delegate, **self._device_kwargs)
+            self._connect_locks[key] = asyncio.Lock()
+        return device
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, address: str) -> AsyncIterator[HPA250B]:
+        key = address.upper()
+        device = self.device(address)
+        async with self._changed:
+            evicted = await self._claim(key)
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+        try:
+            if evicted is not None:
+                _LOGGER.debug("evicting %s to make room for %s", evicted, key)
+                async with self._connect_locks[evicted]:
+                    await self._devices[evicted].disconnect()
+            await self._connect(key, device)
+            yield device
+        except BaseException:
+            if not device.is_connected:
+                await self._release_slot(key)
+            raise
+        finally:
+            async with self._changed:
+                self._in_use[key] -= 1
+                self._changed.notify_all()
+
+    async def reconcile(
+        self, address: str, desired: State, pipelined: bool = False
+    ) -> State:
+        async with self.acquire(address) as device:
+            await reconcile(
+                device,
+                desired,
+                pipelined=pipelined,
+                instrumentation=device.instrumentation,
+            )
+            return device.current_state
+
+    async def poll(self, address: str) -> State:
+        async with self.acquire(address) as device:
+            return device.current_state
+
+    async def close(self):
+        async with self._changed:
+            addresses, self._slots = list(self._slots), OrderedDict()
+        await asyncio.gather(
+            *(self._devices[a].disconnect() for a in addresses), return_exceptions=True
+        )
+
+    async def _claim(self, key: str) -> str | None:
+        # Called with the condition held. Returns a device to evict, whose
+        # slot has already been handed over to key.
+        while True:
+            if key in self._slots:
+                self._slots.move_to_end(key)
+                return None
+
+            if free := self._free_slots():
+                # spread connections across adapters
+                self._slots[key] = max(free, key=free.__getitem__)
+                return None
+
+            for idle, adapter in self._slots.items():
+                if not self._in_use.get(idle):
+                    del self._slots[idle]
+                    self._slots[key] = adapter
+                    self.evictions += 1
+                    return idle
+
+            await self._changed.wait()
+
+    def _free_slots(self) -> dict[str | None, int]:
+        free = dict(self._capacity)
+        for adapter in self._slots.values():
+            free[adapter] -= 1
+        return {adapter: n for adapter, n in free.items() if n > 0}
+
+    async def _connect(self, key: str, device: HPA250B):
+        async with self._connect_locks[key]:
+            if device.is_connected:
+                return
+            async with self._connect_slots[self._slots[key]]:
+                await device.connect()
+
+    async def _release_slot(self, key: str):
+        async with self._changed:
+            self._slots.pop(key, None)
+            self._changed.notify_all()
+
+
+class _PooledDelegate(Delegate):
+    def __init__(self, pool: ConnectionPool, address: str):
+        self._pool = pool
+        self._address = address
+        self._current: Delegate | None = None
+
+    async def make_bt_client(
+        self, handle_disconnect: Callable[[], Awaitable[None]]
+    ) -> BTClient | None:
+        self._current = self._pool.delegate_for(self._address)
+        return await self._current.make_bt_client(handle_disconnect)
+
+    async def handle_update(self, state: State):
+        if self._current is not None:
+            await self._current.handle_update(state)
+
+
+def _bleak_delegate(
+    address: str,
+    adapter: str | None,
+    scan_cache: ScanCache | None,
+    instrumentation: Instrumentation,
+) -> Delegate:
+    return BleakDelegate(address, scan_cache, instrumentation, adapter=adapter)
@@ -1,11 +1,21 @@
-from .command import Command
-from .enums import Preset
-from .models import HPA250BModel
+import contextlib
+import logging
+import time
+from .instrumentation import (
+    NOOP,
+    RECONCILE,
+    RECONCILE_FAILURES,
+    RECONCILE_REPLANS,
+    Instrumentation,
+)
+from .models import HPA250BModel, LockingHPA250BModel, PipelinedHPA250BModel
+from .planner import MAX_PLAN_LENGTH, PlanError, Step, plan
 from .state import State
 from . import _LOGGER
 
 
-MAX_RECONCILES = 50
+# Leaves room for one full replan if the device diverges from the model
+MAX_RECONCILES = 2 * MAX_PLAN_LENGTH
 
 
 class ReconcileError(Exception):
@@ -25,17 +35,72 @@ class ReconcileError(Exception):
         )
 
 
-async def reconcile(device: HPA250BModel, desired: State):
-    _LOGGER.debug(
-        f"Reconciling state; current: {device.current_state}, target: {desired}"
+class ReconcileSupersededError(ReconcileError):
+    pass
+
+
+async def reconcile(
+    device: HPA250BModel,
+    desired: State,
+    pipelined: bool = False,
+    instrumentation: Instrumentation = NOOP,
+    power_cycle: bool = False,
+):
+    lock = (
+        device.reconcile_lock
+        if isinstance(device, LockingHPA250BModel)
+        else contextlib.nullcontext()
     )
+    async with lock:
+        started_at = time.perf_counter()
+        try:
+            await _reconcile(device, desired, pipelined, instrumentation, power_cycle)
+        except Exception:
+            instrumentation.increment(RECONCILE_FAILURES)
+            raise
+        finally:
+            instrumentation.observe(RECONCILE, time.perf_counter() - started_at)
+
+
+async def _reconcile(
+    device: HPA250BModel,
+    desired: State,
+    pipelined: bool,
+    instrumentation: Instrumentation,
+    power_cycle: bool,
+):
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug(
+            "Reconciling state; current: %s, target: %s", device.current_state, desired
+        )
+    steps = _plan(device, desired, power_cycle)
+    if pipelined and not isinstance(device, PipelinedHPA250BModel):
+        _LOGGER.debug("%s can't pipeline commands; going step by step", device.name)
+        pipelined = False
+    if pipelined and len(steps) > 1:
+        if not await device.apply_commands(steps):
+            _LOGGER.debug("Device diverged from pipelined plan; going step by step")
+            instrumentation.increment(RECONCILE_REPLANS)
+        steps = []
+
     for i in range(MAX_RECONCILES):
         if device.current_state.matches_desired_state(desired):
             _LOGGER.debug("Reconciliation finished")
             break
-        cmd = _next_step(device.current_state, desired)
-        _LOGGER.debug(f"Reconcile step {i}")
-        await device.apply_command(cmd)
+        if not steps:
+            steps = _plan(device, desired, power_cycle)
+        step = steps.pop(0)
+        _LOGGER.debug("Reconcile step %d", i)
+        await device.apply_command(step.command)
+        if not device.current_state.matches_desired_state(step.expected_state):
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug(
+                    "Device diverged from plan; expected: %s, actual: %s",
+                    step.expected_state,
+                    device.current_state,
+                )
+            instrumentation.increment(RECONCILE_REPLANS)
+            steps = []
 
     if not device.current_state.matches_desired_state(desired):
         raise ReconcileError(
@@ -43,57 +108,8 @@ async def reconcile(device: HPA250BModel, desired: State):
         )
 
 
-def _next_step(current: State, desired: State) -> Command:
-    if current.is_on != desired.is_on:
-        return Command().toggle_power()
-
-    command = Command()
-    if (c := current.preset) != (d := desired.preset):
-        if d == Preset.AUTO_VOC_POLLEN:
-            if c == Preset.AUTO_VOC:
-                command.toggle_auto_pollen()
-            elif c == Preset.AUTO_POLLEN:
-                command.toggle_auto_voc()
-            else:
-                command.toggle_auto_voc()
-                command.toggle_auto_pollen()
-        elif d == Preset.AUTO_VOC:
-            if c == Preset.AUTO_VOC_POLLEN:
-                command.toggle_auto_pollen()
-            elif c == Preset.AUTO_POLLEN:
-                command.toggle_auto_pollen()
-                command.toggle_auto_voc()
-            else:
-                command.toggle_auto_voc()
-        elif d == Preset.AUTO_POLLEN:
-            if c == Preset.AUTO_VOC_POLLEN:
-                command.toggle_auto_voc()
-            elif c == Preset.AUTO_VOC:
-                command.toggle_auto_voc()
-                command.toggle_auto_pollen()
-            else:
-                command.toggle_auto_pollen()
-        elif d == Preset.GERM:
-            command.toggle_germ()
-        elif d == Preset.GENERAL:
-            command.toggle_general()
-        elif d == Preset.ALLERGEN:
-            command.toggle_allergen()
-        elif d == Preset.TURBO:
-            command.toggle_turbo()
-
-    if (c := current.backlight) != (d := desired.backlight):
-        command.cycle_light()
-
-    if (c := current.timer) != (d := desired.timer):
-        if d is None:
-            command.timer_down()
-        else:
-            if c is None:
-                command.timer_up()
-            elif c < d:
-                command.timer_up()
-            else:
-                command.timer_down()
-
-    return command
+def _plan(device: HPA250BModel, desired: State, power_cycle: bool) -> list[Step]:
+    try:
+        return plan(device.current_state, desired, power_cycle)
+    except PlanError as e:
+        raise ReconcileError(str(e), device, desired) from e
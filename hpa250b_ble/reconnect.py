@@ -0,0 +1,30 @@
+import random
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class ReconnectPolicy:
+    initial_delay: float = 1.0
+    max_delay: float = 60.0
+    multiplier: float = 2.0
+    # fraction of each delay that is randomised, so devices that dropped
+    # together do not all hit the adapter at the same moment
+    jitter: float = 0.5
+    max_attempts: int | None = 10
+
+    def delay(self, attempt: int, rng: random.Random | None = None) -> float:
+        delay = min(self.initial_delay * self.multiplier**attempt, self.max_delay)
+        return delay * (1 - self.jitter * (rng or random).random())
+
+    def allows(self, attempt: int) -> bool:
+        return self.max_attempts is None or attempt < self.max_attempts
+
+
+@dataclass
+class ConnectionStats:
+    disconnects: int = 0
+    reconnects: int = 0
+    failed_attempts: int = 0
+    consecutive_failures: int = 0
+    last_reconnect_seconds: float | None = None
+    total_reconnect_seconds: float = 0.0
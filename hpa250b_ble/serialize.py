@@ -0,0 +1,38 @@
+from typing import Any
+from .enums import Backlight, Preset, VOCLight
+from .state import State, StateError
+
+
+def state_to_dict(state: State) -> dict[str, Any]:
+    return {
+        "is_on": state.is_on,
+        "preset": None if state.preset is None else state.preset.value,
+        "backlight": None if state.backlight is None else state.backlight.value,
+        "voc_light": None if state.voc_light is None else state.voc_light.value,
+        "timer": state.timer,
+    }
+
+
+def state_from_dict(data: dict[str, Any]) -> State:
+    # Missing fields take the device's defaults, e.g. {"is_on": true} is
+    # the general preset with the backlight on and no timer
+    unknown = set(data) - {"is_on", "preset", "backlight", "voc_light", "timer"}
+    if unknown:
+        raise StateError(f"unknown state fields: {', '.join(sorted(unknown))}")
+    is_on = data.get("is_on", True)
+    if not isinstance(is_on, bool):
+        raise StateError(f"invalid state {data!r}: is_on must be true or false")
+    try:
+        return State(
+            is_on=is_on,
+            preset=_enum(Preset, data.get("preset")),
+            backlight=_enum(Backlight, data.get("backlight")),
+            voc_light=_enum(VOCLight, data.get("voc_light")),
+            timer=data.get("timer"),
+        )
+    except (TypeError, ValueError) as e:
+        raise StateError(f"invalid state {data!r}: {e}") from e
+
+
+def _enum(cls, value: str | None):
+    return None if value is None else cls(value)
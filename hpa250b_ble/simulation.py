@@ -0,0 +1,301 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Protocol
+from .command import (
+    COMMAND_STRUCT,
+    LIGHT_CYCLE,
+    TIMER_DOWN,
+    TIMER_UP,
+    TOGGLE_ALLERGEN,
+    TOGGLE_GENERAL,
+    TOGGLE_GERM,
+    TOGGLE_POLLEN,
+    TOGGLE_POWER,
+    TOGGLE_TURBO,
+    TOGGLE_VOC,
+)
+from .const import COMMAND_UUID, PREAMBLE, STATE_UUID, SYSTEM_ID_UUID
+from .hpa250b import BTClient, BTClientDisconnectedError, Delegate
+from .state import BACKLIGHT_MASK, IS_ON, TIMER_MASK, VOC_LIGHT_MASK, State
+
+# The simulated device applies commands to the raw state word with its own
+# model of the firmware, written against the frame layouts in command.py and
+# state.py rather than shared with transition.py or table.py, so the
+# planner's model is checked against it instead of being mirrored.
+_VOC = 1 << 25
+_POLLEN = 1 << 26
+_SENSORS = _VOC | _POLLEN
+_PRESETS = _SENSORS | (0b1111 << 27)
+# checked in this order when a command presses several preset buttons
+_PRESET_BUTTONS = [
+    (TOGGLE_GERM, 1 << 27),
+    (TOGGLE_GENERAL, 1 << 28),
+    (TOGGLE_ALLERGEN, 1 << 29),
+    (TOGGLE_TURBO, 1 << 30),
+]
+_POWERED_ON = IS_ON | (1 << 28)
+_BACKLIGHT_SHIFT = 16
+_BACKLIGHTS = 3
+_TIMER_STEPS = 19
+
+
+class Clock(Protocol):
+    def time(self) -> float:
+        ...
+
+    async def sleep(self, seconds: float):
+        ...
+
+
+class RealClock(Clock):
+    def time(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock(Clock):
+    # Sleeping advances the clock instead of waiting. Delays on one clock add
+    # up as if they happened one after another, so give each simulated device
+    # its own clock to model devices working in parallel.
+    #
+    # With auto_advance=False, time only moves when advance() is called and
+    # sleepers wait until it passes their deadline, so a test can step
+    # through time.
+    def __init__(self, start: float = 0.0, auto_advance: bool = True):
+        self._now = start
+        self._auto_advance = auto_advance
+        self._sleepers: list[tuple[float, asyncio.Future]] = []
+
+    def time(self) -> float:
+        return self._now
+
+    async def sleep(self, seconds: float):
+        if self._auto_advance or seconds <= 0:
+            self._now += max(seconds, 0.0)
+            await asyncio.sleep(0)
+            return
+
+        sleeper = (self._now + seconds, asyncio.get_running_loop().create_future())
+        self._sleepers.append(sleeper)
+        try:
+            await sleeper[1]
+        finally:
+            self._sleepers.remove(sleeper)
+
+    def advance(self, seconds: float):
+        self._now += seconds
+        for deadline, waiter in self._sleepers:
+            if deadline <= self._now and not waiter.done():
+                waiter.set_result(None)
+
+
+@dataclass(frozen=True)
+class SimulationProfile:
+    connect_latency: float = 0.0
+    # per GATT read or write
+    write_latency: float = 0.0
+    # from a command being written to its state notification
+    notification_delay: float = 0.0
+    # uniformly random extra seconds added to every delay
+    jitter: float = 0.0
+    # probability that a state notification never arrives
+    drop_rate: float = 0.0
+    # probability that the link drops on any GATT write
+    disconnect_rate: float = 0.0
+
+
+class SimulatedBTClient(BTClient):
+    def __init__(
+        self,
+        address: str = "00:35:FF:09:1A:C0",
+        initial_state: State = State.empty(),
+        profile: SimulationProfile = SimulationProfile(),
+        seed: int | None = None,
+        clock: Clock | None = None,
+    ):
+        self._address = address.upper()
+        self._mac = bytes.fromhex(self._address.replace(":", ""))
+        self.state = initial_state
+        self.profile = profile
+        self.clock = clock or RealClock()
+        self._rng = random.Random(seed)
+        self._is_connected = False
+        self._handshaken = False
+        # bumped on every connect so notifications in flight on an older
+        # link are never delivered on a newer one
+        self._link = 0
+        self._notify_callback: Callable[[bytes], Awaitable[None]] | None = None
+        self._last_delivery: asyncio.Task | None = None
+        self.disconnected_callback: Callable[[], Awaitable[None]] | None = None
+        self._disconnected_task: asyncio.Future | None = None
+
+        self.writes = 0
+        self.notifications = 0
+        self.dropped_notifications = 0
+        self.disconnects = 0
+
+    @property
+    def address(self) -> str:
+        return self._address
+
+    @property
+    def name(self) -> str:
+        return f"simulated {self._address}"
+
+    @property
+    def is_connected(self) -> bool:
+        return self._is_connected
+
+    async def connect(self):
+        await self.clock.sleep(self._delay(self.profile.connect_latency))
+        self._is_connected = True
+        self._handshaken = False
+        self._link += 1
+
+    async def disconnect(self):
+        self._drop_link()
+
+    async def read_gatt_char(self, uuid: str) -> bytes:
+        self._check_connected()
+        if uuid != SYSTEM_ID_UUID:
+            raise ValueError(f"unexpected characteristic read: {uuid}")
+        await self.clock.sleep(self._delay(self.profile.write_latency))
+        # System ID "C01A090000FF3500" encodes MAC 00:35:FF:09:1A:C0
+        mac = self._mac[::-1]
+        return mac[:3] + b"\x00\x00" + mac[3:]
+
+    async def write_gatt_char(self, uuid: str, data: bytes):
+        self._check_connected()
+        if uuid != COMMAND_UUID:
+            raise ValueError(f"unexpected characteristic write: {uuid}")
+        await self.clock.sleep(self._delay(self.profile.write_latency))
+        self.writes += 1
+
+        if self._rng.random() < self.profile.disconnect_rate:
+            self._drop_link()
+            self._disconnected_task = asyncio.ensure_future(self._handle_disconnect())
+            raise BTClientDisconnectedError("simulated link loss")
+
+        if data.startswith(b"MAC+"):
+            # the device ignores everything until it sees its own MAC
+            self._handshaken = data[4:] == self._mac
+        elif self._handshaken:
+            preamble, bits = COMMAND_STRUCT.unpack(data)
+            if preamble != PREAMBLE:
+                return
+            self.state = State.from_int(_press(self.state.to_int(), bits))
+        else:
+            return
+        self._schedule_notification(self.state.bytes)
+
+    async def start_notify(
+        self, uuid: str, callback: Callable[[bytes], Awaitable[None]]
+    ):
+        self._check_connected()
+        if uuid != STATE_UUID:
+            raise ValueError(f"unexpected characteristic watch: {uuid}")
+        self._notify_callback = callback
+
+    def _check_connected(self):
+        if not self._is_connected:
+            raise BTClientDisconnectedError("simulated device is not connected")
+
+    def _delay(self, seconds: float) -> float:
+        if self.profile.jitter:
+            seconds += self._rng.uniform(0, self.profile.jitter)
+        return seconds
+
+    def _drop_link(self):
+        if self._is_connected:
+            self.disconnects += 1
+        self._is_connected = False
+        self._handshaken = False
+        self._notify_callback = None
+        self._last_delivery = None
+
+    async def _handle_disconnect(self):
+        if self.disconnected_callback is not None:
+            await self.disconnected_callback()
+
+    def _schedule_notification(self, payload: bytes):
+        if self._rng.random() < self.profile.drop_rate:
+            self.dropped_notifications += 1
+            return
+        delay = self._delay(self.profile.notification_delay)
+        self._last_delivery = asyncio.ensure_future(
+            self._deliver(self._last_delivery, self._link, delay, payload)
+        )
+
+    async def _deliver(
+        self, previous: asyncio.Task | None, link: int, delay: float, data: bytes
+    ):
+        await self.clock.sleep(delay)
+        # notifications arrive in the order the device sent them
+        if previous is not None and not previous.done():
+            await asyncio.wait([previous])
+        if link == self._link and self._notify_callback is not None:
+            self.notifications += 1
+            await self._notify_callback(data)
+
+
+def _press(word: int, bits: int) -> int:
+    if bits & TOGGLE_POWER:
+        if word & IS_ON:
+            return 0
+        word = _POWERED_ON
+    elif not word & IS_ON:
+        return word
+
+    presets = word & _PRESETS
+    for button, preset in _PRESET_BUTTONS:
+        if bits & button:
+            presets = preset
+            break
+    else:
+        if bits & (TOGGLE_VOC | TOGGLE_POLLEN):
+            # the sensor buttons toggle their sensor in an auto preset and
+            # select the matching auto preset from a manual one
+            sensors = presets & _SENSORS
+            if bits & TOGGLE_VOC:
+                sensors ^= _VOC
+            if bits & TOGGLE_POLLEN:
+                sensors ^= _POLLEN
+            # with both sensors off the firmware's behaviour is unknown;
+            # keep the preset
+            if sensors:
+                presets = sensors
+    if not presets & _SENSORS:
+        # the VOC light is only reported in auto presets
+        word &= ~VOC_LIGHT_MASK
+    word = word & ~_PRESETS | presets
+
+    if bits & LIGHT_CYCLE:
+        backlight = (word & BACKLIGHT_MASK) >> _BACKLIGHT_SHIFT
+        backlight = (backlight + 1) % _BACKLIGHTS
+        word = word & ~BACKLIGHT_MASK | backlight << _BACKLIGHT_SHIFT
+
+    # 0 is no timer; both directions wrap around through it
+    timer = word & TIMER_MASK
+    if bits & TIMER_UP:
+        timer = (timer + 1) % _TIMER_STEPS
+    if bits & TIMER_DOWN:
+        timer = (timer - 1) % _TIMER_STEPS
+    return word & ~TIMER_MASK | timer
+
+
+class SimulatedDelegate(Delegate):
+    def __init__(self, client: SimulatedBTClient):
+        self.client = client
+
+    async def make_bt_client(
+        self, handle_disconnect: Callable[[], Awaitable[None]]
+    ) -> BTClient | None:
+        self.client.disconnected_callback = handle_disconnect
+        return self.client
+
+    async def handle_update(self, state: State):
+        pass
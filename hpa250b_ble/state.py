@@ -1,5 +1,6 @@
 import binascii
-from dataclasses import dataclass, replace
+import functools
+import logging
 import struct
 
 from . import _LOGGER
@@ -12,188 +13,302 @@ from .enums import Preset, Backlight, VOCLight
 # byte 3: <6-bit voc light spec> <2 bit backlight spec>
 # byte 4: <pad byte>
 # byte 5: <1 byte timer spec>
-_STATE_STRUCT_PACK_FORMAT = ">BI14x"
-_STATE_STRUCT_UNPACK_FORMAT = (
+_STATE_STRUCT_PACK = struct.Struct(">BI14x")
+# Size of a STATE frame
+STATE_SIZE = _STATE_STRUCT_PACK.size
+_STATE_STRUCT_UNPACK = struct.Struct(
     ">BI"  # sometimes we receive state with trailing zero bytes missing
 )
 
+# Decoded states keyed by the 32-bit state word. Devices report the same
+# handful of words over and over, so repeated notifications decode to the
+# same State instance without any work.
+_DECODED_STATES_CACHE_SIZE = 1024
+
 
 class StateError(Exception):
     pass
 
 
-@dataclass(frozen=True)
 class State:
+    # States are interned: there is exactly one instance per packed state
+    # word, so equality is identity and the footprint is one object per
+    # distinct device state.
+    __slots__ = ("is_on", "preset", "backlight", "voc_light", "timer", "_int", "_bytes")
+
     is_on: bool
     preset: Preset | None
     backlight: Backlight | None
     voc_light: VOCLight | None
     timer: int | None
 
-    def __post_init__(self):
-        if not self.is_on:
-            object.__setattr__(self, "preset", None)
-            object.__setattr__(self, "backlight", None)
-            object.__setattr__(self, "voc_light", None)
-            object.__setattr__(self, "timer", None)
-            return
-
-        if self.preset is None:
-            object.__setattr__(self, "preset", Preset.GENERAL)
+    def __new__(
+        cls,
+        is_on: bool,
+        preset: Preset | None,
+        backlight: Backlight | None,
+        voc_light: VOCLight | None,
+        timer: int | None,
+    ) -> "State":
+        if not is_on:
+            return _intern(0, False, None, None, None, None)
 
-        if self.backlight is None:
-            object.__setattr__(self, "backlight", Backlight.ON)
+        if preset is None:
+            preset = Preset.GENERAL
+
+        if backlight is None:
+            backlight = Backlight.ON
+
+        # The device only reports the VOC light in auto presets, where it
+        # reads as green when no other bits are set
+        if preset not in AUTO_PRESETS:
+            voc_light = None
+        elif voc_light is None:
+            voc_light = VOCLight.GREEN
+
+        if timer is not None and not 0 < timer <= TIMER_MASK:
+            raise StateError(f"invalid timer value: {timer}")
+
+        n = (
+            _is_on_to_int(is_on)
+            | _preset_to_int(preset)
+            | _voc_light_to_int(voc_light)
+            | _backlight_to_int(backlight)
+            | _timer_to_int(timer)
+        )
+        return _intern(n, is_on, preset, backlight, voc_light, timer)
 
     @classmethod
     def empty(cls) -> "State":
         return State(False, None, None, None, None)
 
+    @classmethod
+    def from_int(cls, n: int) -> "State":
+        return _state_from_int(n)
+
     @classmethod
     def from_bytes(cls, data: bytes) -> "State":
-        _LOGGER.debug(
-            f"constructing state from {len(data)} bytes: binascii.hexlify(data)"
-        )
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "constructing state from %d bytes: %s",
+                len(data),
+                binascii.hexlify(data),
+            )
 
         try:
-            _, state = struct.unpack(
-                _STATE_STRUCT_UNPACK_FORMAT,
-                data[: struct.calcsize(_STATE_STRUCT_UNPACK_FORMAT)],
-            )
+            _, state = _STATE_STRUCT_UNPACK.unpack_from(data)
         except Exception as e:
             raise StateError(
                 f"failed to deserialize state from {binascii.hexlify(data)}"
             ) from e
 
-        is_on = _is_on_from_int(state)
-
-        if not is_on:
-            return State.empty()
-
-        preset = _preset_from_int(state)
-        if preset is None:
-            raise ValueError("Could not determine preset from integer state", data)
-
-        voc_light: VOCLight | None = None
-        if preset in [Preset.AUTO_VOC_POLLEN, Preset.AUTO_VOC, Preset.AUTO_POLLEN]:
-            voc_light = _voc_light_from_int(state)
-
-        backlight = _backlight_from_int(state)
-        timer = _timer_from_int(state)
+        try:
+            return _state_from_int(state)
+        except ValueError as e:
+            raise ValueError(*e.args, data) from None
 
-        return State(is_on, preset, backlight, voc_light, timer)
+    def to_int(self) -> int:
+        return self._int
 
     @property
     def bytes(self) -> bytes:
-        data = 0
-        data |= _is_on_to_int(self.is_on)
-        data |= _preset_to_int(self.preset)
-        data |= _voc_light_to_int(self.voc_light)
-        data |= _backlight_to_int(self.backlight)
-        data |= _timer_to_int(self.timer)
-
-        return struct.pack(_STATE_STRUCT_PACK_FORMAT, PREAMBLE, data)
+        return self._bytes
 
     def matches_desired_state(self, desired: "State") -> bool:
-        return (
-            self.is_on == desired.is_on
-            and self.preset == desired.preset
-            and self.backlight == desired.backlight
-            and self.timer == desired.timer
-        )
+        # Compares power, preset, backlight and timer; the VOC light is
+        # reported by the device and can't be desired
+        return (self._int & _DESIRABLE_MASK) == (desired._int & _DESIRABLE_MASK)
 
     def with_is_on(self, is_on: bool) -> "State":
-        return replace(self, is_on=is_on)
+        return State(is_on, self.preset, self.backlight, self.voc_light, self.timer)
 
     def with_preset(self, preset: Preset) -> "State":
-        return replace(self, preset=preset)
+        return State(self.is_on, preset, self.backlight, self.voc_light, self.timer)
 
     def with_backlight(self, backlight: Backlight) -> "State":
-        return replace(self, preset=backlight)
+        return State(self.is_on, self.preset, backlight, self.voc_light, self.timer)
 
     def with_timer(self, timer: int | None) -> "State":
-        return replace(self, timer=timer)
+        return State(self.is_on, self.preset, self.backlight, self.voc_light, timer)
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, State):
+            return NotImplemented
+        return self._int == other._int
+
+    def __hash__(self) -> int:
+        return hash(self._int)
+
+    def __setattr__(self, *_):
+        raise AttributeError("State is immutable")
+
+    def __delattr__(self, *_):
+        raise AttributeError("State is immutable")
+
+    def __reduce__(self):
+        return (State.from_int, (self._int,))
+
+    def __repr__(self) -> str:
+        return (
+            f"State(is_on={self.is_on!r}, preset={self.preset!r}, "
+            + f"backlight={self.backlight!r}, voc_light={self.voc_light!r}, "
+            + f"timer={self.timer!r})"
+        )
+
+
+_INTERNED: dict[int, State] = {}
+
+
+def _intern(
+    n: int,
+    is_on: bool,
+    preset: Preset | None,
+    backlight: Backlight | None,
+    voc_light: VOCLight | None,
+    timer: int | None,
+) -> State:
+    if (state := _INTERNED.get(n)) is not None:
+        return state
+
+    state = object.__new__(State)
+    for name, value in [
+        ("is_on", is_on),
+        ("preset", preset),
+        ("backlight", backlight),
+        ("voc_light", voc_light),
+        ("timer", timer),
+        ("_int", n),
+        ("_bytes", _STATE_STRUCT_PACK.pack(PREAMBLE, n)),
+    ]:
+        object.__setattr__(state, name, value)
+    _INTERNED[n] = state
+    return state
+
+
+@functools.lru_cache(maxsize=_DECODED_STATES_CACHE_SIZE)
+def _state_from_int(state: int) -> State:
+    if not _is_on_from_int(state):
+        return State.empty()
+
+    preset = _preset_from_int(state)
+    if preset is None:
+        raise ValueError("Could not determine preset from integer state")
+
+    voc_light: VOCLight | None = None
+    if preset in AUTO_PRESETS:
+        voc_light = _voc_light_from_int(state)
+
+    backlight = _backlight_from_int(state)
+    timer = _timer_from_int(state)
+
+    return State(True, preset, backlight, voc_light, timer)
+
+
+# Bit layout of the 32-bit state word. These tables are public so decoders
+# working on many words at once (see bulk.py) agree with State.from_int.
+IS_ON = 1 << 24
+TIMER_MASK = 0xFF
+BACKLIGHT_MASK = 0b11 << 16
+VOC_LIGHT_MASK = 0b11111100 << 16
+
+# Everything but the VOC light and the pad byte
+_DESIRABLE_MASK = 0xFF_FF_00_FF & ~VOC_LIGHT_MASK
+
+_PRESET_TO_INT = {
+    None: 0,
+    Preset.GERM: 1 << 27,
+    Preset.GENERAL: 1 << 28,
+    Preset.ALLERGEN: 1 << 29,
+    Preset.TURBO: 1 << 30,
+    Preset.AUTO_VOC: 1 << 25,
+    Preset.AUTO_POLLEN: 1 << 26,
+    Preset.AUTO_VOC_POLLEN: (1 << 25) | (1 << 26),
+}
+
+# Checked in order; AUTO_VOC_POLLEN has to win over AUTO_VOC and AUTO_POLLEN
+PRESETS_BY_PRIORITY = tuple(
+    (_PRESET_TO_INT[p], p)
+    for p in [
+        Preset.AUTO_VOC_POLLEN,
+        Preset.AUTO_VOC,
+        Preset.AUTO_POLLEN,
+        Preset.GERM,
+        Preset.GENERAL,
+        Preset.ALLERGEN,
+        Preset.TURBO,
+    ]
+)
+
+AUTO_PRESETS = frozenset([Preset.AUTO_VOC_POLLEN, Preset.AUTO_VOC, Preset.AUTO_POLLEN])
+
+_VOC_LIGHT_TO_INT = {
+    None: 0,
+    VOCLight.GREEN: 0 << 16,
+    VOCLight.AMBER: 4 << 16,
+    VOCLight.RED: 8 << 16,
+}
+
+VOC_LIGHT_FROM_INT = {
+    0: VOCLight.GREEN,
+    4: VOCLight.AMBER,
+    8: VOCLight.RED,
+}
+
+_BACKLIGHT_TO_INT = {
+    None: 0,
+    Backlight.ON: 0 << 16,
+    Backlight.DIM: 1 << 16,
+    Backlight.OFF: 2 << 16,
+}
+
+BACKLIGHT_FROM_INT = {
+    0: Backlight.ON,
+    1: Backlight.DIM,
+    2: Backlight.OFF,
+}
 
 
 def _is_on_from_int(n: int) -> bool:
-    return bool(n & _is_on_to_int(True))
+    return bool(n & IS_ON)
 
 
 def _is_on_to_int(is_on: bool) -> int:
     if not is_on:
         return 0
-    return 1 << 24
+    return IS_ON
 
 
 def _preset_from_int(n: int) -> Preset | None:
-    if (n & (p := _preset_to_int(Preset.AUTO_VOC_POLLEN))) == p:
-        return Preset.AUTO_VOC_POLLEN
-    if (n & (p := _preset_to_int(Preset.AUTO_VOC))) == p:
-        return Preset.AUTO_VOC
-    if (n & (p := _preset_to_int(Preset.AUTO_POLLEN))) == p:
-        return Preset.AUTO_POLLEN
-    if (n & (p := _preset_to_int(Preset.GERM))) == p:
-        return Preset.GERM
-    if (n & (p := _preset_to_int(Preset.GENERAL))) == p:
-        return Preset.GENERAL
-    if (n & (p := _preset_to_int(Preset.ALLERGEN))) == p:
-        return Preset.ALLERGEN
-    if (n & (p := _preset_to_int(Preset.TURBO))) == p:
-        return Preset.TURBO
-    else:
-        return None
+    for p, preset in PRESETS_BY_PRIORITY:
+        if (n & p) == p:
+            return preset
+    return None
 
 
 def _preset_to_int(preset: Preset | None) -> int:
-    return {
-        None: 0,
-        Preset.GERM: 1 << 27,
-        Preset.GENERAL: 1 << 28,
-        Preset.ALLERGEN: 1 << 29,
-        Preset.TURBO: 1 << 30,
-        Preset.AUTO_VOC: 1 << 25,
-        Preset.AUTO_POLLEN: 1 << 26,
-        Preset.AUTO_VOC_POLLEN: (1 << 25) | (1 << 26),
-    }[preset]
+    return _PRESET_TO_INT[preset]
 
 
 def _voc_light_from_int(n: int) -> VOCLight:
-    n = (n >> 16) & 0b11111100
-    return {
-        0: VOCLight.GREEN,
-        4: VOCLight.AMBER,
-        8: VOCLight.RED,
-    }[n]
+    return VOC_LIGHT_FROM_INT[(n & VOC_LIGHT_MASK) >> 16]
 
 
 def _voc_light_to_int(voc_light: VOCLight | None) -> int:
-    return {
-        None: 0,
-        VOCLight.GREEN: 0 << 16,
-        VOCLight.AMBER: 4 << 16,
-        VOCLight.RED: 8 << 16,
-    }[voc_light]
+    return _VOC_LIGHT_TO_INT[voc_light]
 
 
 def _backlight_from_int(n: int) -> Backlight:
-    n = (n >> 16) & 0b00000011
-    return {
-        0: Backlight.ON,
-        1: Backlight.DIM,
-        2: Backlight.OFF,
-    }[n]
+    return BACKLIGHT_FROM_INT[(n & BACKLIGHT_MASK) >> 16]
 
 
 def _backlight_to_int(backlight: Backlight | None) -> int:
-    return {
-        None: 0,
-        Backlight.ON: 0 << 16,
-        Backlight.DIM: 1 << 16,
-        Backlight.OFF: 2 << 16,
-    }[backlight]
+    return _BACKLIGHT_TO_INT[backlight]
 
 
 def _timer_from_int(n: int) -> int | None:
-    value = n & 0xFF
+    value = n & TIMER_MASK
     if value == 0:
         return None
     return value
@@ -0,0 +1,68 @@
+import asyncio
+from collections import deque
+from enum import Enum
+from typing import Callable
+from .state import State
+
+SUBSCRIPTION_QUEUE_SIZE = 16
+
+
+class OverflowPolicy(Enum):
+    # keep the most recent SUBSCRIPTION_QUEUE_SIZE states, dropping older ones
+    DROP_OLDEST = "drop-oldest"
+    # keep only the latest state
+    COALESCE_LATEST = "coalesce-latest"
+
+
+class Subscription:
+    def __init__(
+        self,
+        maxsize: int = SUBSCRIPTION_QUEUE_SIZE,
+        policy: OverflowPolicy = OverflowPolicy.COALESCE_LATEST,
+        on_close: Callable[["Subscription"], None] | None = None,
+    ):
+        if policy == OverflowPolicy.COALESCE_LATEST:
+            maxsize = 1
+        self._states: deque[State] = deque(maxlen=maxsize)
+        self._available = asyncio.Event()
+        self._closed = False
+        self._on_close = on_close
+        self.dropped = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def publish(self, state: State):
+        # Never blocks: called from the BLE notification callback
+        if self._closed:
+            return
+        if len(self._states) == self._states.maxlen:
+            self.dropped += 1
+        self._states.append(state)
+        self._available.set()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._available.set()
+        if self._on_close is not None:
+            self._on_close(self)
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> State:
+        while not self._states:
+            if self._closed:
+                raise StopAsyncIteration
+            self._available.clear()
+            await self._available.wait()
+        return self._states.popleft()
+
+    async def __aenter__(self) -> "Subscription":
+        return self
+
+    async def __aexit__(self, *_):
+        self.close()
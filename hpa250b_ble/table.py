@@ -0,0 +1,235 @@
+from array import array
+from .command import (
+    Command,
+    LIGHT_CYCLE,
+    TIMER_DOWN,
+    TIMER_UP,
+    TOGGLE_POLLEN,
+    TOGGLE_POWER,
+)
+from .enums import Preset, VOCLight
+from .state import State
+from .transition import (
+    AUTO_PRESETS,
+    BACKLIGHT_CYCLE,
+    TIMER_VALUES,
+    preset_command,
+    transition,
+)
+
+# Controllable state is packed into a dense index: 0 is off, the rest are
+# 1 + (preset, backlight, timer) in mixed radix. The VOC light is reported
+# by the device, not controlled, and is not part of the index.
+#
+# Commands act on preset, backlight and timer independently, so instead of a
+# STATE_COUNT x 2^10 table the transition and next-hop tables are kept per
+# component, which makes every lookup O(1) while the tables stay under 1KiB.
+
+PRESETS = list(Preset)
+
+_PRESET_INDEX = {p: i for i, p in enumerate(PRESETS)}
+_BACKLIGHT_INDEX = {b: i for i, b in enumerate(BACKLIGHT_CYCLE)}
+_TIMER_INDEX = {t: i for i, t in enumerate(TIMER_VALUES)}
+
+_PRESETS_N = len(PRESETS)
+_BACKLIGHTS_N = len(BACKLIGHT_CYCLE)
+_TIMERS_N = len(TIMER_VALUES)
+
+STATE_COUNT = 1 + _PRESETS_N * _BACKLIGHTS_N * _TIMERS_N
+OFF = 0
+
+# germ, general, allergen, turbo and VOC toggles are adjacent in the bitmask
+_PRESET_BITS_SHIFT = 9
+_PRESET_BITS_MASK = 0b11111
+_POLLEN_BIT = 1 << 5
+_PRESET_KEYS = 1 << 6
+
+
+def state_index(state: State) -> int:
+    if not state.is_on:
+        return OFF
+    return _pack(
+        _PRESET_INDEX[state.preset],
+        _BACKLIGHT_INDEX[state.backlight],
+        _TIMER_INDEX[state.timer],
+    )
+
+
+def state_at(index: int) -> State:
+    return _STATES[index]
+
+
+def next_index(index: int, command: int) -> int:
+    if command & TOGGLE_POWER:
+        if index != OFF:
+            return OFF
+        index = _POWERED_ON
+    elif index == OFF:
+        return OFF
+
+    p, b, t = _unpack(index)
+    return _pack(
+        _PRESET_TRANSITIONS[p * _PRESET_KEYS + _preset_key(command)],
+        _BACKLIGHT_TRANSITIONS[b * 2 + bool(command & LIGHT_CYCLE)],
+        _TIMER_TRANSITIONS[t * 4 + (command & (TIMER_UP | TIMER_DOWN))],
+    )
+
+
+def next_command(index: int, desired: int, power_cycle: bool = False) -> int:
+    if (index == OFF) != (desired == OFF):
+        return TOGGLE_POWER
+    if index == desired:
+        return 0
+    if power_cycle and _resets_faster(index, desired):
+        return TOGGLE_POWER
+
+    p, b, t = _unpack(index)
+    dp, db, dt = _unpack(desired)
+    return (
+        _PRESET_NEXT_HOPS[p * _PRESETS_N + dp]
+        | _BACKLIGHT_NEXT_HOPS[b * _BACKLIGHTS_N + db]
+        | _TIMER_NEXT_HOPS[t * _TIMERS_N + dt]
+    )
+
+
+def distance(index: int, desired: int, power_cycle: bool = False) -> int:
+    if index == OFF:
+        return 0 if desired == OFF else 1 + _walk_distance(_POWERED_ON, desired)
+    if desired == OFF:
+        return 1
+    if power_cycle and _resets_faster(index, desired):
+        return 2 + _walk_distance(_POWERED_ON, desired)
+    return _walk_distance(index, desired)
+
+
+def _resets_faster(index: int, desired: int) -> bool:
+    # Powering off and on again resets the device to _POWERED_ON, which is
+    # sometimes closer than walking there, e.g. to clear a long timer. It
+    # also stops a running purifier for a moment, so callers opt in with
+    # power_cycle=True.
+    return 2 + _walk_distance(_POWERED_ON, desired) < _walk_distance(index, desired)
+
+
+def _walk_distance(index: int, desired: int) -> int:
+    p, b, t = _unpack(index)
+    dp, db, dt = _unpack(desired)
+    return max(
+        _PRESET_DISTANCES[p * _PRESETS_N + dp],
+        _BACKLIGHT_DISTANCES[b * _BACKLIGHTS_N + db],
+        _TIMER_DISTANCES[t * _TIMERS_N + dt],
+    )
+
+
+def _pack(preset: int, backlight: int, timer: int) -> int:
+    return 1 + (preset * _BACKLIGHTS_N + backlight) * _TIMERS_N + timer
+
+
+def _unpack(index: int) -> tuple[int, int, int]:
+    rest, timer = divmod(index - 1, _TIMERS_N)
+    preset, backlight = divmod(rest, _BACKLIGHTS_N)
+    return preset, backlight, timer
+
+
+def _preset_key(command: int) -> int:
+    key = (command >> _PRESET_BITS_SHIFT) & _PRESET_BITS_MASK
+    if command & TOGGLE_POLLEN:
+        key |= _POLLEN_BIT
+    return key
+
+
+def _preset_bits(key: int) -> int:
+    bits = (key & _PRESET_BITS_MASK) << _PRESET_BITS_SHIFT
+    if key & _POLLEN_BIT:
+        bits |= TOGGLE_POLLEN
+    return bits
+
+
+def _build_states() -> list[State]:
+    states = [State.empty()] * STATE_COUNT
+    for preset in PRESETS:
+        voc_light = VOCLight.GREEN if preset in AUTO_PRESETS else None
+        for backlight in BACKLIGHT_CYCLE:
+            for timer in TIMER_VALUES:
+                state = State(True, preset, backlight, voc_light, timer)
+                states[state_index(state)] = state
+    return states
+
+
+def _build_preset_tables() -> tuple[array, array, array]:
+    transitions = array("B", [0] * (_PRESETS_N * _PRESET_KEYS))
+    next_hops = array("H", [0] * (_PRESETS_N * _PRESETS_N))
+    distances = array("B", [0] * (_PRESETS_N * _PRESETS_N))
+
+    for p, preset in enumerate(PRESETS):
+        state = State(True, preset, None, None, None)
+        for key in range(_PRESET_KEYS):
+            next_preset = transition(state, Command.from_int(_preset_bits(key))).preset
+            transitions[p * _PRESET_KEYS + key] = _PRESET_INDEX[next_preset]
+        for dp, desired in enumerate(PRESETS):
+            next_hops[p * _PRESETS_N + dp] = preset_command(preset, desired).command
+            distances[p * _PRESETS_N + dp] = preset != desired
+    return transitions, next_hops, distances
+
+
+def _build_backlight_tables() -> tuple[array, array, array]:
+    transitions = array("B", [0] * (_BACKLIGHTS_N * 2))
+    next_hops = array("H", [0] * (_BACKLIGHTS_N * _BACKLIGHTS_N))
+    distances = array("B", [0] * (_BACKLIGHTS_N * _BACKLIGHTS_N))
+
+    for b, backlight in enumerate(BACKLIGHT_CYCLE):
+        state = State(True, None, backlight, None, None)
+        cycled = transition(state, Command().cycle_light()).backlight
+        transitions[b * 2] = b
+        transitions[b * 2 + 1] = _BACKLIGHT_INDEX[cycled]
+        for db in range(_BACKLIGHTS_N):
+            forward = (db - b) % _BACKLIGHTS_N
+            next_hops[b * _BACKLIGHTS_N + db] = LIGHT_CYCLE if forward else 0
+            distances[b * _BACKLIGHTS_N + db] = forward
+    return transitions, next_hops, distances
+
+
+def _build_timer_tables() -> tuple[array, array, array]:
+    transitions = array("B", [0] * (_TIMERS_N * 4))
+    next_hops = array("H", [0] * (_TIMERS_N * _TIMERS_N))
+    distances = array("B", [0] * (_TIMERS_N * _TIMERS_N))
+
+    for t, timer in enumerate(TIMER_VALUES):
+        state = State(True, None, None, None, timer)
+        for bits in range(4):
+            next_timer = transition(state, Command.from_int(bits)).timer
+            transitions[t * 4 + bits] = _TIMER_INDEX[next_timer]
+        for dt in range(_TIMERS_N):
+            up = (dt - t) % _TIMERS_N
+            down = (t - dt) % _TIMERS_N
+            if up == 0:
+                hop = 0
+            elif up <= down:
+                hop = TIMER_UP
+            else:
+                hop = TIMER_DOWN
+            next_hops[t * _TIMERS_N + dt] = hop
+            distances[t * _TIMERS_N + dt] = min(up, down)
+    return transitions, next_hops, distances
+
+
+_POWERED_ON = state_index(State.empty().with_is_on(True))
+_STATES = _build_states()
+(
+    _PRESET_TRANSITIONS,
+    _PRESET_NEXT_HOPS,
+    _PRESET_DISTANCES,
+) = _build_preset_tables()
+(
+    _BACKLIGHT_TRANSITIONS,
+    _BACKLIGHT_NEXT_HOPS,
+    _BACKLIGHT_DISTANCES,
+) = _build_backlight_tables()
+(
+    _TIMER_TRANSITIONS,
+    _TIMER_NEXT_HOPS,
+    _TIMER_DISTANCES,
+) = _build_timer_tables()
+
+MAX_DISTANCE = 1 + max(
+    max(_PRESET_DISTANCES), max(_BACKLIGHT_DISTANCES), max(_TIMER_DISTANCES)
+)
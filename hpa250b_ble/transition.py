@@ -0,0 +1,120 @@
+from typing import Iterator
+from .command import Command
+from .enums import Preset, Backlight, VOCLight
+from .state import State
+
+MAX_TIMER = 18
+
+# Pressing the light button cycles ON -> DIM -> OFF -> ON
+BACKLIGHT_CYCLE = [Backlight.ON, Backlight.DIM, Backlight.OFF]
+
+# Timer buttons step through off, 1..18 hours and wrap around in both directions
+TIMER_VALUES: list[int | None] = [None, *range(1, MAX_TIMER + 1)]
+
+# Auto presets are combinations of the VOC and pollen sensor toggles
+AUTO_PRESETS = {
+    Preset.AUTO_VOC: (True, False),
+    Preset.AUTO_POLLEN: (False, True),
+    Preset.AUTO_VOC_POLLEN: (True, True),
+}
+_AUTO_PRESET_BY_TOGGLES = {v: k for k, v in AUTO_PRESETS.items()}
+
+
+def transition(state: State, cmd: Command) -> State:
+    if cmd.is_toggle_power:
+        if state.is_on:
+            return State.empty()
+        state = State.empty().with_is_on(True)
+
+    if not state.is_on:
+        return state
+
+    preset, voc_light = _next_preset(state, cmd)
+    backlight = state.backlight
+    if cmd.is_cycle_light:
+        backlight = _next_backlight(backlight)
+
+    timer = state.timer
+    if cmd.is_timer_up:
+        timer = _timer_up(timer)
+    if cmd.is_timer_down:
+        timer = _timer_down(timer)
+
+    return State(True, preset, backlight, voc_light, timer)
+
+
+def preset_command(current: Preset | None, desired: Preset) -> Command:
+    command = Command()
+    if current == desired:
+        return command
+
+    if desired == Preset.GERM:
+        return command.toggle_germ()
+    if desired == Preset.GENERAL:
+        return command.toggle_general()
+    if desired == Preset.ALLERGEN:
+        return command.toggle_allergen()
+    if desired == Preset.TURBO:
+        return command.toggle_turbo()
+
+    voc, pollen = AUTO_PRESETS.get(current, (False, False))  # type: ignore[arg-type]
+    want_voc, want_pollen = AUTO_PRESETS[desired]
+    if voc != want_voc:
+        command.toggle_auto_voc()
+    if pollen != want_pollen:
+        command.toggle_auto_pollen()
+    return command
+
+
+def all_states() -> Iterator[State]:
+    yield State.empty()
+    for preset in Preset:
+        for backlight in BACKLIGHT_CYCLE:
+            for timer in TIMER_VALUES:
+                yield State(True, preset, backlight, None, timer)
+
+
+def _next_preset(state: State, cmd: Command) -> tuple[Preset | None, VOCLight | None]:
+    if cmd.is_toggle_germ:
+        return Preset.GERM, None
+    if cmd.is_toggle_general:
+        return Preset.GENERAL, None
+    if cmd.is_toggle_allergen:
+        return Preset.ALLERGEN, None
+    if cmd.is_toggle_turbo:
+        return Preset.TURBO, None
+
+    if not (cmd.is_toggle_auto_voc or cmd.is_toggle_auto_pollen):
+        return state.preset, state.voc_light
+
+    # VOC and pollen buttons toggle their sensor while in an auto preset,
+    # and select the corresponding auto preset from a manual one
+    voc, pollen = AUTO_PRESETS.get(state.preset, (False, False))  # type: ignore[arg-type]
+    voc ^= cmd.is_toggle_auto_voc
+    pollen ^= cmd.is_toggle_auto_pollen
+    preset = _AUTO_PRESET_BY_TOGGLES.get((voc, pollen))
+    if preset is None:
+        # what the firmware does when both sensors get switched off is unknown,
+        # so model it as a no-op; the planner never relies on it
+        return state.preset, state.voc_light
+
+    if state.preset in AUTO_PRESETS and state.voc_light is not None:
+        return preset, state.voc_light
+    return preset, VOCLight.GREEN
+
+
+def _next_backlight(backlight: Backlight | None) -> Backlight:
+    if backlight is None:
+        return Backlight.ON
+    i = BACKLIGHT_CYCLE.index(backlight)
+    return BACKLIGHT_CYCLE[(i + 1) % len(BACKLIGHT_CYCLE)]
+
+
+def _timer_up(timer: int | None) -> int | None:
+    i = TIMER_VALUES.index(timer)
+    return TIMER_VALUES[(i + 1) % len(TIMER_VALUES)]
+
+
+def _timer_down(timer: int | None) -> int | None:
+    i = TIMER_VALUES.index(timer)
+    return TIMER_VALUES[(i - 1) % len(TIMER_VALUES)]
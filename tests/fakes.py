@@ -0,0 +1,104 @@
+import binascii
+from typing import Awaitable, Callable
+from hpa250b_ble.command import COMMAND_STRUCT
+from hpa250b_ble.const import SYSTEM_ID_UUID, COMMAND_UUID, STATE_UUID
+from hpa250b_ble.hpa250b import BTClient, Delegate
+from hpa250b_ble.state import State
+from hpa250b_ble.table import next_index, state_at, state_index
+
+SYSTEM_ID = binascii.unhexlify("C01A090000FF3500")
+MAC = binascii.unhexlify("0035FF091AC0")
+
+
+class FakeBTClient(BTClient):
+    def __init__(
+        self,
+        initial_state=State.empty(),
+        disconnect_callback: Callable[[], Awaitable[None]] | None = None,
+    ):
+        self._is_connected = False
+        self.notify_callback: Callable[[bytes], Awaitable[None]] | None = None
+        self.next_notification: bytes | None = None
+        self.disconnect_callback = disconnect_callback
+        self.commands: list[bytes] = []
+        self.reads: list[str] = []
+        self.initial_state = initial_state
+
+    @property
+    def address(self) -> str:
+        return "00:01:02:03:04:05"
+
+    @property
+    def name(self) -> str:
+        return "mydevice"
+
+    @property
+    def is_connected(self) -> bool:
+        return self._is_connected
+
+    async def connect(self):
+        self.setup_notification(self.initial_state.bytes)
+        self._is_connected = True
+
+    async def disconnect(self):
+        self._is_connected = False
+        if self.disconnect_callback is not None:
+            await self.disconnect_callback()
+
+    async def read_gatt_char(self, uuid: str) -> bytes:
+        if uuid != SYSTEM_ID_UUID:
+            raise ValueError(f"unexpected characteristic read: {uuid}")
+
+        self.reads.append(uuid)
+        return SYSTEM_ID
+
+    async def write_gatt_char(self, uuid: str, data: bytes):
+        if uuid != COMMAND_UUID:
+            raise ValueError(f"unexpected characteristic write: {uuid}")
+
+        self.commands.append(data)
+        if data.startswith(b"MAC+") and data != b"MAC+" + MAC:
+            return
+        if self.notify_callback is not None and self.next_notification is not None:
+            await self.notify_callback(self.next_notification)
+
+    async def start_notify(
+        self, uuid: str, callback: Callable[[bytes], Awaitable[None]]
+    ):
+        if uuid != STATE_UUID:
+            raise ValueError(f"unexpected characteristic watch: {uuid}")
+
+        self.notify_callback = callback
+
+    def setup_notification(self, data: bytes):
+        self.next_notification = data
+
+
+class TransitioningBTClient(FakeBTClient):
+    def __init__(self, initial_state=State.empty(), ignored_command: int | None = None):
+        super().__init__(initial_state)
+        self.state = initial_state
+        self.ignored_command = ignored_command
+
+    async def write_gatt_char(self, uuid: str, data: bytes):
+        if not data.startswith(b"MAC+"):
+            _, command = COMMAND_STRUCT.unpack(data)
+            if len(self.commands) - 1 != self.ignored_command:
+                self.state = state_at(next_index(state_index(self.state), command))
+            self.setup_notification(self.state.bytes)
+        await super().write_gatt_char(uuid, data)
+
+
+class FakeDelegate(Delegate):
+    def __init__(self, client: FakeBTClient | None):
+        self._client = client
+
+    async def make_bt_client(
+        self, disconnect_callback: Callable[[], Awaitable[None]]
+    ) -> BTClient | None:
+        if self._client is not None:
+            self._client.disconnect_callback = disconnect_callback
+        return self._client
+
+    async def handle_update(self, *_):
+        pass
@@ -0,0 +1,77 @@
+import pytest
+from hpa250b_ble.enums import Backlight, Preset, VOCLight
+from hpa250b_ble.state import State
+from hpa250b_ble.table import STATE_COUNT, state_at
+
+np = pytest.importorskip("numpy")
+
+from hpa250b_ble.bulk import (
+    BACKLIGHTS,
+    FRAME_SIZE,
+    PRESETS,
+    VOC_LIGHTS,
+    decode_frames,
+)
+
+
+def _code(values: list, value) -> int:
+    return -1 if value is None else values.index(value)
+
+
+def test_matches_from_bytes():
+    states = [state_at(i) for i in range(STATE_COUNT)] + [
+        State(True, Preset.AUTO_VOC, Backlight.DIM, VOCLight.RED, 200),
+        State(True, Preset.AUTO_VOC_POLLEN, Backlight.OFF, VOCLight.AMBER, None),
+    ]
+
+    decoded = decode_frames(b"".join(s.bytes for s in states))
+
+    assert decoded.valid.all()
+    for row, state in enumerate(states):
+        assert decoded.is_on[row] == state.is_on
+        assert decoded.preset[row] == _code(PRESETS, state.preset)
+        assert decoded.backlight[row] == _code(BACKLIGHTS, state.backlight)
+        assert decoded.voc_light[row] == _code(VOC_LIGHTS, state.voc_light)
+        assert decoded.timer[row] == (state.timer or 0)
+        assert decoded.state(row) == state
+
+
+def test_decodes_state_bytes():
+    states = [state_at(i) for i in range(STATE_COUNT)]
+    assert {len(s.bytes) for s in states} == {FRAME_SIZE}
+
+    decoded = decode_frames(b"".join(s.bytes for s in states))
+
+    assert list(decoded.states()) == states
+
+
+def test_reports_malformed_rows():
+    good = State(True, Preset.GERM, Backlight.ON, None, 3).bytes
+    bad_preamble = b"\x00" + good[1:]
+    no_preset = bytes([good[0], 0x01, 0, 0, 3]) + bytes(14)
+    bad_backlight = bytes([good[0], 0x11, 0x03, 0, 0]) + bytes(14)
+    bad_voc_light = bytes([good[0], 0x03, 0xFC, 0, 0]) + bytes(14)
+
+    decoded = decode_frames(
+        good + bad_preamble + no_preset + bad_backlight + bad_voc_light + good
+    )
+
+    assert decoded.malformed.tolist() == [1, 2, 3, 4]
+    assert decoded.state(0) == decoded.state(5) == State.from_bytes(good)
+    assert decoded.state(0).timer == 3
+    assert decoded.state(1) is None
+    assert decoded.preset[2] == -1
+
+
+def test_accepts_short_frames_as_rows():
+    state = State(True, Preset.TURBO, Backlight.DIM, None, 18)
+    rows = np.frombuffer(state.bytes[:5] * 3, dtype=np.uint8).reshape(3, 5)
+
+    decoded = decode_frames(rows)
+
+    assert list(decoded.states()) == [state] * 3
+
+
+def test_rejects_partial_frames():
+    with pytest.raises(ValueError):
+        decode_frames(State.empty().bytes + b"\x00")
@@ -0,0 +1,151 @@
+import time
+import pytest
+from hpa250b_ble.capture import (
+    CaptureEvent,
+    CaptureKind,
+    CaptureWriter,
+    RecordingDelegate,
+    ReplayBTClient,
+    ReplayDelegate,
+    read_capture,
+)
+from hpa250b_ble.command import Command
+from hpa250b_ble.const import COMMAND_UUID, STATE_UUID, SYSTEM_ID_UUID
+from hpa250b_ble.enums import Backlight, Preset
+from hpa250b_ble.hpa250b import HPA250B
+from hpa250b_ble.reconcile import reconcile
+from hpa250b_ble.reconnect import ReconnectPolicy
+from hpa250b_ble.simulation import SimulatedBTClient, SimulatedDelegate
+from hpa250b_ble.state import State
+from .fakes import MAC, SYSTEM_ID
+
+DESIRED = State(True, Preset.ALLERGEN, Backlight.OFF, None, 4)
+
+
+async def record_session(path):
+    with CaptureWriter(path) as writer:
+        delegate = RecordingDelegate(SimulatedDelegate(SimulatedBTClient()), writer)
+        h = HPA250B(delegate)
+        await h.connect()
+        await reconcile(h, DESIRED)
+        await h.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_records_session(tmp_path):
+    path = tmp_path / "session.cap"
+    await record_session(path)
+
+    events = read_capture(path)
+
+    kinds = [e.kind for e in events]
+    assert kinds[:4] == [
+        CaptureKind.CONNECT,
+        CaptureKind.READ,
+        CaptureKind.WRITE,
+        CaptureKind.NOTIFY,
+    ]
+    assert kinds[-1] == CaptureKind.DISCONNECT
+    assert events[2].data == b"MAC+" + MAC
+    assert State.from_bytes(events[-2].data).matches_desired_state(DESIRED)
+    assert all(a.timestamp <= b.timestamp for a, b in zip(events, events[1:]))
+
+
+def test_records_reach_the_file_before_close(tmp_path):
+    path = tmp_path / "session.cap"
+    with CaptureWriter(path) as writer:
+        writer.write(CaptureKind.CONNECT, data=b"00:35:FF:09:1A:C0")
+        writer.write(CaptureKind.NOTIFY, STATE_UUID, State.empty().bytes)
+
+        # as if the process died here
+        events = read_capture(path)
+
+    assert [e.kind for e in events] == [CaptureKind.CONNECT, CaptureKind.NOTIFY]
+
+
+@pytest.mark.asyncio
+async def test_replays_session(tmp_path):
+    path = tmp_path / "session.cap"
+    await record_session(path)
+
+    client = ReplayBTClient.from_file(path)
+    h = HPA250B(ReplayDelegate(client))
+    await h.connect()
+    await reconcile(h, DESIRED)
+
+    assert h.current_state.matches_desired_state(DESIRED)
+    assert client.exhausted
+    assert client.mismatched_writes == 0
+
+
+@pytest.mark.asyncio
+async def test_counts_mismatched_writes(tmp_path):
+    path = tmp_path / "session.cap"
+    await record_session(path)
+
+    client = ReplayBTClient.from_file(path)
+    h = HPA250B(ReplayDelegate(client))
+    await h.connect()
+    await h.apply_command(Command().toggle_turbo())
+
+    # the capture is played back regardless of what was written
+    assert client.mismatched_writes == 1
+    assert h.current_state.is_on
+
+
+def notifications(*states: State, start: float = 0.0) -> list[CaptureEvent]:
+    return [
+        CaptureEvent(start + i, CaptureKind.NOTIFY, STATE_UUID, s.bytes)
+        for i, s in enumerate(states)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_realtime_replay_keeps_spacing():
+    handshake = CaptureEvent(0.0, CaptureKind.WRITE, COMMAND_UUID, b"MAC+" + MAC)
+    on = State.empty().with_is_on(True)
+    events = [handshake, *notifications(State.empty(), on, start=0.5)]
+    client = ReplayBTClient(events, realtime=True, speed=100)
+    received = []
+
+    async def callback(data: bytes):
+        received.append((time.monotonic(), State.from_bytes(data)))
+
+    await client.connect()
+    await client.start_notify(STATE_UUID, callback)
+    started_at = time.monotonic()
+    await client.write_gatt_char(COMMAND_UUID, b"MAC+" + MAC)
+    await client.wait_replayed()
+
+    assert [s for _, s in received] == [State.empty(), on]
+    # 0.5s and 1.5s after the write, at 100x
+    assert received[0][0] - started_at >= 0.004
+    assert received[1][0] - started_at >= 0.014
+
+
+@pytest.mark.asyncio
+async def test_replays_link_loss():
+    handshake = CaptureEvent(0.0, CaptureKind.WRITE, COMMAND_UUID, b"MAC+" + MAC)
+    link_lost = CaptureEvent(1.0, CaptureKind.LINK_LOST, None, b"")
+    read = CaptureEvent(0.0, CaptureKind.READ, SYSTEM_ID_UUID, SYSTEM_ID)
+    events = [
+        read,
+        handshake,
+        *notifications(State.empty()),
+        link_lost,
+        read,
+        handshake,
+        *notifications(State.empty()),
+    ]
+    client = ReplayBTClient(events)
+    h = HPA250B(
+        ReplayDelegate(client), reconnect_policy=ReconnectPolicy(initial_delay=0)
+    )
+
+    await h.connect()
+    await client.wait_replayed()
+    await h.wait_for_reconnect()
+
+    assert h.connection_stats.disconnects == 1
+    assert h.connection_stats.reconnects == 1
+    assert client.exhausted
@@ -43,3 +43,11 @@ def test_equality():
     assert Command() == Command()
     assert Command().toggle_power() == Command().toggle_power()
     assert Command().timer_up() == Command().timer_up()
+
+
+def test_from_int():
+    assert Command.from_int(0x2008) == Command().toggle_auto_voc().toggle_auto_pollen()
+
+
+def test_frames_are_cached():
+    assert Command().timer_up().bytes is Command().timer_up().bytes
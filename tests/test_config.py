@@ -0,0 +1,79 @@
+import tomllib
+from datetime import datetime
+import pytest
+from hpa250b_ble.config import ConfigError, load_config, parse_config
+from hpa250b_ble.enums import Backlight, Preset
+from hpa250b_ble.state import State
+
+ADDRESS = "00:35:FF:09:1A:C0"
+
+CONFIG = f"""
+debounce = 2
+min_interval = 30
+
+[devices."{ADDRESS}"]
+state = {{ is_on = true, preset = "germ" }}
+min_interval = 10
+
+[[devices."{ADDRESS}".schedule]]
+from = "22:00"
+to = "07:00"
+state = {{ backlight = "dim" }}
+
+[[devices."{ADDRESS}".schedule]]
+from = "23:30"
+to = "23:45"
+state = {{ is_on = false }}
+"""
+
+
+def at(hour: int, minute: int = 0) -> datetime:
+    return datetime(2024, 1, 1, hour, minute)
+
+
+def test_loads_config(tmp_path):
+    path = tmp_path / "desired.toml"
+    path.write_text(CONFIG)
+
+    device = load_config(path).devices[ADDRESS]
+
+    assert device.debounce == 2
+    assert device.min_interval == 10
+    assert device.desired_at(at(12)) == State(
+        True, Preset.GERM, Backlight.ON, None, None
+    )
+
+
+def test_schedule():
+    device = parse_config(tomllib.loads(CONFIG)).devices[ADDRESS]
+    dim = State(True, Preset.GERM, Backlight.DIM, None, None)
+
+    assert device.desired_at(at(22)) == dim
+    assert device.desired_at(at(3)) == dim
+    assert device.desired_at(at(7)).backlight == Backlight.ON
+    assert device.desired_at(at(23, 40)) == State.empty()
+
+    assert device.seconds_until_change(at(21, 59)) == 60
+    assert device.seconds_until_change(at(23, 50)) == 7 * 3600 + 10 * 60
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"devices": {ADDRESS: {"state": {"preset": "sleep"}}}},
+        {"devices": {ADDRESS: {"schedule": [{"from": "22:00"}]}}},
+        {"devices": {ADDRESS: {"schedule": [{"from": "25:00", "to": "01:00"}]}}},
+        {"devices": {ADDRESS: {"schedule": [{"from": "1", "to": "2", "state": 3}]}}},
+        {"devices": {ADDRESS: {"state": {"timer": 30}}}},
+        {
+            "devices": {
+                ADDRESS: {
+                    "schedule": [{"from": "1", "to": "2", "state": {"timer": 19}}]
+                }
+            }
+        },
+    ],
+)
+def test_rejects_invalid_config(data):
+    with pytest.raises(ConfigError):
+        parse_config(data)
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from hpa250b_ble import (
+    Command,
+    DeviceController,
+    State,
+    Preset,
+    Backlight,
+    ReconcileSupersededError,
+)
+from .virtual import VirtualHPA250B
+
+
+class SlowVirtualHPA250B(VirtualHPA250B):
+    async def apply_command(self, cmd: Command):
+        await asyncio.sleep(0.001)
+        return await super().apply_command(cmd)
+
+
+def timer(t: int | None) -> State:
+    return State(True, Preset.GENERAL, Backlight.ON, None, t)
+
+
+@pytest.mark.asyncio
+async def test_reconciles_submitted_state():
+    controller = DeviceController(VirtualHPA250B(timer(None)))
+
+    state = await controller.set_desired(timer(3))
+
+    assert state.matches_desired_state(timer(3))
+
+
+@pytest.mark.asyncio
+async def test_latest_pending_state_wins():
+    device = SlowVirtualHPA250B(timer(None))
+    controller = DeviceController(device)
+
+    first = controller.submit(timer(1))
+    await asyncio.sleep(0)  # first one starts
+    superseded = controller.submit(timer(5))
+    same = controller.submit(timer(9))
+    latest = controller.submit(timer(9))
+
+    assert (await first).matches_desired_state(timer(1))
+    with pytest.raises(ReconcileSupersededError):
+        await superseded
+    assert (await same) is (await latest)
+    assert device.current_state.matches_desired_state(timer(9))
+    assert len(device.commands) == 1 + 8
+
+
+@pytest.mark.asyncio
+async def test_serialises_reconciles():
+    device = SlowVirtualHPA250B(timer(None))
+    controller = DeviceController(device)
+
+    first = controller.submit(timer(2))
+    await asyncio.sleep(0.0015)
+    second = controller.submit(timer(4))
+
+    assert (await first).matches_desired_state(timer(2))
+    assert (await second).matches_desired_state(timer(4))
+    assert len(device.commands) == 4
+
+
+@pytest.mark.asyncio
+async def test_close_supersedes_pending():
+    controller = DeviceController(SlowVirtualHPA250B(timer(None)))
+
+    running = controller.submit(timer(2))
+    await asyncio.sleep(0)
+    pending = controller.submit(timer(4))
+    await controller.close()
+
+    assert running.cancelled()
+    with pytest.raises(ReconcileSupersededError):
+        await pending
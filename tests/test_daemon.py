@@ -0,0 +1,145 @@
+import asyncio
+import json
+import pytest
+import pytest_asyncio
+from hpa250b_ble.daemon import Daemon
+from hpa250b_ble.enums import Backlight, Preset
+from hpa250b_ble.fleet import Fleet
+from hpa250b_ble.serialize import state_to_dict
+from hpa250b_ble.simulation import (
+    SimulatedBTClient,
+    SimulatedDelegate,
+    SimulationProfile,
+)
+from hpa250b_ble.state import State
+
+ADDRESS = "00:35:FF:09:1A:C0"
+DESIRED = State(True, Preset.GERM, Backlight.DIM, None, 2)
+
+
+class Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def send(self, **request):
+        self.writer.write(json.dumps(request).encode() + b"\n")
+
+    async def receive(self) -> dict:
+        return json.loads(await asyncio.wait_for(self.reader.readline(), 1))
+
+    async def request(self, **request) -> dict:
+        self.send(**request)
+        return await self.receive()
+
+    def close(self):
+        self.writer.close()
+
+
+@pytest_asyncio.fixture
+async def daemon(tmp_path):
+    client = SimulatedBTClient(
+        ADDRESS, profile=SimulationProfile(notification_delay=0.001)
+    )
+    daemon = Daemon(Fleet({ADDRESS: SimulatedDelegate(client)}))
+    daemon.client = client
+    daemon.path = str(tmp_path / "hpa250b.sock")
+    await daemon.start(daemon.path)
+    yield daemon
+    await daemon.close()
+
+
+async def connect(daemon) -> Connection:
+    return Connection(*await asyncio.open_unix_connection(daemon.path))
+
+
+@pytest.mark.asyncio
+async def test_keeps_devices_connected(daemon):
+    c = await connect(daemon)
+
+    assert await c.request(op="devices", id=1) == {
+        "id": 1,
+        "ok": True,
+        "result": {ADDRESS: {"connected": True}},
+    }
+    response = await c.request(op="get-state", device=ADDRESS, id=2)
+    assert response["result"] == state_to_dict(State.empty())
+    c.close()
+
+
+@pytest.mark.asyncio
+async def test_sets_desired_state(daemon):
+    c = await connect(daemon)
+
+    response = await c.request(
+        op="set-desired-state", device=ADDRESS, state=state_to_dict(DESIRED)
+    )
+
+    assert response["ok"]
+    assert response["result"] == state_to_dict(DESIRED)
+    assert daemon.client.state.matches_desired_state(DESIRED)
+    c.close()
+
+
+@pytest.mark.asyncio
+async def test_batches_requests_for_the_same_device(daemon):
+    c = await connect(daemon)
+    intermediate = State(True, Preset.TURBO, Backlight.OFF, None, 9)
+    first = State(True, Preset.GENERAL, Backlight.ON, None, None)
+
+    c.send(op="set-desired-state", device=ADDRESS, state=state_to_dict(first), id=1)
+    await asyncio.sleep(0.01)
+    for i, state in enumerate([intermediate, DESIRED], start=2):
+        c.send(op="set-desired-state", device=ADDRESS, state=state_to_dict(state), id=i)
+    responses = {r["id"]: r for r in [await c.receive() for _ in range(3)]}
+
+    assert responses[1]["ok"]
+    assert not responses[2]["ok"]
+    assert "superseded" in responses[2]["error"]
+    assert responses[3]["result"] == state_to_dict(DESIRED)
+    c.close()
+
+
+@pytest.mark.asyncio
+async def test_reports_errors(daemon):
+    c = await connect(daemon)
+
+    assert not (await c.request(op="get-state", device="nope"))["ok"]
+    assert not (await c.request(op="fly"))["ok"]
+    c.writer.write(b"not json\n")
+    assert not (await c.receive())["ok"]
+    response = await c.request(
+        op="set-desired-state", device=ADDRESS, state={"preset": "sleep"}
+    )
+    assert not response["ok"]
+    c.close()
+
+
+@pytest.mark.asyncio
+async def test_subscribe(daemon):
+    subscriber = await connect(daemon)
+    subscriber.send(op="subscribe", device=ADDRESS, id="sub")
+    assert (await subscriber.receive())["result"] == state_to_dict(State.empty())
+
+    c = await connect(daemon)
+    await c.request(op="set-desired-state", device=ADDRESS, state={"is_on": True})
+
+    response = await subscriber.receive()
+    assert response["id"] == "sub"
+    assert response["result"]["is_on"]
+    subscriber.close()
+    c.close()
+
+
+@pytest.mark.asyncio
+async def test_closes_with_clients_connected(daemon):
+    subscriber = await connect(daemon)
+    subscriber.send(op="subscribe", device=ADDRESS)
+    await subscriber.receive()
+    idle = await connect(daemon)
+    await idle.request(op="devices")
+
+    await asyncio.wait_for(daemon.close(), 1)
+
+    assert await asyncio.wait_for(subscriber.reader.read(), 1) == b""
+    assert await asyncio.wait_for(idle.reader.read(), 1) == b""
@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from bleak.backends.device import BLEDevice
+from hpa250b_ble import ScanCache
+
+
+class FakeScanner:
+    instances: list["FakeScanner"] = []
+    found: BLEDevice | None = None
+
+    def __init__(self, detection_callback):
+        self.detection_callback = detection_callback
+        self.is_scanning = False
+        FakeScanner.instances.append(self)
+
+    async def start(self):
+        self.is_scanning = True
+
+    async def stop(self):
+        self.is_scanning = False
+
+    def advertise(self, device: BLEDevice):
+        self.detection_callback(device, None)
+
+    @classmethod
+    async def find_device_by_address(cls, address: str, timeout: float):
+        return cls.found
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def device(address: str) -> BLEDevice:
+    return BLEDevice(address, "HPA250B", None, -50)
+
+
+@pytest.fixture(autouse=True)
+def reset_scanner():
+    FakeScanner.instances = []
+    FakeScanner.found = None
+
+
+@pytest.mark.asyncio
+async def test_resolves_from_advertisements():
+    async with ScanCache(scanner_factory=FakeScanner) as cache:
+        d = device("00:35:FF:09:1A:C0")
+        FakeScanner.instances[0].advertise(d)
+
+        assert await cache.find("00:35:ff:09:1a:c0") is d
+
+    assert not FakeScanner.instances[0].is_scanning
+
+
+@pytest.mark.asyncio
+async def test_evicts_stale_devices():
+    clock = FakeClock()
+    async with ScanCache(ttl=10, clock=clock, scanner_factory=FakeScanner) as cache:
+        FakeScanner.instances[0].advertise(device("00:00:00:00:00:01"))
+
+        clock.now = 11
+        assert cache.get("00:00:00:00:00:01") is None
+
+
+@pytest.mark.asyncio
+async def test_waits_for_advertisement_while_scanning():
+    async with ScanCache(scanner_factory=FakeScanner) as cache:
+        d = device("00:00:00:00:00:02")
+        found = asyncio.create_task(cache.find(d.address))
+        await asyncio.sleep(0)
+        FakeScanner.instances[0].advertise(d)
+
+        assert await found is d
+        assert await cache.find("00:00:00:00:00:03", timeout=0.01) is None
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_scan_when_not_scanning():
+    cache = ScanCache(scanner_factory=FakeScanner)
+    FakeScanner.found = device("00:00:00:00:00:04")
+
+    assert await cache.find("00:00:00:00:00:04") is FakeScanner.found
+    assert cache.get("00:00:00:00:00:04") is FakeScanner.found
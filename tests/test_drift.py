@@ -0,0 +1,143 @@
+import asyncio
+import contextlib
+from datetime import datetime
+import pytest
+from hpa250b_ble.command import Command
+from hpa250b_ble.config import DeviceConfig, ScheduleEntry
+from hpa250b_ble.const import COMMAND_UUID
+from hpa250b_ble.drift import DriftCorrector
+from hpa250b_ble.enums import Backlight, Preset
+from hpa250b_ble.hpa250b import HPA250B
+from hpa250b_ble.simulation import SimulatedBTClient, SimulatedDelegate, VirtualClock
+from hpa250b_ble.state import State
+
+ADDRESS = "00:35:FF:09:1A:C0"
+DESIRED = State(True, Preset.GERM, Backlight.ON, None, None)
+
+
+async def start(config: DeviceConfig, initial_state=DESIRED, **kwargs):
+    client = SimulatedBTClient(ADDRESS, initial_state=initial_state)
+    device = HPA250B(SimulatedDelegate(client))
+    await device.connect()
+    clock = VirtualClock(auto_advance=False)
+    corrector = DriftCorrector(device, config, clock=clock, **kwargs)
+    task = asyncio.create_task(corrector.run())
+    await settle()
+    return client, clock, corrector, task
+
+
+async def settle():
+    # let the corrector handle notifications and finish any reconcile; the
+    # simulated device has no latency, so this never depends on real time
+    for _ in range(100):
+        await asyncio.sleep(0)
+
+
+async def advance(clock: VirtualClock, seconds: float):
+    clock.advance(seconds)
+    await settle()
+
+
+async def press(client: SimulatedBTClient, cmd: Command):
+    # as if someone pressed a button on the device
+    await client.write_gatt_char(COMMAND_UUID, cmd.bytes)
+    await settle()
+
+
+async def stop(task: asyncio.Task):
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+
+
+def config(**kwargs) -> DeviceConfig:
+    return DeviceConfig(ADDRESS, {"is_on": True, "preset": "germ"}, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_reconciles_on_startup():
+    client, _, corrector, task = await start(
+        config(debounce=5, min_interval=60), initial_state=State.empty()
+    )
+
+    assert client.state.matches_desired_state(DESIRED)
+    assert corrector.stats.corrections == 1
+    assert corrector.stats.drifts == 0
+    await stop(task)
+
+
+@pytest.mark.asyncio
+async def test_corrects_lasting_drift_after_debounce():
+    client, clock, corrector, task = await start(config(debounce=5))
+
+    await press(client, Command().toggle_turbo())
+    assert client.state.preset == Preset.TURBO
+    await advance(clock, 4.9)
+    assert corrector.stats.corrections == 0
+
+    await advance(clock, 0.1)
+    assert client.state.matches_desired_state(DESIRED)
+    assert corrector.stats.corrections == 1
+    await stop(task)
+
+
+@pytest.mark.asyncio
+async def test_ignores_drift_reverted_within_debounce():
+    client, clock, corrector, task = await start(config(debounce=5))
+
+    await press(client, Command().toggle_turbo())
+    await advance(clock, 2)
+    await press(client, Command().toggle_germ())
+    assert client.state.matches_desired_state(DESIRED)
+    await advance(clock, 10)
+
+    assert corrector.stats.drifts == 1
+    assert corrector.stats.corrections == 0
+    await stop(task)
+
+
+@pytest.mark.asyncio
+async def test_rate_limits_corrections():
+    client, clock, corrector, task = await start(config(debounce=0, min_interval=60))
+
+    await press(client, Command().toggle_turbo())
+    assert corrector.stats.corrections == 1
+
+    await advance(clock, 10)
+    await press(client, Command().toggle_turbo())
+    assert corrector.stats.corrections == 1
+    assert client.state.preset == Preset.TURBO
+
+    await advance(clock, 49.9)
+    assert corrector.stats.corrections == 1
+    await advance(clock, 0.1)
+    assert corrector.stats.corrections == 2
+    assert client.state.matches_desired_state(DESIRED)
+    await stop(task)
+
+
+@pytest.mark.asyncio
+async def test_applies_schedule_changes_immediately():
+    now = datetime(2024, 1, 1, 21, 59)
+    night = ScheduleEntry(
+        datetime(2024, 1, 1, 22).time(),
+        datetime(2024, 1, 1, 7).time(),
+        {"backlight": "dim"},
+    )
+    client, clock, corrector, task = await start(
+        config(schedule=(night,), debounce=100, min_interval=3600),
+        initial_state=State.empty(),
+        now=lambda: now,
+    )
+    assert corrector.stats.corrections == 1
+    assert client.state.backlight == Backlight.ON
+
+    # neither an ongoing drift nor the recent startup reconcile hold the
+    # schedule change back
+    await press(client, Command().toggle_turbo())
+    now = datetime(2024, 1, 1, 22)
+    await advance(clock, 60)
+
+    assert corrector.stats.corrections == 2
+    assert client.state.matches_desired_state(DESIRED.with_backlight(Backlight.DIM))
+    await stop(task)
@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from hpa250b_ble import Fleet, State, Preset, Backlight, ReconcileError
+from .fakes import FakeDelegate, TransitioningBTClient
+
+
+class SlowConnectBTClient(TransitioningBTClient):
+    connecting = 0
+    max_connecting = 0
+
+    async def connect(self):
+        cls = SlowConnectBTClient
+        cls.connecting += 1
+        cls.max_connecting = max(cls.max_connecting, cls.connecting)
+        await asyncio.sleep(0.01)
+        cls.connecting -= 1
+        await super().connect()
+
+
+class StuckBTClient(TransitioningBTClient):
+    async def write_gatt_char(self, uuid: str, data: bytes):
+        if data.startswith(b"MAC+"):
+            await super().write_gatt_char(uuid, data)
+        else:
+            self.commands.append(data)
+            await self.notify_callback(self.state.bytes)
+
+
+@pytest.mark.asyncio
+async def test_reconcile_all():
+    clients = {f"device-{i}": TransitioningBTClient() for i in range(5)}
+    fleet = Fleet({k: FakeDelegate(c) for k, c in clients.items()})
+    desired = State(True, Preset.TURBO, Backlight.DIM, None, 2)
+
+    results = await fleet.reconcile(desired)
+
+    assert set(results) == set(clients)
+    for result in results.values():
+        assert result.ok
+        assert result.state.matches_desired_state(desired)
+
+
+@pytest.mark.asyncio
+async def test_reconcile_per_device():
+    clients = {k: TransitioningBTClient() for k in ["a", "b", "c"]}
+    fleet = Fleet({k: FakeDelegate(c) for k, c in clients.items()})
+    desired = {
+        "a": State(True, Preset.GERM, Backlight.ON, None, None),
+        "b": State(True, Preset.AUTO_VOC, Backlight.OFF, None, 18),
+    }
+
+    results = await fleet.reconcile(desired)
+
+    assert set(results) == {"a", "b"}
+    assert results["a"].state.matches_desired_state(desired["a"])
+    assert results["b"].state.matches_desired_state(desired["b"])
+    assert not fleet.devices["c"].is_connected
+
+
+@pytest.mark.asyncio
+async def test_limits_concurrent_connects():
+    clients = {f"device-{i}": SlowConnectBTClient() for i in range(10)}
+    fleet = Fleet(
+        {k: FakeDelegate(c) for k, c in clients.items()}, max_concurrent_connects=2
+    )
+
+    results = await fleet.connect()
+
+    assert all(r.ok for r in results.values())
+    assert SlowConnectBTClient.max_connecting == 2
+
+
+@pytest.mark.asyncio
+async def test_collects_errors():
+    delegates = {
+        "ok": FakeDelegate(TransitioningBTClient()),
+        "stuck": FakeDelegate(StuckBTClient()),
+        "missing": FakeDelegate(None),
+    }
+    fleet = Fleet(delegates)
+    desired = State(True, Preset.GENERAL, Backlight.ON, None, None)
+
+    results = await fleet.reconcile(desired)
+
+    assert results["ok"].ok
+    assert isinstance(results["stuck"].error, ReconcileError)
+    assert isinstance(results["missing"].error, RuntimeError)
+    assert results["missing"].state == State.empty()
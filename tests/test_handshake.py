@@ -0,0 +1,38 @@
+from pathlib import Path
+from hpa250b_ble.handshake import JSONHandshakeCache, MemoryHandshakeCache
+
+MAC = bytes.fromhex("0035ff091ac0")
+
+
+def test_memory_cache():
+    cache = MemoryHandshakeCache()
+
+    cache.put("00:35:ff:09:1a:c0", MAC)
+    assert cache.get("00:35:FF:09:1A:C0") == MAC
+
+    cache.invalidate("00:35:FF:09:1A:C0")
+    assert cache.get("00:35:FF:09:1A:C0") is None
+
+
+def test_json_cache_persists(tmp_path: Path):
+    path = tmp_path / "handshakes.json"
+
+    JSONHandshakeCache(path).put("00:35:FF:09:1A:C0", MAC)
+    assert JSONHandshakeCache(path).get("00:35:FF:09:1A:C0") == MAC
+
+    JSONHandshakeCache(path).invalidate("00:35:FF:09:1A:C0")
+    assert JSONHandshakeCache(path).get("00:35:FF:09:1A:C0") is None
+
+
+def test_json_cache_ignores_corrupt_file(tmp_path: Path):
+    path = tmp_path / "handshakes.json"
+    path.write_text("{not json")
+
+    assert JSONHandshakeCache(path).get("00:35:FF:09:1A:C0") is None
+
+
+def test_json_cache_normalises_loaded_addresses(tmp_path: Path):
+    path = tmp_path / "handshakes.json"
+    path.write_text('{"00:35:ff:09:1a:c0": "0035ff091ac0"}')
+
+    assert JSONHandshakeCache(path).get("00:35:FF:09:1A:C0") == MAC
@@ -0,0 +1,104 @@
+import asyncio
+import contextlib
+import pytest
+from hpa250b_ble.command import Command
+from hpa250b_ble.enums import Backlight, Preset
+from hpa250b_ble.history import StateHistory, StateHistoryError
+from hpa250b_ble.hpa250b import HPA250B
+from hpa250b_ble.simulation import SimulatedBTClient, SimulatedDelegate
+from hpa250b_ble.state import State
+
+DEVICE = "00:35:FF:09:1A:C0"
+GENERAL = State(True, Preset.GENERAL, Backlight.ON, None, None)
+GERM = State(True, Preset.GERM, Backlight.ON, None, None)
+
+
+def test_records_only_changes(tmp_path):
+    with StateHistory(tmp_path) as history:
+        assert history.record(DEVICE, GENERAL, 10.0)
+        assert not history.record(DEVICE, GENERAL, 11.0)
+        assert history.record(DEVICE, GERM, 12.0)
+        assert history.record(DEVICE, GENERAL, 13.0)
+
+        assert list(history.query(DEVICE)) == [
+            (10.0, GENERAL),
+            (12.0, GERM),
+            (13.0, GENERAL),
+        ]
+        assert history.devices() == [DEVICE]
+    # 8-byte header plus three 12-byte records
+    assert (tmp_path / "00_35_FF_09_1A_C0.states").stat().st_size == 8 + 3 * 12
+
+
+def test_range_query(tmp_path):
+    with StateHistory(tmp_path) as history:
+        for t in range(100):
+            history.record(DEVICE, GENERAL if t % 2 else GERM, float(t))
+
+        assert [t for t, _ in history.query(DEVICE, 10.0, 13.0)] == [10.0, 11.0, 12.0]
+        assert [t for t, _ in history.query(DEVICE, 97.5)] == [98.0, 99.0]
+        assert list(history.query("00:00:00:00:00:00")) == []
+
+
+def test_reopens_existing_log(tmp_path):
+    with StateHistory(tmp_path) as history:
+        history.record(DEVICE, GENERAL, 1.0)
+    # simulate a torn write
+    with (tmp_path / "00_35_FF_09_1A_C0.states").open("ab") as f:
+        f.write(b"\x00\x01\x02")
+
+    with StateHistory(tmp_path) as history:
+        assert history.last(DEVICE) == (1.0, GENERAL)
+        assert not history.record(DEVICE, GENERAL, 2.0)
+        assert history.record(DEVICE, GERM, 3.0)
+        assert list(history.query(DEVICE)) == [(1.0, GENERAL), (3.0, GERM)]
+
+
+def test_rejects_foreign_files(tmp_path):
+    (tmp_path / "00_35_FF_09_1A_C0.states").write_bytes(b"not a log")
+
+    with StateHistory(tmp_path) as history:
+        with pytest.raises(StateHistoryError):
+            history.record(DEVICE, GENERAL)
+
+
+def test_rejects_paths_as_devices(tmp_path):
+    with StateHistory(tmp_path / "history") as history:
+        for device in ["../00:35:FF:09:1A:C0", "a/b", "/etc/passwd", ""]:
+            with pytest.raises(StateHistoryError):
+                history.record(device, GENERAL)
+            with pytest.raises(StateHistoryError):
+                list(history.query(device))
+
+    assert [p.name for p in tmp_path.iterdir()] == ["history"]
+
+
+def test_durations(tmp_path):
+    with StateHistory(tmp_path) as history:
+        history.record(DEVICE, GENERAL, 0.0)
+        history.record(DEVICE, GERM, 10.0)
+        history.record(DEVICE, State.empty(), 25.0)
+
+        assert history.durations(DEVICE, 5.0, 30.0) == {
+            Preset.GENERAL: 5.0,
+            Preset.GERM: 15.0,
+            None: 5.0,
+        }
+
+
+@pytest.mark.asyncio
+async def test_follows_device(tmp_path):
+    h = HPA250B(SimulatedDelegate(SimulatedBTClient(DEVICE)))
+    await h.connect()
+
+    with StateHistory(tmp_path) as history:
+        task = asyncio.create_task(history.follow(DEVICE, h))
+        await asyncio.sleep(0)
+        await h.apply_command(Command().toggle_power())
+        await h.apply_command(Command().toggle_germ())
+        await asyncio.sleep(0)
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+        assert [s for _, s in history.query(DEVICE)] == [State.empty(), GENERAL, GERM]
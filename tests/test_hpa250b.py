@@ -1,86 +1,53 @@
+import asyncio
 import pytest
 import binascii
-from typing import Awaitable, Callable
 from hpa250b_ble.command import Command
-from hpa250b_ble.const import SYSTEM_ID_UUID, COMMAND_UUID, STATE_UUID
 from hpa250b_ble.enums import Preset, Backlight
-from hpa250b_ble.hpa250b import BTClient, HPA250B, Delegate, BTClientDisconnectedError
+from hpa250b_ble import hpa250b
+from hpa250b_ble.hpa250b import HPA250B, BTClientDisconnectedError
+from hpa250b_ble.handshake import MemoryHandshakeCache
+from hpa250b_ble.planner import plan
+from hpa250b_ble.reconcile import reconcile
+from hpa250b_ble.reconnect import ReconnectPolicy
 from hpa250b_ble.state import State
+from .fakes import MAC, FakeBTClient, FakeDelegate, TransitioningBTClient
 
 
-class FakeBTClient(BTClient):
-    def __init__(
-        self,
-        initial_state=State.empty(),
-        disconnect_callback: Callable[[], Awaitable[None]] | None = None,
-    ):
-        self._is_connected = False
-        self.notify_callback: Callable[[bytes], Awaitable[None]] | None = None
-        self.next_notification: bytes | None = None
-        self.disconnect_callback = disconnect_callback
-        self.commands: list[bytes] = []
-        self.initial_state = initial_state
+class RecordingDelegate(FakeDelegate):
+    def __init__(self, client: FakeBTClient):
+        super().__init__(client)
+        self.updates: list[State] = []
 
-    @property
-    def address(self) -> str:
-        return "00:01:02:03:04:05"
+    async def handle_update(self, state: State):
+        self.updates.append(state)
 
-    @property
-    def name(self) -> str:
-        return "mydevice"
-
-    @property
-    def is_connected(self) -> bool:
-        return self._is_connected
-
-    async def connect(self):
-        self.setup_notification(self.initial_state.bytes)
-        self._is_connected = True
-
-    async def disconnect(self):
-        self._is_connected = False
-        if self.disconnect_callback is not None:
-            await self.disconnect_callback()
-
-    async def read_gatt_char(self, uuid: str) -> bytes:
-        if uuid != SYSTEM_ID_UUID:
-            raise ValueError(f"unexpected characteristic read: {uuid}")
-
-        return binascii.unhexlify("C01A090000FF3500")
 
+class DelayedNotificationBTClient(TransitioningBTClient):
     async def write_gatt_char(self, uuid: str, data: bytes):
-        if uuid != COMMAND_UUID:
-            raise ValueError(f"unexpected characteristic write: {uuid}")
-
-        self.commands.append(data)
-        if self.notify_callback is not None and self.next_notification is not None:
-            await self.notify_callback(self.next_notification)
-
-    async def start_notify(
-        self, uuid: str, callback: Callable[[bytes], Awaitable[None]]
-    ):
-        if uuid != STATE_UUID:
-            raise ValueError(f"unexpected characteristic watch: {uuid}")
+        if data.startswith(b"MAC+"):
+            return await super().write_gatt_char(uuid, data)
 
+        callback, self.notify_callback = self.notify_callback, None
+        await super().write_gatt_char(uuid, data)
         self.notify_callback = callback
 
-    def setup_notification(self, data: bytes):
-        self.next_notification = data
+        async def notify(payload: bytes):
+            await asyncio.sleep(0.001)
+            await callback(payload)
 
+        asyncio.create_task(notify(self.state.bytes))
 
-class FakeDelegate(Delegate):
-    def __init__(self, client: FakeBTClient | None):
-        self._client = client
 
-    async def make_bt_client(
-        self, disconnect_callback: Callable[[], Awaitable[None]]
-    ) -> BTClient | None:
-        if self._client is not None:
-            self._client.disconnect_callback = disconnect_callback
-        return self._client
+class FlakyDelegate(FakeDelegate):
+    def __init__(self, client: FakeBTClient, failures: int):
+        super().__init__(client)
+        self.failures = failures
 
-    async def handle_update(self, *_):
-        pass
+    async def make_bt_client(self, disconnect_callback):
+        if self.failures > 0:
+            self.failures -= 1
+            return None
+        return await super().make_bt_client(disconnect_callback)
 
 
 class TestHPA250B:
@@ -136,11 +103,13 @@ class TestHPA250B:
         initial_state = State.empty()
         c = FakeBTClient(initial_state)
         d = FakeDelegate(c)
-        h = HPA250B(d)
+        h = HPA250B(d, reconnect_policy=ReconnectPolicy(initial_delay=0))
 
         await h.connect()
         await c.disconnect()
+        await h.wait_for_reconnect()
 
+        assert h.connection_stats.reconnects == 1
         assert c.commands == [
             b"MAC+" + binascii.unhexlify("0035FF091AC0"),
             b"MAC+" + binascii.unhexlify("0035FF091AC0"),
@@ -163,3 +132,249 @@ class TestHPA250B:
         ]
         assert not h.is_connected
         assert h.current_state == State.empty()
+
+    @pytest.mark.asyncio
+    async def test_pipelined_commands(self):
+        initial_state = State(True, Preset.GENERAL, Backlight.ON, None, 1)
+        desired = State(True, Preset.AUTO_VOC, Backlight.OFF, None, 17)
+        c = TransitioningBTClient(initial_state)
+        h = HPA250B(FakeDelegate(c), pipeline_write_gap=0)
+        await h.connect()
+
+        steps = plan(initial_state, desired)
+        assert await h.apply_commands(steps)
+
+        assert c.commands[1:] == [step.command.bytes for step in steps]
+        assert h.current_state.matches_desired_state(desired)
+
+    @pytest.mark.asyncio
+    async def test_pipelined_commands_diverge(self, monkeypatch):
+        monkeypatch.setattr(hpa250b, "UPDATE_TIMEOUT_SECONDS", 0.01)
+        initial_state = State(True, Preset.GENERAL, Backlight.ON, None, 1)
+        desired = State(True, Preset.AUTO_VOC, Backlight.OFF, None, 17)
+        c = TransitioningBTClient(initial_state, ignored_command=1)
+        h = HPA250B(FakeDelegate(c), pipeline_write_gap=0)
+        await h.connect()
+
+        assert not await h.apply_commands(plan(initial_state, desired))
+
+        await reconcile(h, desired, pipelined=True)
+        assert h.current_state.matches_desired_state(desired)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_reconciles_run_one_after_another(self):
+        initial_state = State(True, Preset.GENERAL, Backlight.ON, None, None)
+        c = TransitioningBTClient(initial_state)
+        h = HPA250B(FakeDelegate(c))
+        await h.connect()
+
+        await asyncio.gather(
+            reconcile(h, initial_state.with_timer(5)),
+            reconcile(h, initial_state.with_timer(15)),
+        )
+
+        assert h.current_state.matches_desired_state(initial_state.with_timer(15))
+        # handshake, 5 steps up to 5, then 9 down through no timer to 15
+        assert len(c.commands) == 1 + 5 + 9
+
+    @pytest.mark.asyncio
+    async def test_reconnect_retries_with_backoff(self):
+        c = FakeBTClient()
+        d = FlakyDelegate(c, failures=0)
+        h = HPA250B(d, reconnect_policy=ReconnectPolicy(initial_delay=0.001))
+        await h.connect()
+
+        d.failures = 2
+        await c.disconnect()
+        await h.wait_for_reconnect()
+
+        assert h.is_connected
+        assert h.connection_stats.disconnects == 1
+        assert h.connection_stats.failed_attempts == 2
+        assert h.connection_stats.consecutive_failures == 0
+        assert h.connection_stats.reconnects == 1
+        assert h.connection_stats.last_reconnect_seconds is not None
+
+    @pytest.mark.asyncio
+    async def test_reconnect_gives_up(self):
+        c = FakeBTClient()
+        d = FlakyDelegate(c, failures=0)
+        h = HPA250B(d, reconnect_policy=ReconnectPolicy(0, max_attempts=3))
+        await h.connect()
+
+        d.failures = 5
+        await c.disconnect()
+        await h.wait_for_reconnect()
+
+        assert not h.is_connected
+        assert h.connection_stats.consecutive_failures == 3
+        assert h.connection_stats.reconnects == 0
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_reconnect(self):
+        c = FakeBTClient()
+        d = FlakyDelegate(c, failures=0)
+        h = HPA250B(d, reconnect_policy=ReconnectPolicy(initial_delay=10))
+        await h.connect()
+
+        await c.disconnect()
+        await h.disconnect()
+        await h.wait_for_reconnect()
+
+        assert not h.is_connected
+        assert h.connection_stats.reconnects == 0
+
+    @pytest.mark.asyncio
+    async def test_handshake_cache_skips_system_id_read(self):
+        c = FakeBTClient()
+        cache = MemoryHandshakeCache()
+        h = HPA250B(FakeDelegate(c), handshake_cache=cache)
+
+        await h.connect()
+        await h.disconnect()
+        await h.connect()
+
+        assert len(c.reads) == 1
+        assert cache.get(c.address) == MAC
+        assert h.is_connected
+
+    @pytest.mark.asyncio
+    async def test_handshake_cache_invalidated_on_timeout(self, monkeypatch):
+        monkeypatch.setattr(hpa250b, "UPDATE_TIMEOUT_SECONDS", 0.01)
+        c = FakeBTClient()
+        cache = MemoryHandshakeCache()
+        cache.put(c.address, binascii.unhexlify("000000000000"))
+        h = HPA250B(FakeDelegate(c), handshake_cache=cache)
+
+        await h.connect()
+
+        assert len(c.reads) == 1
+        assert cache.get(c.address) == MAC
+        assert c.commands[-1] == b"MAC+" + MAC
+
+    @pytest.mark.asyncio
+    async def test_subscribe(self):
+        c = TransitioningBTClient()
+        h = HPA250B(FakeDelegate(c))
+        await h.connect()
+
+        async with h.subscribe() as subscription:
+            await h.apply_command(Command().toggle_power())
+            await h.apply_command(Command().toggle_germ())
+
+            assert await anext(subscription) == State(
+                True, Preset.GERM, Backlight.ON, None, None
+            )
+
+        await h.apply_command(Command().toggle_power())
+        assert subscription.closed
+        assert [s async for s in subscription] == []
+
+    @pytest.mark.asyncio
+    async def test_dispatches_only_changes(self):
+        c = TransitioningBTClient()
+        d = RecordingDelegate(c)
+        h = HPA250B(d)
+        await h.connect()
+
+        await h.apply_command(Command().toggle_power())
+        await h.apply_command(Command().toggle_germ())
+        await h.apply_command(Command().toggle_germ())
+        await c.notify_callback(c.state.bytes)
+
+        assert d.updates == [
+            State.empty(),
+            State(True, Preset.GENERAL, Backlight.ON, None, None),
+            State(True, Preset.GERM, Backlight.ON, None, None),
+        ]
+        assert h.notification_stats.received == 5
+        assert h.notification_stats.dispatched == 3
+
+    @pytest.mark.asyncio
+    async def test_retries_undecodable_payload(self):
+        c = TransitioningBTClient()
+        h = HPA250B(RecordingDelegate(c))
+        await h.connect()
+        # powered on without a preset
+        payload = State.empty().bytes[:1] + b"\x01\x00\x00\x00"
+
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await c.notify_callback(payload)
+
+        assert h.notification_stats.dispatched == 1
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_dispatches_unchanged_state(self):
+        c = TransitioningBTClient()
+        d = RecordingDelegate(c)
+        h = HPA250B(d, heartbeat_interval=0)
+        await h.connect()
+
+        await c.notify_callback(c.state.bytes)
+
+        assert d.updates == [State.empty(), State.empty()]
+
+    @pytest.mark.asyncio
+    async def test_optimistic_commands(self):
+        c = DelayedNotificationBTClient()
+        h = HPA250B(FakeDelegate(c), optimistic=True)
+        await h.connect()
+        desired = State(True, Preset.AUTO_VOC, Backlight.DIM, None, 18)
+
+        await reconcile(h, desired)
+
+        assert h.current_state.matches_desired_state(desired)
+        assert h.prediction_stats.confirmed < len(c.commands) - 1
+        await asyncio.sleep(0.01)
+        assert h.prediction_stats.confirmed == len(c.commands) - 1
+        assert h.prediction_stats.mispredicted == 0
+
+    @pytest.mark.asyncio
+    async def test_optimistic_misprediction(self, monkeypatch):
+        monkeypatch.setattr(hpa250b, "UPDATE_TIMEOUT_SECONDS", 0.01)
+        c = TransitioningBTClient(ignored_command=0)
+        h = HPA250B(FakeDelegate(c), optimistic=True)
+        await h.connect()
+
+        await h.apply_command(Command().toggle_power())
+
+        # the device repeating its old state is not a misprediction yet
+        assert h.current_state.is_on
+        assert h.prediction_stats.mispredicted == 0
+        await asyncio.sleep(0.02)
+        assert h.current_state == State.empty()
+        assert h.prediction_stats.mispredicted == 1
+
+        await h.apply_command(Command().toggle_power())
+
+        assert h.current_state.is_on
+        assert h.prediction_stats.confirmed == 1
+
+    @pytest.mark.asyncio
+    async def test_optimistic_unexpected_state(self):
+        c = FakeBTClient()
+        h = HPA250B(FakeDelegate(c), optimistic=True)
+        await h.connect()
+        turbo = State(True, Preset.TURBO, Backlight.ON, None, None)
+        c.setup_notification(turbo.bytes)
+
+        await h.apply_command(Command().toggle_power())
+
+        assert h.current_state == turbo
+        assert h.prediction_stats.mispredicted == 1
+
+    @pytest.mark.asyncio
+    async def test_optimistic_coalesced_confirmation(self):
+        c = FakeBTClient()
+        h = HPA250B(FakeDelegate(c), optimistic=True)
+        await h.connect()
+        c.setup_notification(None)
+
+        await h.apply_command(Command().toggle_power())
+        await h.apply_command(Command().toggle_turbo())
+        predicted = h.current_state
+        await c.notify_callback(predicted.bytes)
+
+        assert h.current_state == predicted
+        assert h.prediction_stats.confirmed == 2
@@ -0,0 +1,114 @@
+import json
+import pytest
+from hpa250b_ble import hpa250b
+from hpa250b_ble.command import Command
+from hpa250b_ble.enums import Backlight, Preset
+from hpa250b_ble.hpa250b import HPA250B
+from hpa250b_ble.instrumentation import Event, MetricsRecorder
+from hpa250b_ble.reconcile import reconcile
+from hpa250b_ble.state import State
+from .fakes import FakeBTClient, FakeDelegate, TransitioningBTClient
+
+
+def test_histogram_buckets():
+    recorder = MetricsRecorder(buckets=(0.1, 1.0))
+
+    for seconds in [0.05, 0.1, 0.5, 2.0]:
+        recorder.observe("connect", seconds)
+
+    histogram = recorder.histograms["connect"]
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.cumulative_counts() == [2, 3, 4]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(2.65)
+
+
+def test_prometheus_text():
+    recorder = MetricsRecorder(buckets=(0.1,))
+    recorder.observe("connect", 0.05)
+    recorder.increment("timeouts")
+    recorder.increment("timeouts", 2)
+
+    assert recorder.to_prometheus().splitlines() == [
+        "# TYPE hpa250b_connect_seconds histogram",
+        'hpa250b_connect_seconds_bucket{le="0.1"} 1',
+        'hpa250b_connect_seconds_bucket{le="+Inf"} 1',
+        "hpa250b_connect_seconds_sum 0.05",
+        "hpa250b_connect_seconds_count 1",
+        "# TYPE hpa250b_timeouts_total counter",
+        "hpa250b_timeouts_total 3",
+    ]
+
+
+def test_json():
+    recorder = MetricsRecorder(buckets=(0.1,))
+    recorder.observe("reconcile", 0.2)
+    recorder.increment("commands")
+
+    assert json.loads(recorder.to_json()) == {
+        "histograms": {
+            "reconcile": {"buckets": [0.1], "counts": [0, 1], "count": 1, "sum": 0.2}
+        },
+        "counters": {"commands": 1},
+    }
+
+
+@pytest.mark.asyncio
+async def test_records_ble_phases():
+    recorder = MetricsRecorder()
+    initial_state = State(True, Preset.GENERAL, Backlight.ON, None, None)
+    desired = State(True, Preset.GERM, Backlight.DIM, None, None)
+    h = HPA250B(
+        FakeDelegate(TransitioningBTClient(initial_state)), instrumentation=recorder
+    )
+
+    await h.connect()
+    await reconcile(h, desired, instrumentation=recorder)
+
+    assert recorder.histograms["connect"].count == 1
+    assert recorder.histograms["handshake"].count == 1
+    assert recorder.histograms["reconcile"].count == 1
+    commands = recorder.counters["commands"]
+    assert commands > 0
+    assert recorder.histograms["command_round_trip"].count == commands
+    assert "timeouts" not in recorder.counters
+
+
+@pytest.mark.asyncio
+async def test_counts_timeouts(monkeypatch):
+    monkeypatch.setattr(hpa250b, "UPDATE_TIMEOUT_SECONDS", 0.01)
+    recorder = MetricsRecorder()
+    c = FakeBTClient()
+    h = HPA250B(FakeDelegate(c), instrumentation=recorder)
+    await h.connect()
+    # the device stops answering
+    c.setup_notification(None)
+
+    with pytest.raises(TimeoutError):
+        await h.apply_command(Command().toggle_power())
+
+    assert recorder.counters["timeouts"] == 1
+    assert recorder.histograms["command_round_trip"].count == 1
+
+
+@pytest.mark.asyncio
+async def test_event_hook():
+    events: list[Event] = []
+    initial_state = State(True, Preset.GENERAL, Backlight.ON, None, None)
+    c = TransitioningBTClient(initial_state)
+    h = HPA250B(FakeDelegate(c), event_hook=events.append)
+
+    await h.connect()
+    cmd = Command().toggle_germ()
+    await h.apply_command(cmd)
+
+    assert [(e.device, e.phase) for e in events] == [
+        (c.address, "notification"),
+        (c.address, "handshake"),
+        (c.address, "connect"),
+        (c.address, "notification"),
+        (c.address, "command_round_trip"),
+    ]
+    assert events[-1].data == cmd.bytes
+    assert events[-2].data == State(True, Preset.GERM, Backlight.ON, None, None).bytes
+    assert all(e.duration is not None for e in events if e.phase != "notification")
@@ -0,0 +1,126 @@
+import pytest
+from collections import deque
+from hpa250b_ble import Command, State, Preset, Backlight, VOCLight, plan, PlanError
+from hpa250b_ble.planner import MAX_PLAN_LENGTH
+from hpa250b_ble.table import state_index
+from hpa250b_ble.transition import all_states, preset_command, transition
+
+
+def test_noop():
+    state = State(True, Preset.GERM, Backlight.DIM, VOCLight.AMBER, 3)
+
+    assert plan(state, state.with_timer(3)) == []
+
+
+def test_timer_wraps_around_when_shorter():
+    current = State(True, Preset.GENERAL, Backlight.ON, None, 1)
+    desired = current.with_timer(18)
+
+    assert [s.command for s in plan(current, desired)] == [
+        Command().timer_down(),
+        Command().timer_down(),
+    ]
+
+
+def test_combines_components_into_one_command():
+    current = State(True, Preset.GENERAL, Backlight.ON, None, None)
+    desired = State(True, Preset.AUTO_VOC_POLLEN, Backlight.OFF, None, 2)
+
+    steps = plan(current, desired)
+
+    assert len(steps) == 2
+    assert steps[-1].expected_state.matches_desired_state(desired)
+
+
+def test_powers_on_first():
+    desired = State(True, Preset.TURBO, Backlight.DIM, None, None)
+
+    steps = plan(State.empty(), desired)
+
+    assert [s.command for s in steps] == [
+        Command().toggle_power(),
+        Command().toggle_turbo().cycle_light(),
+    ]
+
+
+def test_expected_states_follow_transitions():
+    current = State(True, Preset.AUTO_VOC, Backlight.DIM, VOCLight.RED, 17)
+    desired = State(True, Preset.AUTO_POLLEN, Backlight.ON, None, 2)
+
+    state = current
+    for step in plan(current, desired):
+        state = transition(state, step.command)
+        assert state.matches_desired_state(step.expected_state)
+    assert state.matches_desired_state(desired)
+
+
+def test_unreachable():
+    with pytest.raises(PlanError):
+        plan(State.empty(), State(True, Preset.GERM, Backlight.ON, None, 42))
+
+
+def test_plans_are_bounded():
+    lengths = [len(plan(State.empty(), desired)) for desired in all_states()]
+
+    assert max(lengths) == MAX_PLAN_LENGTH
+
+
+def test_power_cycles_only_when_allowed():
+    current = State(True, Preset.GENERAL, Backlight.ON, None, 9)
+    desired = current.with_timer(None)
+
+    assert len(plan(current, desired)) == 9
+    assert [s.command for s in plan(current, desired, power_cycle=True)] == [
+        Command().toggle_power(),
+        Command().toggle_power(),
+    ]
+
+
+@pytest.mark.parametrize("power_cycle", [False, True])
+@pytest.mark.parametrize(
+    "source",
+    [
+        State.empty(),
+        State(True, Preset.AUTO_POLLEN, Backlight.OFF, VOCLight.GREEN, 9),
+    ],
+)
+def test_plans_are_shortest(source: State, power_cycle: bool):
+    distances = _breadth_first_distances(source, power_cycle)
+
+    for desired in all_states():
+        steps = plan(source, desired, power_cycle)
+        if desired.is_on or not source.is_on:
+            assert len(steps) == distances[state_index(desired)]
+        else:
+            assert len(steps) == 1
+
+
+def _breadth_first_distances(source: State, power_cycle: bool) -> dict[int, int]:
+    distances = {state_index(source): 0}
+    queue = deque([source])
+    while queue:
+        state = queue.popleft()
+        commands = []
+        # without power_cycle the device is only switched off to reach off
+        if power_cycle or not state.is_on:
+            commands.append(Command().toggle_power())
+        if state.is_on:
+            for preset in [None, *Preset]:
+                for cycle_light in [False, True]:
+                    for timer in [None, "up", "down"]:
+                        cmd = Command()
+                        if preset is not None:
+                            cmd = preset_command(state.preset, preset)
+                        if cycle_light:
+                            cmd.cycle_light()
+                        if timer == "up":
+                            cmd.timer_up()
+                        elif timer == "down":
+                            cmd.timer_down()
+                        commands.append(cmd)
+        for cmd in commands:
+            next_state = transition(state, cmd)
+            if (i := state_index(next_state)) not in distances:
+                distances[i] = distances[state_index(state)] + 1
+                queue.append(next_state)
+    return distances
@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+from hpa250b_ble.discovery import ScanCache
+from hpa250b_ble.enums import Backlight, Preset
+from hpa250b_ble.hpa250b import BleakDelegate
+from hpa250b_ble.instrumentation import MetricsRecorder
+from hpa250b_ble.pool import ConnectionPool
+from hpa250b_ble.simulation import SimulatedBTClient, SimulatedDelegate
+from hpa250b_ble.state import State
+
+ADDRESSES = [f"00:00:00:00:00:0{i}" for i in range(5)]
+
+
+class SimulatedSite:
+    def __init__(self):
+        self.clients = {a: SimulatedBTClient(a) for a in ADDRESSES}
+        self.adapters: list[tuple[str, str | None]] = []
+
+    def delegate(self, address: str, adapter: str | None) -> SimulatedDelegate:
+        self.adapters.append((address, adapter))
+        return SimulatedDelegate(self.clients[address])
+
+
+@pytest.mark.asyncio
+async def test_connects_on_demand():
+    site = SimulatedSite()
+    pool = ConnectionPool(site.delegate)
+
+    assert not site.clients[ADDRESSES[0]].is_connected
+    assert await pool.poll(ADDRESSES[0]) == State.empty()
+
+    assert site.clients[ADDRESSES[0]].is_connected
+    assert pool.connected == {ADDRESSES[0]: None}
+
+
+@pytest.mark.asyncio
+async def test_evicts_least_recently_used():
+    site = SimulatedSite()
+    pool = ConnectionPool(site.delegate, adapters={None: 2})
+
+    await pool.poll(ADDRESSES[0])
+    await pool.poll(ADDRESSES[1])
+    await pool.poll(ADDRESSES[0])
+    await pool.poll(ADDRESSES[2])
+
+    assert list(pool.connected) == [ADDRESSES[0], ADDRESSES[2]]
+    assert not site.clients[ADDRESSES[1]].is_connected
+    assert pool.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_waits_for_busy_devices():
+    site = SimulatedSite()
+    pool = ConnectionPool(site.delegate, adapters={None: 1})
+
+    async with pool.acquire(ADDRESSES[0]):
+        waiting = asyncio.create_task(pool.poll(ADDRESSES[1]))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        assert site.clients[ADDRESSES[0]].is_connected
+
+    await waiting
+    assert pool.connected == {ADDRESSES[1]: None}
+
+
+@pytest.mark.asyncio
+async def test_spreads_across_adapters():
+    site = SimulatedSite()
+    pool = ConnectionPool(site.delegate, adapters={"hci0": 2, "hci1": 2})
+
+    for address in ADDRESSES[:4]:
+        await pool.poll(address)
+
+    assert sorted(pool.connected.values()) == ["hci0", "hci0", "hci1", "hci1"]
+    assert sorted(a for _, a in site.adapters) == ["hci0", "hci0", "hci1", "hci1"]
+
+
+@pytest.mark.asyncio
+async def test_reconciles_more_devices_than_slots():
+    site = SimulatedSite()
+    pool = ConnectionPool(site.delegate, adapters={"hci0": 1, "hci1": 1})
+    desired = State(True, Preset.ALLERGEN, Backlight.DIM, None, 2)
+
+    states = await asyncio.gather(*(pool.reconcile(a, desired) for a in ADDRESSES))
+
+    assert all(s.matches_desired_state(desired) for s in states)
+    assert all(c.state.matches_desired_state(desired) for c in site.clients.values())
+    assert len(pool.connected) == 2
+    await pool.close()
+    assert not any(c.is_connected for c in site.clients.values())
+
+
+def test_default_delegates_keep_scan_cache_and_instrumentation():
+    scan_cache = ScanCache(adapter="hci1")
+    metrics = MetricsRecorder()
+    pool = ConnectionPool(
+        adapters={"hci1": 1}, scan_cache=scan_cache, instrumentation=metrics
+    )
+
+    delegate = pool.delegate_for(ADDRESSES[0])
+
+    assert isinstance(delegate, BleakDelegate)
+    assert delegate._scan_cache is scan_cache
+    assert delegate._instrumentation is metrics
+    assert pool.delegate_for(ADDRESSES[0]) is delegate
+
+
+def test_rejects_scan_cache_on_another_adapter():
+    with pytest.raises(ValueError):
+        ConnectionPool(adapters={"hci0": 5, "hci1": 5}, scan_cache=ScanCache())
+    with pytest.raises(ValueError):
+        ConnectionPool(adapters={"hci0": 5}, scan_cache=ScanCache(adapter="hci1"))
@@ -1,6 +1,6 @@
 import pytest
-from hpa250b_ble import State, Preset, Backlight, reconcile
-from .virtual import VirtualHPA250B
+from hpa250b_ble import Command, State, Preset, Backlight, VOCLight, reconcile
+from .virtual import PipelinedVirtualHPA250B, VirtualHPA250B
 
 
 MAX_RECONCILES = 50
@@ -25,3 +25,77 @@ async def test_reconcile_noop():
 
     assert device.current_state.matches_desired_state(initial_state)
     assert device.commands == []
+
+
+@pytest.mark.asyncio
+async def test_reconcile_between_auto_presets():
+    device = VirtualHPA250B(State(True, Preset.AUTO_VOC, Backlight.ON, None, None))
+    desired_state = State(True, Preset.AUTO_VOC_POLLEN, Backlight.ON, None, None)
+
+    await reconcile(device, desired_state)
+
+    assert device.current_state.matches_desired_state(desired_state)
+    assert device.commands == [Command().toggle_auto_pollen()]
+
+
+@pytest.mark.asyncio
+async def test_reconcile_uses_shortest_path():
+    device = VirtualHPA250B(State(True, Preset.GENERAL, Backlight.ON, None, 1))
+    desired_state = State(True, Preset.GENERAL, Backlight.OFF, None, 18)
+
+    await reconcile(device, desired_state)
+
+    assert device.current_state.matches_desired_state(desired_state)
+    assert device.commands == [
+        Command().cycle_light().timer_down(),
+        Command().cycle_light().timer_down(),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_reconcile_pipelined():
+    device = PipelinedVirtualHPA250B(State(True, Preset.GENERAL, Backlight.ON, None, 1))
+    desired_state = State(True, Preset.TURBO, Backlight.OFF, None, 4)
+
+    await reconcile(device, desired_state, pipelined=True)
+
+    assert device.current_state.matches_desired_state(desired_state)
+    assert len(device.commands) == 3
+
+
+@pytest.mark.asyncio
+async def test_reconcile_pipelined_falls_back_to_steps():
+    device = VirtualHPA250B(State(True, Preset.GENERAL, Backlight.ON, None, 1))
+    desired_state = State(True, Preset.TURBO, Backlight.OFF, None, 4)
+
+    await reconcile(device, desired_state, pipelined=True)
+
+    assert device.current_state.matches_desired_state(desired_state)
+    assert len(device.commands) == 3
+
+
+@pytest.mark.asyncio
+async def test_reconcile_keeps_reported_voc_light():
+    device = VirtualHPA250B(State(True, Preset.AUTO_VOC, Backlight.ON, VOCLight.RED, 2))
+    desired_state = State(True, Preset.AUTO_VOC_POLLEN, Backlight.DIM, None, 2)
+
+    await reconcile(device, desired_state)
+
+    assert device.current_state.matches_desired_state(desired_state)
+    assert device.current_state.voc_light == VOCLight.RED
+
+
+@pytest.mark.asyncio
+async def test_reconcile_power_cycles_only_when_allowed():
+    initial_state = State(True, Preset.GENERAL, Backlight.ON, None, 9)
+    desired_state = initial_state.with_timer(None)
+
+    walking = VirtualHPA250B(initial_state)
+    await reconcile(walking, desired_state)
+    cycling = VirtualHPA250B(initial_state)
+    await reconcile(cycling, desired_state, power_cycle=True)
+
+    assert walking.current_state.matches_desired_state(desired_state)
+    assert not any(c.is_toggle_power for c in walking.commands)
+    assert cycling.current_state.matches_desired_state(desired_state)
+    assert cycling.commands == [Command().toggle_power(), Command().toggle_power()]
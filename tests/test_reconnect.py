@@ -0,0 +1,24 @@
+import random
+from hpa250b_ble.reconnect import ReconnectPolicy
+
+
+def test_exponential_backoff():
+    policy = ReconnectPolicy(initial_delay=1, max_delay=5, multiplier=2, jitter=0)
+
+    assert [policy.delay(i) for i in range(5)] == [1, 2, 4, 5, 5]
+
+
+def test_jitter():
+    policy = ReconnectPolicy(initial_delay=4, jitter=0.5)
+    rng = random.Random(42)
+
+    delays = [policy.delay(0, rng) for _ in range(100)]
+
+    assert all(2 <= d <= 4 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_max_attempts():
+    assert ReconnectPolicy(max_attempts=2).allows(1)
+    assert not ReconnectPolicy(max_attempts=2).allows(2)
+    assert ReconnectPolicy(max_attempts=None).allows(1000)
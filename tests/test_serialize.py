@@ -0,0 +1,38 @@
+import pytest
+from hpa250b_ble.enums import Backlight, Preset, VOCLight
+from hpa250b_ble.serialize import state_from_dict, state_to_dict
+from hpa250b_ble.state import State, StateError
+from hpa250b_ble.table import STATE_COUNT, state_at
+
+
+def test_round_trip():
+    states = [state_at(i) for i in range(STATE_COUNT)]
+    states.append(State(True, Preset.AUTO_POLLEN, Backlight.DIM, VOCLight.RED, 200))
+
+    for state in states:
+        assert state_from_dict(state_to_dict(state)) is state
+
+
+def test_defaults():
+    assert state_from_dict({"is_on": True}) == State(
+        True, Preset.GENERAL, Backlight.ON, None, None
+    )
+    assert state_from_dict({"is_on": False, "preset": "turbo"}) == State.empty()
+    assert state_from_dict({"backlight": "dim"}).backlight == Backlight.DIM
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"preset": "sleep"},
+        {"timer": 0},
+        {"timer": "1"},
+        {"colour": "red"},
+        {"is_on": "false"},
+        {"is_on": None},
+        {"is_on": 1},
+    ],
+)
+def test_rejects_invalid_states(data):
+    with pytest.raises(StateError):
+        state_from_dict(data)
@@ -0,0 +1,156 @@
+import asyncio
+import pytest
+from hpa250b_ble import hpa250b
+from hpa250b_ble.command import Command
+from hpa250b_ble.enums import Backlight, Preset
+from hpa250b_ble.hpa250b import HPA250B, BTClientDisconnectedError
+from hpa250b_ble.reconcile import reconcile
+from hpa250b_ble.reconnect import ReconnectPolicy
+from hpa250b_ble.simulation import (
+    SimulatedBTClient,
+    SimulatedDelegate,
+    SimulationProfile,
+    VirtualClock,
+)
+from hpa250b_ble.state import State
+from hpa250b_ble.transition import all_states, transition
+from .fakes import MAC, SYSTEM_ID
+
+
+@pytest.mark.asyncio
+async def test_reconciles_simulated_device():
+    desired = State(True, Preset.AUTO_VOC, Backlight.DIM, None, 3)
+    client = SimulatedBTClient()
+    h = HPA250B(SimulatedDelegate(client))
+
+    await h.connect()
+    await reconcile(h, desired)
+
+    assert h.current_state.matches_desired_state(desired)
+    assert client.state.matches_desired_state(desired)
+
+
+@pytest.mark.asyncio
+async def test_device_model_agrees_with_planner_model():
+    # only the device's state matters here, not its notifications
+    client = SimulatedBTClient(profile=SimulationProfile(drop_rate=1.0))
+    await client.connect()
+    await client.write_gatt_char(hpa250b.COMMAND_UUID, b"MAC+" + MAC)
+
+    for state in list(all_states())[::17]:
+        for bits in range(1 << 10):
+            # the command bits sit in bytes 1 and 2 of the frame
+            cmd = Command.from_int((bits & 0b1111) | (bits >> 4) << 8)
+            client.state = state
+            await client.write_gatt_char(hpa250b.COMMAND_UUID, cmd.bytes)
+            assert client.state == transition(state, cmd), f"{state} {cmd}"
+
+
+@pytest.mark.asyncio
+async def test_system_id():
+    client = SimulatedBTClient("00:35:FF:09:1A:C0")
+    await client.connect()
+
+    assert await client.read_gatt_char(hpa250b.SYSTEM_ID_UUID) == SYSTEM_ID
+    assert client.address == "00:35:FF:09:1A:C0"
+
+
+@pytest.mark.asyncio
+async def test_ignores_commands_before_handshake():
+    client = SimulatedBTClient()
+    await client.connect()
+
+    await client.write_gatt_char(hpa250b.COMMAND_UUID, Command().toggle_power().bytes)
+    await client.write_gatt_char(hpa250b.COMMAND_UUID, b"MAC+" + b"\x00" * 6)
+    await client.write_gatt_char(hpa250b.COMMAND_UUID, Command().toggle_power().bytes)
+    assert client.state == State.empty()
+
+    await client.write_gatt_char(hpa250b.COMMAND_UUID, b"MAC+" + MAC)
+    await client.write_gatt_char(hpa250b.COMMAND_UUID, Command().toggle_power().bytes)
+    assert client.state.is_on
+
+
+@pytest.mark.asyncio
+async def test_virtual_clock_accumulates_latency():
+    clock = VirtualClock()
+    profile = SimulationProfile(
+        connect_latency=1.0, write_latency=0.5, notification_delay=0.25
+    )
+    client = SimulatedBTClient(profile=profile, clock=clock)
+    h = HPA250B(SimulatedDelegate(client))
+
+    await h.connect()
+    await h.apply_command(Command().toggle_power())
+
+    # connect, System ID read, handshake write + notification,
+    # command write + notification
+    assert clock.time() == pytest.approx(1.0 + 0.5 + 0.75 + 0.75)
+
+
+@pytest.mark.asyncio
+async def test_virtual_clock_without_auto_advance():
+    clock = VirtualClock(auto_advance=False)
+    short = asyncio.create_task(clock.sleep(1.0))
+    long = asyncio.create_task(clock.sleep(2.0))
+    await asyncio.sleep(0)
+
+    clock.advance(1.5)
+    await asyncio.sleep(0)
+
+    assert clock.time() == 1.5
+    assert short.done()
+    assert not long.done()
+    long.cancel()
+
+
+@pytest.mark.asyncio
+async def test_seeded_jitter_is_deterministic():
+    async def run(seed: int) -> float:
+        clock = VirtualClock()
+        profile = SimulationProfile(write_latency=0.1, jitter=0.1)
+        h = HPA250B(
+            SimulatedDelegate(
+                SimulatedBTClient(profile=profile, seed=seed, clock=clock)
+            )
+        )
+        await h.connect()
+        await reconcile(h, State(True, Preset.TURBO, Backlight.OFF, None, 5))
+        return clock.time()
+
+    assert await run(1) == await run(1)
+    assert await run(1) != await run(2)
+
+
+@pytest.mark.asyncio
+async def test_dropped_notifications(monkeypatch):
+    monkeypatch.setattr(hpa250b, "UPDATE_TIMEOUT_SECONDS", 0.01)
+    client = SimulatedBTClient()
+    h = HPA250B(SimulatedDelegate(client))
+    await h.connect()
+    client.profile = SimulationProfile(drop_rate=1.0)
+
+    with pytest.raises(TimeoutError):
+        await h.apply_command(Command().toggle_power())
+
+    assert client.state.is_on
+    assert client.dropped_notifications == 1
+
+
+@pytest.mark.asyncio
+async def test_random_disconnects_trigger_reconnect():
+    client = SimulatedBTClient()
+    h = HPA250B(
+        SimulatedDelegate(client), reconnect_policy=ReconnectPolicy(initial_delay=0)
+    )
+    await h.connect()
+    client.profile = SimulationProfile(disconnect_rate=1.0)
+
+    with pytest.raises(BTClientDisconnectedError):
+        await h.apply_command(Command().toggle_power())
+
+    client.profile = SimulationProfile()
+    await asyncio.sleep(0)
+    await h.wait_for_reconnect()
+    assert h.is_connected
+    assert client.disconnects == 1
+    assert h.connection_stats.reconnects == 1
@@ -1,5 +1,7 @@
+import pickle
+import pytest
 from binascii import unhexlify
-from hpa250b_ble import State, Preset, VOCLight, Backlight
+from hpa250b_ble import State, StateError, Preset, VOCLight, Backlight
 
 
 def test_state_from_bytes():
@@ -84,6 +86,10 @@ def test_buggy_state():
 def test_produces_valid_state():
     assert State.empty().with_preset(Preset.GERM) == State.empty()
     assert State.empty().with_backlight(Backlight.DIM) == State.empty()
+    assert (
+        State.empty().with_is_on(True).with_backlight(Backlight.DIM).backlight
+        == Backlight.DIM
+    )
     assert State.empty().with_timer(1) == State.empty()
 
     assert State.empty().with_is_on(True) == State(
@@ -94,3 +100,48 @@ def test_produces_valid_state():
         State.empty().with_is_on(True).with_preset(Preset.GERM).with_is_on(False)
         == State.empty()
     )
+
+
+def test_repeated_decoding_reuses_state():
+    data = unhexlify("a50705000a0000000000000000000000000000")
+
+    assert State.from_bytes(data) is State.from_bytes(bytearray(data))
+
+
+def test_states_are_interned():
+    assert State(True, Preset.GERM, Backlight.DIM, None, 3) is State(
+        True, Preset.GERM, None, None, None
+    ).with_backlight(Backlight.DIM).with_timer(3)
+    assert State.empty() is State(False, Preset.GERM, Backlight.DIM, None, 3)
+
+
+def test_int_roundtrip():
+    state = State(True, Preset.AUTO_VOC_POLLEN, Backlight.DIM, VOCLight.AMBER, 10)
+
+    assert state.to_int() == 0x07050000 | 10
+    assert State.from_int(state.to_int()) is state
+    assert State.from_int(0) is State.empty()
+
+
+def test_canonical_voc_light():
+    assert State(True, Preset.GERM, Backlight.ON, VOCLight.RED, None).voc_light is None
+    assert (
+        State(True, Preset.AUTO_VOC, Backlight.ON, None, None).voc_light
+        == VOCLight.GREEN
+    )
+
+
+def test_invalid_timer():
+    with pytest.raises(StateError):
+        State(True, Preset.GERM, Backlight.ON, None, 256)
+
+
+def test_immutable():
+    with pytest.raises(AttributeError):
+        State.empty().is_on = True  # type: ignore[misc]
+
+
+def test_pickle():
+    state = State(True, Preset.TURBO, Backlight.OFF, None, 7)
+
+    assert pickle.loads(pickle.dumps(state)) is state
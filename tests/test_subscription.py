@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+from hpa250b_ble import Subscription, OverflowPolicy, State, Preset, Backlight
+
+STATES = [State(True, Preset.GENERAL, Backlight.ON, None, t) for t in range(1, 6)]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_latest():
+    subscription = Subscription(policy=OverflowPolicy.COALESCE_LATEST)
+
+    for state in STATES:
+        subscription.publish(state)
+
+    assert await anext(subscription) == STATES[-1]
+    assert subscription.dropped == len(STATES) - 1
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest():
+    subscription = Subscription(maxsize=2, policy=OverflowPolicy.DROP_OLDEST)
+
+    for state in STATES:
+        subscription.publish(state)
+    subscription.close()
+
+    assert [s async for s in subscription] == STATES[-2:]
+    assert subscription.dropped == 3
+
+
+@pytest.mark.asyncio
+async def test_waits_for_states():
+    subscription = Subscription()
+
+    received = asyncio.create_task(anext(subscription))
+    await asyncio.sleep(0)
+    assert not received.done()
+
+    subscription.publish(STATES[0])
+    assert await received == STATES[0]
+
+
+@pytest.mark.asyncio
+async def test_close_ends_iteration():
+    closed = []
+    subscription = Subscription(on_close=closed.append)
+
+    async with subscription:
+        pass
+    subscription.publish(STATES[0])
+
+    assert [s async for s in subscription] == []
+    assert closed == [subscription]
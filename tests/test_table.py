@@ -0,0 +1,66 @@
+import pytest
+from hpa250b_ble import Command, State, Preset, Backlight
+from hpa250b_ble.table import (
+    OFF,
+    STATE_COUNT,
+    distance,
+    next_command,
+    next_index,
+    state_at,
+    state_index,
+)
+from hpa250b_ble.transition import all_states, transition
+
+
+COMMANDS = [
+    Command(),
+    Command().toggle_power(),
+    Command().toggle_power().toggle_turbo().timer_down(),
+    Command().toggle_germ(),
+    Command().toggle_general().cycle_light(),
+    Command().toggle_allergen().timer_up(),
+    Command().toggle_turbo().toggle_germ(),
+    Command().toggle_auto_voc(),
+    Command().toggle_auto_pollen().cycle_light().timer_down(),
+    Command().toggle_auto_voc().toggle_auto_pollen(),
+    Command().timer_up().timer_down(),
+]
+
+
+def test_state_index_roundtrip():
+    indices = [state_index(s) for s in all_states()]
+
+    assert sorted(indices) == list(range(STATE_COUNT))
+    for state in all_states():
+        assert state_at(state_index(state)).matches_desired_state(state)
+
+
+def test_transitions_match_model():
+    for state in all_states():
+        for cmd in COMMANDS:
+            assert next_index(state_index(state), cmd.command) == state_index(
+                transition(state, cmd)
+            ), f"{state} {cmd}"
+
+
+@pytest.mark.parametrize("power_cycle", [False, True])
+def test_next_command_reduces_distance(power_cycle: bool):
+    for current in range(STATE_COUNT):
+        for desired in [OFF, 1, 200, STATE_COUNT - 1]:
+            if current == desired:
+                assert next_command(current, desired, power_cycle) == 0
+                continue
+            cmd = next_command(current, desired, power_cycle)
+            following = next_index(current, cmd)
+            assert distance(following, desired, power_cycle) == (
+                distance(current, desired, power_cycle) - 1
+            )
+
+
+def test_distance():
+    general = State(True, Preset.GENERAL, Backlight.ON, None, None)
+
+    assert distance(OFF, state_index(general)) == 1
+    assert distance(state_index(general), OFF) == 1
+    assert distance(state_index(general), state_index(general.with_timer(18))) == 1
+    assert distance(OFF, state_index(general.with_timer(9))) == 10
@@ -0,0 +1,68 @@
+from hpa250b_ble import Command, State, Preset, Backlight, VOCLight
+from hpa250b_ble.transition import transition
+
+
+def test_power():
+    on = State(True, Preset.GENERAL, Backlight.ON, None, None)
+
+    assert transition(State.empty(), Command().toggle_power()) == on
+    assert transition(on, Command().toggle_power()) == State.empty()
+    assert transition(State.empty(), Command().toggle_germ()) == State.empty()
+
+
+def test_manual_presets():
+    on = State(True, Preset.AUTO_VOC, Backlight.ON, VOCLight.AMBER, None)
+
+    assert transition(on, Command().toggle_germ()).preset == Preset.GERM
+    assert transition(on, Command().toggle_general()).preset == Preset.GENERAL
+    assert transition(on, Command().toggle_allergen()).preset == Preset.ALLERGEN
+    assert transition(on, Command().toggle_turbo()) == State(
+        True, Preset.TURBO, Backlight.ON, None, None
+    )
+
+
+def test_auto_presets_toggle_sensors():
+    general = State(True, Preset.GENERAL, Backlight.ON, None, None)
+    auto_voc = transition(general, Command().toggle_auto_voc())
+    assert auto_voc == State(True, Preset.AUTO_VOC, Backlight.ON, VOCLight.GREEN, None)
+
+    assert (
+        transition(auto_voc, Command().toggle_auto_pollen()).preset
+        == Preset.AUTO_VOC_POLLEN
+    )
+    assert (
+        transition(auto_voc, Command().toggle_auto_voc().toggle_auto_pollen()).preset
+        == Preset.AUTO_POLLEN
+    )
+    assert (
+        transition(general, Command().toggle_auto_voc().toggle_auto_pollen()).preset
+        == Preset.AUTO_VOC_POLLEN
+    )
+
+
+def test_keeps_voc_light_within_auto_presets():
+    auto_voc = State(True, Preset.AUTO_VOC, Backlight.ON, VOCLight.RED, None)
+
+    assert (
+        transition(auto_voc, Command().toggle_auto_pollen()).voc_light == VOCLight.RED
+    )
+
+
+def test_backlight_cycle():
+    on = State(True, Preset.GENERAL, Backlight.ON, None, None)
+
+    dim = transition(on, Command().cycle_light())
+    off = transition(dim, Command().cycle_light())
+    assert dim.backlight == Backlight.DIM
+    assert off.backlight == Backlight.OFF
+    assert transition(off, Command().cycle_light()).backlight == Backlight.ON
+
+
+def test_timer_wraps_around():
+    on = State(True, Preset.GENERAL, Backlight.ON, None, None)
+
+    assert transition(on, Command().timer_up()).timer == 1
+    assert transition(on, Command().timer_down()).timer == 18
+    assert transition(on.with_timer(18), Command().timer_up()).timer is None
+    assert transition(on.with_timer(1), Command().timer_down()).timer is None
+    assert transition(on.with_timer(5), Command().timer_up().timer_down()).timer == 5
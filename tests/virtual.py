@@ -1,8 +1,17 @@
-from hpa250b_ble.models import HPA250BModel
+from hpa250b_ble.models import HPA250BModel, PipelinedHPA250BModel
+from hpa250b_ble.planner import Step
 from hpa250b_ble.command import Command
 from hpa250b_ble.state import State
 from hpa250b_ble.enums import Preset, Backlight, VOCLight
 
+# Written out by hand rather than shared with hpa250b_ble.transition, so the
+# reconcile tests check the planner against an independent model
+_SENSORS = {
+    Preset.AUTO_VOC: (True, False),
+    Preset.AUTO_POLLEN: (False, True),
+    Preset.AUTO_VOC_POLLEN: (True, True),
+}
+
 
 class VirtualHPA250B(HPA250BModel):
     _state: State
@@ -36,28 +45,39 @@ class VirtualHPA250B(HPA250BModel):
                 is_on = True
                 backlight = Backlight.ON
                 preset = Preset.GENERAL
+                timer = None
+        elif not is_on:
+            return self._state
 
         if cmd.is_toggle_germ:
             preset = Preset.GERM
-            voc_light = None
         elif cmd.is_toggle_general:
             preset = Preset.GENERAL
-            voc_light = None
         elif cmd.is_toggle_allergen:
             preset = Preset.ALLERGEN
-            voc_light = None
         elif cmd.is_toggle_turbo:
             preset = Preset.TURBO
-            voc_light = None
-        elif cmd.is_toggle_auto_voc and cmd.is_toggle_auto_pollen:
-            preset = Preset.AUTO_VOC_POLLEN
-            voc_light = VOCLight.GREEN
-        elif cmd.is_toggle_auto_voc:
-            preset = Preset.AUTO_VOC
-            voc_light = VOCLight.GREEN
-        elif cmd.is_toggle_auto_pollen:
-            preset = Preset.AUTO_POLLEN
-            voc_light = VOCLight.GREEN
+        elif cmd.is_toggle_auto_voc or cmd.is_toggle_auto_pollen:
+            # the sensor buttons toggle their sensor in an auto preset and
+            # select the matching auto preset from a manual one
+            voc, pollen = _SENSORS.get(preset, (False, False))
+            if cmd.is_toggle_auto_voc:
+                voc = not voc
+            if cmd.is_toggle_auto_pollen:
+                pollen = not pollen
+            if voc and pollen:
+                auto = Preset.AUTO_VOC_POLLEN
+            elif voc:
+                auto = Preset.AUTO_VOC
+            elif pollen:
+                auto = Preset.AUTO_POLLEN
+            else:
+                # both sensors off: the firmware's behaviour is unknown
+                auto = preset
+            if preset not in _SENSORS:
+                # the VOC light is only reported in auto presets
+                voc_light = VOCLight.GREEN
+            preset = auto
 
         if cmd.is_cycle_light:
             if backlight == Backlight.ON:
@@ -89,3 +109,10 @@ class VirtualHPA250B(HPA250BModel):
     @property
     def current_state(self) -> State:
         return self._state
+
+
+class PipelinedVirtualHPA250B(VirtualHPA250B, PipelinedHPA250BModel):
+    async def apply_commands(self, steps: list[Step]) -> bool:
+        for step in steps:
+            await self.apply_command(step.command)
+        return True